@@ -0,0 +1,169 @@
+"""
+Per-request performance metrics.
+
+``RequestMetricsMiddleware`` (backend.middleware) opens a ``RequestMetrics``
+for every request. Database queries are counted and timed by an execute
+wrapper installed on every connection, and other code accounts for its time
+with ``timed(name)`` (serializers, Gemini calls). The totals are sent back
+in a ``Server-Timing`` header and added to process-wide histograms, which
+``metrics_view`` serves to staff users in the Prometheus text format.
+
+Everything is a few ``perf_counter`` calls and dict updates per request, so
+it can stay on in production. Histograms are per process: with several
+workers, scrape each or aggregate them in Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+# Parts of a request reported on their own
+TIMED = ('db', 'serializer', 'gemini')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Time and query counters of the request being handled."""
+    __slots__ = ('start', 'queries', 'durations')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.durations = dict.fromkeys(TIMED, 0.0)
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to ``name`` for the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.durations[name] += time.perf_counter() - start
+
+
+def _record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.durations['db'] += time.perf_counter() - start
+
+
+def instrument(connection, **kwargs):
+    """Count the queries of ``connection`` towards the current request."""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def instrument_connections():
+    """Instrument the connections opened so far and every later one."""
+    connection_created.connect(instrument, dispatch_uid='backend.metrics.instrument')
+    for connection in connections.all(initialized_only=True):
+        instrument(connection)
+
+
+class Histogram:
+    """A Prometheus histogram with ``view`` and ``method`` labels."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts = self.series.get(labels)
+            if counts is None:
+                # One count per bucket plus +Inf, then the sum
+                counts = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bisect_left(self.buckets, value)] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((labels, list(counts)) for labels, counts in self.series.items())
+        for (view, method), counts in series:
+            labels = f'view="{_escape(view)}",method="{_escape(method)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {counts[-1]}')
+            lines.append(f'{self.name}_count{{{labels}}} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self.lock:
+            self.series.clear()
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Wall time of a request.', DURATION_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'Database queries made by a request.', QUERY_BUCKETS)
+DURATIONS = {
+    'db': Histogram('http_request_db_duration_seconds', 'Time a request spent in database queries.', DURATION_BUCKETS),
+    'serializer': Histogram(
+        'http_request_serializer_duration_seconds', 'Time a request spent in serializers.', DURATION_BUCKETS
+    ),
+    'gemini': Histogram('http_request_gemini_duration_seconds', 'Time a request spent waiting for Gemini.', DURATION_BUCKETS),
+}
+HISTOGRAMS = [REQUEST_DURATION, DB_QUERIES, *DURATIONS.values()]
+
+
+def start_request():
+    """Start collecting metrics for a request; returns the token for ``finish_request``."""
+    return _current.set(RequestMetrics())
+
+
+def finish_request(token, request, response):
+    """Record the request's metrics and add the ``Server-Timing`` header."""
+    metrics = _current.get()
+    _current.reset(token)
+    total = time.perf_counter() - metrics.start
+
+    match = request.resolver_match
+    labels = (match.view_name if match else 'unmatched', request.method)
+    REQUEST_DURATION.observe(labels, total)
+    DB_QUERIES.observe(labels, metrics.queries)
+    for name, histogram in DURATIONS.items():
+        histogram.observe(labels, metrics.durations[name])
+
+    timings = [f'total;dur={total * 1000:.1f}', f'db;dur={metrics.durations["db"] * 1000:.1f};desc="{metrics.queries} queries"']
+    timings += [f'{name};dur={metrics.durations[name] * 1000:.1f}' for name in TIMED if name != 'db']
+    if response.has_header('Server-Timing'):
+        timings.insert(0, response['Server-Timing'])
+    response['Server-Timing'] = ', '.join(timings)
+
+
+def metrics_view(request):
+    """Histograms of all requests served by this process, for Prometheus (staff only)."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden()
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -48,8 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'backend.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +79,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Served by an ASGI server (backend.asgi sets this). The server-sent event
+# streams of the AI endpoints are only routed then: each holds its
+# connection for the whole generation, which would tie up a WSGI worker
+ASGI = os.getenv('ASGI', 'False') == 'True'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -193,12 +199,17 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'if-modified-since',
+    'if-none-match',
     'origin',
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
 ]
 
+# Let the frontend read the validators of cross-origin responses
+CORS_EXPOSE_HEADERS = ['etag', 'last-modified']
+
 # Exempt API from CSRF for easier development
 CSRF_TRUSTED_ORIGINS = [
     "http://localhost:8080",
@@ -213,5 +224,87 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Django cache, used for derived data (calibration reports, API responses).
+# CACHE_BACKEND is locmem (per process, the default), file (CACHE_LOCATION is
+# a directory shared by all workers) or db (CACHE_LOCATION is a table created
+# with ``manage.py createcachetable``).
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'django_cache'),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')]
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.getenv('CACHE_LOCATION', _cache_location),
+    }
+}
+
+# Server-side cache of list and stats responses (predictions.response_cache):
+# Django cache alias, and seconds an entry is kept (writes invalidate it
+# earlier)
+RESPONSE_CACHE_ALIAS = os.getenv('RESPONSE_CACHE_ALIAS', 'default')
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', '300'))
+
 # Gemini API Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+
+# Gemini response cache: in-memory LRU size, optional Django cache alias for a
+# shared/persistent tier, and how long (seconds) each kind of response is
+# reused. 0 disables caching; suggestions are meant to be fresh each time.
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', '512'))
+GEMINI_CACHE_ALIAS = os.getenv('GEMINI_CACHE_ALIAS') or None
+GEMINI_CACHE_TTLS = {
+    'summary': 24 * 60 * 60,
+    'insight': 7 * 24 * 60 * 60,
+    'suggestions': 0,
+}
+
+# Batch insights: limits on one prompt (rough input tokens including the
+# expected answer, and number of predictions) and concurrent prompts
+GEMINI_BATCH_MAX_TOKENS = int(os.getenv('GEMINI_BATCH_MAX_TOKENS', '8000'))
+GEMINI_BATCH_MAX_ITEMS = int(os.getenv('GEMINI_BATCH_MAX_ITEMS', '40'))
+GEMINI_BATCH_TOKENS_PER_INSIGHT = 120
+GEMINI_BATCH_CONCURRENCY = int(os.getenv('GEMINI_BATCH_CONCURRENCY', '4'))
+
+# Gemini call resilience (predictions.resilience): seconds per attempt,
+# retries of transient failures with their backoff base and cap, consecutive
+# failures that open the circuit breaker and seconds it stays open, and
+# calls in flight per process
+GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '20'))
+GEMINI_RETRIES = int(os.getenv('GEMINI_RETRIES', '2'))
+GEMINI_RETRY_BACKOFF = 0.5
+GEMINI_RETRY_MAX_BACKOFF = 4.0
+GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', '5'))
+GEMINI_BREAKER_RESET = float(os.getenv('GEMINI_BREAKER_RESET', '30'))
+GEMINI_MAX_CONCURRENCY = int(os.getenv('GEMINI_MAX_CONCURRENCY', '8'))
+
+# AI endpoint rate limits (predictions.throttling) per client and for all
+# clients together, as '<requests>/<second|minute|hour|day>' ('' for none),
+# and the Django cache alias holding the token buckets
+AI_RATE_LIMIT_CLIENT = os.getenv('AI_RATE_LIMIT_CLIENT', '30/min') or None
+AI_RATE_LIMIT_GLOBAL = os.getenv('AI_RATE_LIMIT_GLOBAL', '300/min') or None
+AI_RATE_LIMIT_CACHE_ALIAS = os.getenv('AI_RATE_LIMIT_CACHE_ALIAS', 'default')
+
+# Daily Gemini budgets (predictions.usage): model calls and prompt plus
+# response tokens; 0 for no limit
+AI_DAILY_CALL_BUDGET = int(os.getenv('AI_DAILY_CALL_BUDGET', '0'))
+AI_DAILY_TOKEN_BUDGET = int(os.getenv('AI_DAILY_TOKEN_BUDGET', '0'))
+
+# Worker processes for bootstrap confidence intervals on large histories
+# (predictions.calibration); 0 or 1 computes them in the request process
+CALIBRATION_BOOTSTRAP_WORKERS = int(os.getenv('CALIBRATION_BOOTSTRAP_WORKERS', '0'))
+
+# Background AI jobs (predictions.jobs)
+AI_JOB_WORKERS = int(os.getenv('AI_JOB_WORKERS', '4'))
+# Run jobs synchronously inside the request (used by the tests)
+AI_JOBS_EAGER = os.getenv('AI_JOBS_EAGER', 'False') == 'True'
+# Finished jobs are deleted this many days after they finished, and jobs
+# still pending or running this many seconds after they were queued (e.g.
+# lost in a restart) are marked failed; see the purge_ai_jobs command
+AI_JOB_RETENTION_DAYS = int(os.getenv('AI_JOB_RETENTION_DAYS', '7'))
+AI_JOB_STALE_AFTER = int(os.getenv('AI_JOB_STALE_AFTER', str(30 * 60)))
+# Generate the AI insight of a prediction in the background when it is
+# resolved (predictions.insights)
+AI_INSIGHT_WARMER = os.getenv('AI_INSIGHT_WARMER', 'False') == 'True'
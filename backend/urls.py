@@ -23,6 +23,8 @@ from django.views.static import serve
 from django.http import FileResponse
 import os
 
+from backend.metrics import metrics_view
+
 def serve_frontend(request):
     """Serve the frontend index.html"""
     frontend_path = os.path.join(settings.BASE_DIR, 'frontend', 'index.html')
@@ -31,6 +33,7 @@ def serve_frontend(request):
 urlpatterns = [
     path('', serve_frontend, name='home'),
     path('admin/', admin.site.urls),
+    path('api/metrics/', metrics_view, name='metrics'),
     path('api/', include('predictions.urls')),
 ]
 
@@ -0,0 +1,209 @@
+"""
+Latency, query count and memory of the API hot paths at several data sizes.
+
+For each size a throwaway SQLite database is filled with
+``generate_synthetic_predictions``. Then list, create, resolve, stats and
+export are timed through the Django test client, with a fake Gemini model
+in place. Each operation reports its p50/p95 latency, the number of SQL
+queries per request and the peak Python memory of a single request.
+
+Results are written as JSON (by default to benchmarks/results/<commit>.json);
+pass ``--compare`` an earlier file to see the change.
+
+Usage:
+    python benchmarks/api_hot_paths.py [--sizes 1000,100000,1000000] [--repeat 20]
+        [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Stand-in Gemini model that answers instantly."""
+
+    def generate_content(self, prompt, **kwargs):
+        return StubResponse('Benchmark summary')
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def operations(client):
+    """Map operation name -> callable making one request."""
+    from predictions.models import Prediction
+
+    pending = iter(
+        Prediction.objects.filter(resolved=False).order_by('-created_at').values_list('id', flat=True)[:10000]
+    )
+
+    def request(response):
+        assert response.status_code < 300, (response.status_code, getattr(response, 'content', b'')[:200])
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response
+
+    return {
+        'list': lambda: request(client.get('/api/predictions/?page_size=50')),
+        'create': lambda: request(client.post(
+            '/api/predictions/',
+            {'description': 'A benchmark prediction to create', 'probability': 0.6},
+            content_type='application/json',
+        )),
+        'resolve': lambda: request(client.post(
+            f'/api/predictions/{next(pending)}/resolve/', {'outcome': True}, content_type='application/json'
+        )),
+        'stats': lambda: request(client.get('/api/predictions/stats/?ai_summary=true')),
+        'export': lambda: request(client.get('/api/predictions/export/?format=ndjson')),
+    }
+
+
+def measure(operation, repeat):
+    from django.db import connection
+
+    # Counted with a wrapper: the queries log is cleared when a request starts
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    # Warm-up, then the query count and memory of one request
+    operation()
+    tracemalloc.start()
+    with connection.execute_wrapper(count_query):
+        operation()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'queries': len(queries),
+        'peak_memory_kb': round(peak_memory / 1024, 1),
+        'runs': repeat,
+    }
+
+
+def run_size(size, args):
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from predictions import gemini_service
+    from predictions.gemini_service import GeminiService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection.close()
+        settings.DATABASES['default']['NAME'] = Path(tmp) / 'bench.sqlite3'
+        call_command('migrate', verbosity=0)
+        start = time.perf_counter()
+        call_command('generate_synthetic_predictions', size, '--seed', '1', stdout=StringIO())
+        print(f'\n{size:,} predictions (generated in {time.perf_counter() - start:.1f} s)')
+
+        gemini_service._gemini_service = GeminiService(model=StubModel())
+        client = Client()
+        results = {}
+        for name, operation in operations(client).items():
+            # Exporting everything is much slower than the other paths
+            repeat = args.export_repeat if name == 'export' else args.repeat
+            results[name] = measure(operation, repeat)
+            r = results[name]
+            print(
+                f'  {name:<8} p50 {r["p50_ms"]:9.2f} ms  p95 {r["p95_ms"]:9.2f} ms  '
+                f'{r["queries"]:3d} queries  peak {r["peak_memory_kb"]:10.1f} KB'
+            )
+        connection.close()
+    return results
+
+
+def compare(results, baseline_path):
+    baseline = json.loads(Path(baseline_path).read_text())['results']
+    print(f'\nChange against {baseline_path} (p50, queries)')
+    for size, operations_results in results.items():
+        for name, result in operations_results.items():
+            old = baseline.get(size, {}).get(name)
+            if old is None:
+                continue
+            ratio = result['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('inf')
+            print(
+                f'  {size:>8} {name:<8} {old["p50_ms"]:9.2f} -> {result["p50_ms"]:9.2f} ms ({ratio:5.2f}x)  '
+                f'{old["queries"]} -> {result["queries"]} queries'
+            )
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', default='1000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--export-repeat', type=int, default=3)
+    parser.add_argument('--output', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Earlier results file to compare against')
+    args = parser.parse_args()
+
+    settings.DATABASES['default'] = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+    settings.ALLOWED_HOSTS = ['testserver']
+    settings.AI_JOBS_EAGER = True
+    # The AI endpoints are timed over and over: no rate limits
+    settings.AI_RATE_LIMIT_CLIENT = settings.AI_RATE_LIMIT_GLOBAL = None
+    django.setup()
+
+    commit = git_commit()
+    results = {str(size): run_size(int(size), args) for size in args.sizes.split(',')}
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f'{commit}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }, indent=2) + '\n')
+    print(f'\nResults written to {output}')
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Load test of the AI insight endpoint: WSGI workers versus one ASGI event loop.
+
+The Gemini model is replaced by a stub that sleeps for ``--latency`` seconds
+per call. The WSGI run serves ``--requests`` requests with ``--workers``
+blocking worker threads (like gunicorn sync workers); the ASGI run sends
+them all at once to the async view on a single event loop.
+
+Usage:
+    python benchmarks/async_load.py [--requests 200] [--workers 4] [--latency 0.5]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class LatencyModel:
+    """Stand-in Gemini model that takes ``latency`` seconds to answer."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return StubResponse('Stub insight')
+
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return StubResponse('Stub insight')
+
+
+def run_wsgi(urls, workers):
+    from django.test import Client
+
+    def fetch(url):
+        return Client().get(url).status_code
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fetch, urls))
+
+
+async def run_asgi(urls):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    responses = await asyncio.gather(*(client.get(url) for url in urls))
+    return [response.status_code for response in responses]
+
+
+def timed(label, func, count):
+    started = time.perf_counter()
+    statuses = func()
+    elapsed = time.perf_counter() - started
+    failed = sum(status != 200 for status in statuses)
+    print(f'{label}: {count} requests in {elapsed:.2f} s ({count / elapsed:.1f} req/s, {failed} failed)')
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path(tmp) / 'bench.sqlite3',
+        }
+        # Every request must reach the model
+        settings.GEMINI_CACHE_TTLS = {}
+        # ...all at once: this measures the server, not the in-flight limit
+        settings.GEMINI_MAX_CONCURRENCY = args.requests
+        # ...and none of them be rate limited
+        settings.AI_RATE_LIMIT_CLIENT = settings.AI_RATE_LIMIT_GLOBAL = None
+        settings.ALLOWED_HOSTS = ['testserver']
+        django.setup()
+        from django.core.management import call_command
+        from predictions import gemini_service
+        from predictions.gemini_service import GeminiService
+        from predictions.models import Prediction
+
+        call_command('migrate', verbosity=0)
+        predictions = Prediction.objects.bulk_create(
+            Prediction(description=f'Load test prediction {i}', probability=0.5)
+            for i in range(args.requests)
+        )
+        urls = [f'/api/async/predictions/{p.id}/ai_insight/' for p in predictions]
+        gemini_service._gemini_service = GeminiService(model=LatencyModel(args.latency))
+
+        print(f'Stub model latency {args.latency} s')
+        wsgi = timed(f'WSGI ({args.workers} workers)', lambda: run_wsgi(urls, args.workers), len(urls))
+        asgi = timed('ASGI (1 event loop)', lambda: asyncio.run(run_asgi(urls)), len(urls))
+        print(f'Speedup: {wsgi / asgi:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
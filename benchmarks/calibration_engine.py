@@ -0,0 +1,53 @@
+"""
+Speed of the NumPy calibration engine on synthetic arrays.
+
+Times ``calibration_report`` on ``--rows`` random probabilities and outcomes
+for uniform and quantile bins. Loading from the database is not included;
+see query_plans.py for the query side.
+
+Usage:
+    python benchmarks/calibration_engine.py [--rows 10000000] [--bins 10] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+import numpy as np  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--bins', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    django.setup()
+    from predictions.calibration import BINNING_STRATEGIES, calibration_report
+
+    rng = np.random.default_rng(0)
+    probabilities = rng.random(args.rows)
+    outcomes = (rng.random(args.rows) < probabilities).astype(np.float64)
+
+    print(f'{args.rows:,} predictions, {args.bins} bins')
+    for strategy in BINNING_STRATEGIES:
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            report = calibration_report(probabilities, outcomes, bins=args.bins, strategy=strategy)
+            timings.append(time.perf_counter() - start)
+        print(
+            f'{strategy:>9}: median {statistics.median(timings) * 1000:7.1f} ms  '
+            f'brier {report["brier_score"]:.4f}  ece {report["ece"]:.4f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
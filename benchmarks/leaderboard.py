@@ -0,0 +1,118 @@
+"""
+Latency of the leaderboard and cohort comparison with many users.
+
+Builds a throwaway SQLite database with ``--users`` users, each with the
+calibration summary rows of ``--predictions`` resolved predictions, and a
+few cohorts. Then times the uncached computation and a cached request
+through the Django test client.
+
+Usage:
+    python benchmarks/leaderboard.py [--users 10000] [--predictions 100] [--repeat 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+COHORTS = ('alpha', 'beta', 'gamma', 'delta')
+
+
+def load_users(users, predictions):
+    """Users with summary rows as if each had made ``predictions`` resolved predictions."""
+    from django.contrib.auth.models import Group, User
+    from django.db import transaction
+    from predictions.models import CalibrationSummary
+    from predictions.stats import bucket_for
+
+    rng = random.Random(0)
+    with transaction.atomic():
+        User.objects.bulk_create(User(username=f'user{i}') for i in range(users))
+        accounts = list(User.objects.order_by('id'))
+        groups = Group.objects.bulk_create(Group(name=name) for name in COHORTS)
+        Group.user_set.through.objects.bulk_create(
+            Group.user_set.through(user_id=user.id, group_id=rng.choice(groups).id) for user in accounts
+        )
+
+        rows = []
+        for user in accounts:
+            buckets = {}
+            for _ in range(predictions):
+                probability = round(rng.random(), 2)
+                outcome = rng.random() < probability
+                b = buckets.setdefault(bucket_for(probability, True, outcome), [0, 0.0, 0, 0.0])
+                b[0] += 1
+                b[1] += probability
+                b[2] += outcome
+                b[3] += (probability - outcome) ** 2
+            rows += [
+                CalibrationSummary(
+                    owner=user, bucket=bucket, count=count, sum_probability=sum_probability,
+                    sum_outcome=sum_outcome, sum_squared_error=sum_squared_error,
+                )
+                for bucket, (count, sum_probability, sum_outcome, sum_squared_error) in buckets.items()
+            ]
+        CalibrationSummary.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def median_ms(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--predictions', type=int, default=100, help='Resolved predictions per user')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path(tmp) / 'bench.sqlite3',
+        }
+        settings.ALLOWED_HOSTS = ['testserver']
+        django.setup()
+        from django.core.management import call_command
+        from django.test import Client
+        from predictions.leaderboard import cohort_comparison, leaderboard
+
+        call_command('migrate', verbosity=0)
+        rows = load_users(args.users, args.predictions)
+        print(f'{args.users} users, {rows} summary rows')
+
+        client = Client()
+        results = {
+            'leaderboard (uncached)': median_ms(lambda: leaderboard(min_resolved=1), args.repeat),
+            'cohort leaderboard (uncached)': median_ms(
+                lambda: leaderboard(min_resolved=1, cohort=COHORTS[0]), args.repeat
+            ),
+            'cohort comparison (uncached)': median_ms(cohort_comparison, args.repeat),
+            'GET /api/leaderboard/ (cached)': median_ms(
+                lambda: client.get('/api/leaderboard/?min_resolved=1&limit=100'), args.repeat
+            ),
+            'GET /api/leaderboard/cohorts/ (cached)': median_ms(
+                lambda: client.get('/api/leaderboard/cohorts/'), args.repeat
+            ),
+        }
+        for name, ms in results.items():
+            print(f'  {name:<40} {ms:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
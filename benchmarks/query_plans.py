@@ -0,0 +1,152 @@
+"""
+Query plans and latency of the hot Prediction queries before and after the
+secondary indexes.
+
+Builds a throwaway SQLite database, migrates it to the schema without
+secondary indexes, loads synthetic rows, then times each query and prints
+its plan. It then migrates forward (creating the indexes on the loaded data)
+and repeats.
+
+Usage:
+    python benchmarks/query_plans.py [--rows 1000000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+# Migration that leaves Prediction without any secondary index
+BASELINE_MIGRATION = '0002'
+
+
+def load_rows(count):
+    from django.db import connection, transaction
+
+    rng = random.Random(0)
+    start = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+    sql = (
+        'INSERT INTO predictions_prediction '
+        '(id, description, probability, created_at, resolve_by, resolved, outcome) '
+        'VALUES (%s, %s, %s, %s, %s, %s, %s)'
+    )
+    batch = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for i in range(count):
+            probability = round(rng.random(), 2)
+            resolved = rng.random() < 0.7
+            created_at = start + timedelta(minutes=i)
+            resolve_by = created_at + timedelta(days=rng.randint(1, 60)) if rng.random() < 0.5 else None
+            batch.append((
+                uuid.UUID(int=rng.getrandbits(128)).hex,
+                f'Synthetic prediction number {i}',
+                probability,
+                created_at.isoformat(' '),
+                resolve_by.isoformat(' ') if resolve_by else None,
+                resolved,
+                (rng.random() < probability) if resolved else None,
+            ))
+            if len(batch) == 10000:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+
+
+# Columns of the baseline schema
+COLUMNS = ('id', 'description', 'probability', 'created_at', 'resolve_by', 'resolved', 'outcome')
+
+
+def hot_queries(owned):
+    """
+    The hot queries. With ``owned`` they are scoped to one owner (the
+    unowned predictions) like the API's; the baseline has no owner column.
+    """
+    from predictions.models import Prediction
+    from predictions.stats import SCORED
+
+    predictions = Prediction.objects.filter(owner=None) if owned else Prediction.objects.all()
+    now = datetime(2021, 6, 1, tzinfo=dt_timezone.utc)
+    return {
+        'scored scan': predictions.filter(SCORED).order_by().values_list('probability', 'outcome'),
+        'list first page': predictions.order_by('-created_at', 'id').values_list(*COLUMNS)[:50],
+        'list resolved page': predictions.filter(resolved=True).order_by('-created_at', 'id').values_list(*COLUMNS)[:50],
+        'due soon': predictions.filter(
+            resolved=False, resolve_by__gte=now, resolve_by__lt=now + timedelta(days=7)
+        ).order_by('resolve_by').values_list(*COLUMNS)[:50],
+    }
+
+
+def measure(repeat, owned):
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        # Give the planner statistics for the freshly loaded/indexed table
+        cursor.execute('ANALYZE')
+
+    results = {}
+    for name, queryset in hot_queries(owned).items():
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                cursor.fetchall()
+            timings.append(time.perf_counter() - started)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def report(title, results):
+    print(f'\n== {title} ==')
+    for name, (plan, seconds) in results.items():
+        print(f'{name}: {seconds * 1000:.1f} ms')
+        for step in plan:
+            print(f'    {step}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings.DATABASES['default'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path(tmp) / 'bench.sqlite3',
+        }
+        django.setup()
+        from django.core.management import call_command
+
+        call_command('migrate', 'predictions', BASELINE_MIGRATION, verbosity=0)
+        print(f'Loading {args.rows} predictions...')
+        load_rows(args.rows)
+        before = measure(args.repeat, owned=False)
+
+        started = time.perf_counter()
+        call_command('migrate', 'predictions', verbosity=0)
+        print(f'Index migrations took {time.perf_counter() - started:.1f} s')
+        after = measure(args.repeat, owned=True)
+
+    report(f'Before (migration {BASELINE_MIGRATION})', before)
+    report('After', after)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,20 @@ const API_BASE_URL = window.location.origin.includes('localhost') || window.loca
     ? 'http://localhost:8000/api'
     : '/api';
 
+// Number of predictions fetched per page
+const PAGE_SIZE = 20;
+
 // State
 let currentFilter = 'all';
 let predictions = [];
+let nextPageUrl = null;
 let stats = null;
+let calibrationChart = null;
 let profile = null;
 
+// Last response body and validators per URL, for conditional requests
+const validatedResponses = new Map();
+
 // Initialize
 document.addEventListener('DOMContentLoaded', () => {
     initTabs();
@@ -24,6 +32,10 @@ document.addEventListener('DOMContentLoaded', () => {
 function initPredictionCardClicks() {
     const container = document.getElementById('predictions-list');
     container.addEventListener('click', (e) => {
+        if (e.target.closest('#load-more-btn')) {
+            loadMorePredictions();
+            return;
+        }
         const card = e.target.closest('.prediction-card');
         if (card) {
             const predictionId = card.dataset.predictionId;
@@ -105,17 +117,58 @@ function initFilters() {
             currentFilter = btn.dataset.filter;
             filterBtns.forEach(b => b.classList.remove('active'));
             btn.classList.add('active');
-            renderPredictions();
+            loadPredictions();
         });
     });
 }
 
 // API Calls
+function predictionsUrl() {
+    const params = new URLSearchParams({ page_size: PAGE_SIZE });
+    if (currentFilter === 'pending') {
+        params.set('resolved', 'false');
+    } else if (currentFilter === 'resolved') {
+        params.set('resolved', 'true');
+    }
+    return `${API_BASE_URL}/predictions/?${params}`;
+}
+
+// Requests that change data need Django's CSRF token when the user is
+// logged in (predictions are per user)
+function csrfHeaders() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? { 'X-CSRFToken': decodeURIComponent(match[1]) } : {};
+}
+
+// GET JSON, revalidating an earlier response with its ETag/Last-Modified
+// so that unchanged data comes back as a bodiless 304
+async function fetchJSON(url) {
+    const cached = validatedResponses.get(url);
+    const headers = {};
+    if (cached?.etag) headers['If-None-Match'] = cached.etag;
+    if (cached?.lastModified) headers['If-Modified-Since'] = cached.lastModified;
+
+    const response = await fetch(url, { headers });
+    if (response.status === 304 && cached) return JSON.parse(cached.body);
+    if (!response.ok) throw new Error(`Request failed with status ${response.status}`);
+
+    const body = await response.text();
+    const etag = response.headers.get('ETag');
+    const lastModified = response.headers.get('Last-Modified');
+    if (etag || lastModified) {
+        validatedResponses.set(url, { etag, lastModified, body });
+    } else {
+        validatedResponses.delete(url);
+    }
+    return JSON.parse(body);
+}
+
+// Load the first page of predictions for the current filter
 async function loadPredictions() {
     try {
-        const response = await fetch(`${API_BASE_URL}/predictions/`);
-        if (!response.ok) throw new Error('Failed to load predictions');
-        predictions = await response.json();
+        const page = await fetchJSON(predictionsUrl());
+        predictions = page.results;
+        nextPageUrl = page.next;
         renderPredictions();
     } catch (error) {
         console.error('Error loading predictions:', error);
@@ -124,6 +177,26 @@ async function loadPredictions() {
     }
 }
 
+// Append the next page of predictions
+async function loadMorePredictions() {
+    if (!nextPageUrl) return;
+
+    const btn = document.getElementById('load-more-btn');
+    btn.disabled = true;
+    btn.textContent = 'Loading...';
+
+    try {
+        const page = await fetchJSON(nextPageUrl);
+        predictions = predictions.concat(page.results);
+        nextPageUrl = page.next;
+        renderPredictions();
+    } catch (error) {
+        console.error('Error loading more predictions:', error);
+        btn.disabled = false;
+        btn.textContent = 'Load more';
+    }
+}
+
 async function createPrediction() {
     const description = document.getElementById('description').value;
     const probability = parseFloat(document.getElementById('probability').value) / 100;
@@ -143,6 +216,7 @@ async function createPrediction() {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...csrfHeaders(),
             },
             body: JSON.stringify(data),
         });
@@ -190,6 +264,7 @@ async function resolvePrediction(id, outcome) {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
+                ...csrfHeaders(),
             },
             body: JSON.stringify({ outcome }),
         });
@@ -211,6 +286,7 @@ async function deletePrediction(id) {
     try {
         const response = await fetch(`${API_BASE_URL}/predictions/${id}/`, {
             method: 'DELETE',
+            headers: csrfHeaders(),
         });
 
         if (!response.ok) throw new Error('Failed to delete prediction');
@@ -224,13 +300,90 @@ async function deletePrediction(id) {
     }
 }
 
+// Poll a background AI job until it finishes
+async function waitForJob(job, { interval = 1000, attempts = 120 } = {}) {
+    for (let i = 0; i < attempts; i++) {
+        if (job.status === 'succeeded') return job.result;
+        if (job.status === 'failed') throw new Error(job.error || 'AI job failed');
+
+        await new Promise(resolve => setTimeout(resolve, interval));
+        const response = await fetch(`${API_BASE_URL}/ai_jobs/${job.id}/`);
+        if (!response.ok) throw new Error('Failed to check AI job');
+        job = await response.json();
+    }
+    throw new Error('AI job timed out');
+}
+
+// Stream server-sent AI text, calling onText with the text so far. Streams
+// are only served under ASGI; if the stream can't be opened the text comes
+// from fallback() (a background job) instead.
+function streamAIText(url, onText, fallback) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(url);
+        let text = '';
+        let received = false;
+
+        source.onmessage = (event) => {
+            received = true;
+            text += JSON.parse(event.data).text;
+            onText(text);
+        };
+        source.addEventListener('done', (event) => {
+            source.close();
+            const data = JSON.parse(event.data);
+            if (data.error) reject(new Error(data.error));
+            else resolve(text);
+        });
+        source.onerror = () => {
+            // Don't let EventSource reconnect and start the generation again
+            source.close();
+            if (received) {
+                reject(new Error('AI stream interrupted'));
+                return;
+            }
+            fallback().then((result) => {
+                onText(result);
+                resolve(result);
+            }, reject);
+        };
+    });
+}
+
+// Queue an AI job at url and wait for its result (the job is at jobKey, or
+// is the response itself)
+async function fetchAIJobResult(url, jobKey) {
+    const response = await fetch(url);
+    if (!response.ok) throw new Error('Failed to queue AI job');
+    const data = await response.json();
+    const job = jobKey ? data[jobKey] : data;
+    if (!job) throw new Error('No AI job was queued');
+    return waitForJob(job);
+}
+
 async function loadStats() {
     try {
-        // Request stats with AI summary
-        const response = await fetch(`${API_BASE_URL}/predictions/stats/?ai_summary=true`);
-        if (!response.ok) throw new Error('Failed to load stats');
-        stats = await response.json();
+        [stats, calibrationChart] = await Promise.all([
+            fetchJSON(`${API_BASE_URL}/predictions/stats/`),
+            fetchJSON(`${API_BASE_URL}/predictions/stats/chart/`),
+        ]);
+        stats.ai_summary_streaming = stats.resolved_predictions > 0;
         renderStats();
+
+        // Stream the AI summary in as it is generated
+        if (stats.ai_summary_streaming) {
+            const loadedStats = stats;
+            try {
+                await streamAIText(`${API_BASE_URL}/predictions/stats/ai_summary/stream/`, (text) => {
+                    loadedStats.ai_summary = text;
+                    if (stats === loadedStats) renderAISummary();
+                }, () => fetchAIJobResult(`${API_BASE_URL}/predictions/stats/?ai_summary=true`, 'ai_summary_job'));
+            } catch (error) {
+                console.error('Error generating AI summary:', error);
+                loadedStats.ai_summary_failed = true;
+            }
+            loadedStats.ai_summary_streaming = false;
+            if (stats === loadedStats) renderStats();
+        }
     } catch (error) {
         console.error('Error loading stats:', error);
         document.getElementById('stats-content').innerHTML =
@@ -240,10 +393,7 @@ async function loadStats() {
 
 async function loadProfile() {
     try {
-        const response = await fetch(`${API_BASE_URL}/profile/`);
-        if (!response.ok) throw new Error('Failed to load profile');
-        const profiles = await response.json();
-        profile = profiles[0] || { name: '', notes: '' };
+        profile = await fetchJSON(`${API_BASE_URL}/profile/`);
         renderProfile();
     } catch (error) {
         console.error('Error loading profile:', error);
@@ -267,6 +417,7 @@ async function updateProfile() {
             method,
             headers: {
                 'Content-Type': 'application/json',
+                ...csrfHeaders(),
             },
             body: JSON.stringify(data),
         });
@@ -293,7 +444,7 @@ async function getAISuggestions() {
 
         if (!response.ok) throw new Error('Failed to get AI suggestions');
 
-        const data = await response.json();
+        const data = { suggestions: await waitForJob(await response.json()) };
 
         // Render the 3 AI-generated suggestions as clickable cards
         suggestionsDiv.innerHTML = `
@@ -363,19 +514,12 @@ function useSuggestion(suggestion) {
 function renderPredictions() {
     const container = document.getElementById('predictions-list');
 
-    let filtered = predictions;
-    if (currentFilter === 'pending') {
-        filtered = predictions.filter(p => !p.resolved);
-    } else if (currentFilter === 'resolved') {
-        filtered = predictions.filter(p => p.resolved);
-    }
-
-    if (filtered.length === 0) {
+    if (predictions.length === 0) {
         container.innerHTML = '<div class="loading">No predictions found. Create your first one!</div>';
         return;
     }
 
-    container.innerHTML = filtered.map(prediction => `
+    container.innerHTML = predictions.map(prediction => `
         <div class="prediction-card ${prediction.resolved ? 'resolved' : ''}" data-prediction-id="${prediction.id}" style="cursor: pointer;">
             <div class="prediction-header">
                 <div class="prediction-description">${escapeHtml(prediction.description)}</div>
@@ -396,7 +540,9 @@ function renderPredictions() {
                 ` : ''}
             </div>
         </div>
-    `).join('');
+    `).join('') + (nextPageUrl ? `
+        <button id="load-more-btn" class="btn btn-secondary">Load more</button>
+    ` : '');
 }
 
 function renderStats() {
@@ -408,6 +554,7 @@ function renderStats() {
     }
 
     const brierScore = stats.brier_score !== null ? stats.brier_score.toFixed(4) : 'N/A';
+    const bins = chartBins();
 
     container.innerHTML = `
         <div class="stats-grid">
@@ -425,10 +572,10 @@ function renderStats() {
             </div>
         </div>
 
-        ${stats.calibration_bins.length > 0 ? `
+        ${bins.length > 0 ? `
             <div class="calibration-bins">
                 <h3>Calibration by Confidence Level</h3>
-                ${stats.calibration_bins.map(bin => `
+                ${bins.map(bin => `
                     <div class="calibration-bar">
                         <div class="bin-label">${bin.range}</div>
                         <div class="bin-bar-container">
@@ -444,18 +591,57 @@ function renderStats() {
             </div>
         ` : ''}
 
-        ${stats.ai_summary ? `
+        <div id="ai-summary-container">${aiSummaryHtml()}</div>
+    `;
+}
+
+// Chart bins from the columnar chart payload, leaving out bins with too few
+// predictions to say much (as the stats do)
+function chartBins() {
+    if (!calibrationChart) return stats.calibration_bins;
+    const curve = calibrationChart.resolutions[0];
+    const percent = (value) => Math.round(value * 1000) / 10;
+    return curve.count
+        .map((count, i) => ({
+            range: `${percent(curve.edges[i])}-${percent(curve.edges[i + 1])}%`,
+            count,
+            actual_frequency: count ? percent(curve.actual_frequency[i]) : 0,
+        }))
+        .filter(bin => bin.count >= 3);
+}
+
+function aiSummaryHtml() {
+    if (stats.ai_summary && !stats.ai_summary_failed) {
+        return `
             <div class="ai-summary">
                 <h3>✨ AI-Powered Insights</h3>
                 <div style="white-space: pre-wrap; line-height: 1.8;">${escapeHtml(stats.ai_summary)}</div>
             </div>
-        ` : stats.resolved_predictions > 0 ? `
+        `;
+    }
+    if (stats.ai_summary_streaming) {
+        return `
+            <div class="ai-summary">
+                <h3>✨ AI-Powered Insights</h3>
+                <p style="color: var(--text-secondary);"><em>Generating AI summary...</em></p>
+            </div>
+        `;
+    }
+    if (stats.resolved_predictions > 0) {
+        return `
             <div class="ai-summary">
                 <h3>AI-Powered Insights</h3>
                 <p style="color: var(--danger-color);"><em>AI summary unavailable. Check if GEMINI_API_KEY is configured.</em></p>
             </div>
-        ` : ''}
-    `;
+        `;
+    }
+    return '';
+}
+
+// Update only the summary while it streams in
+function renderAISummary() {
+    const container = document.getElementById('ai-summary-container');
+    if (container) container.innerHTML = aiSummaryHtml();
 }
 
 function renderProfile() {
@@ -524,6 +710,13 @@ function showPredictionDetail(id) {
             </div>
         ` : ''}
 
+        <div class="ai-summary" style="margin-top: 1.5rem;">
+            <h3>✨ AI Insight</h3>
+            <div id="prediction-insight" style="white-space: pre-wrap; line-height: 1.8;">
+                <em style="color: var(--text-secondary);">Generating insight...</em>
+            </div>
+        </div>
+
         <div style="margin-top: 2rem;">
             <button class="btn btn-danger" data-action="delete" data-id="${prediction.id}">
                 Delete Prediction
@@ -549,6 +742,22 @@ function showPredictionDetail(id) {
 
     modal.classList.remove('hidden');
     modal.classList.add('active');
+
+    loadPredictionInsight(prediction.id);
+}
+
+async function loadPredictionInsight(id) {
+    const insight = document.getElementById('prediction-insight');
+    try {
+        await streamAIText(`${API_BASE_URL}/predictions/${id}/ai_insight/stream/`, (text) => {
+            if (insight.isConnected) insight.textContent = text;
+        }, () => fetchAIJobResult(`${API_BASE_URL}/predictions/${id}/ai_insight/`));
+    } catch (error) {
+        console.error('Error generating AI insight:', error);
+        if (insight.isConnected) {
+            insight.innerHTML = '<em style="color: var(--danger-color);">AI insight unavailable.</em>';
+        }
+    }
 }
 
 function closeModal() {
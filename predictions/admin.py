@@ -1,12 +1,34 @@
 from django.contrib import admin
-from .models import Prediction, UserProfile
+from .models import AIJob, AIUsage, CalibrationSummary, Prediction, PredictionInsight, UserProfile
 
 @admin.register(Prediction)
 class PredictionAdmin(admin.ModelAdmin):
-    list_display = ['description', 'probability', 'resolved', 'outcome', 'created_at']
+    list_display = ['description', 'owner', 'probability', 'resolved', 'outcome', 'created_at']
     list_filter = ['resolved', 'outcome']
+    list_select_related = ['owner']
     search_fields = ['description']
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
-    list_display = ['name']
+    list_display = ['name', 'user']
+
+@admin.register(CalibrationSummary)
+class CalibrationSummaryAdmin(admin.ModelAdmin):
+    list_display = ['owner', 'bucket', 'count', 'sum_probability', 'sum_outcome', 'sum_squared_error']
+
+@admin.register(AIJob)
+class AIJobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'owner', 'status', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+
+@admin.register(AIUsage)
+class AIUsageAdmin(admin.ModelAdmin):
+    list_display = ['day', 'method', 'calls', 'prompt_tokens', 'response_tokens']
+    list_filter = ['method']
+    date_hierarchy = 'day'
+
+@admin.register(PredictionInsight)
+class PredictionInsightAdmin(admin.ModelAdmin):
+    list_display = ['prediction', 'generated_at']
+    list_select_related = ['prediction']
+    search_fields = ['prediction__description', 'text']
@@ -0,0 +1,107 @@
+"""
+Async versions of the AI endpoints.
+
+Under an ASGI server these await the Gemini client directly, so a single
+worker can keep many slow model calls in flight without a thread (or a job)
+per request.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from .gemini_service import get_gemini_service
+from .insights import stored_insight
+from .models import Prediction, owner_id
+from .stats import build_stats, summary_buckets
+from .stream_views import aevent_stream, streaming_response
+from .throttling import rate_limited
+
+
+@require_GET
+@rate_limited
+async def ai_suggest(request):
+    """Get AI-generated prediction suggestions"""
+    try:
+        # Get past predictions to provide context
+        past_predictions = [
+            description async for description in
+            Prediction.objects.owned_by(await request.auser()).values_list('description', flat=True)[:10]
+        ]
+
+        gemini = get_gemini_service()
+        suggestions = await gemini.agenerate_prediction_suggestions(past_predictions)
+        return JsonResponse({'suggestions': suggestions})
+    except Exception as e:
+        return JsonResponse({'error': f'AI service error: {str(e)}'}, status=500)
+
+
+@require_GET
+@rate_limited
+async def ai_insight(request, pk):
+    """Get AI insight for a specific prediction"""
+    try:
+        prediction = await Prediction.objects.owned_by(await request.auser()).aget(pk=pk)
+    except Prediction.DoesNotExist:
+        return JsonResponse({'detail': 'No Prediction matches the given query.'}, status=404)
+
+    prediction_data = prediction.insight_data()
+
+    try:
+        insight = await sync_to_async(stored_insight)(prediction)
+        if insight is None:
+            gemini = get_gemini_service()
+            insight = await gemini.agenerate_prediction_insight(prediction_data)
+        return JsonResponse({'insight': insight})
+    except Exception as e:
+        return JsonResponse({'error': f'AI service error: {str(e)}'}, status=500)
+
+
+@require_GET
+@rate_limited
+async def ai_summary(request):
+    """Get calibration stats together with an AI summary of them"""
+    stats_data = build_stats(await sync_to_async(summary_buckets)(owner_id(await request.auser())))
+
+    if stats_data['resolved_predictions'] > 0:
+        try:
+            gemini = get_gemini_service()
+            stats_data['ai_summary'] = await gemini.agenerate_calibration_summary(stats_data)
+        except Exception as e:
+            stats_data['ai_summary'] = f"AI summary unavailable: {str(e)}"
+
+    return JsonResponse(stats_data)
+
+
+@require_GET
+@rate_limited
+async def ai_insight_stream(request, pk):
+    """Stream an AI insight for a specific prediction"""
+    try:
+        prediction = await Prediction.objects.owned_by(await request.auser()).aget(pk=pk)
+    except Prediction.DoesNotExist:
+        return JsonResponse({'detail': 'No Prediction matches the given query.'}, status=404)
+
+    async def chunks():
+        stored = await sync_to_async(stored_insight)(prediction)
+        if stored is not None:
+            yield stored
+            return
+        async for text in get_gemini_service().astream_prediction_insight(prediction.insight_data()):
+            yield text
+
+    return streaming_response(aevent_stream(chunks()))
+
+
+@require_GET
+@rate_limited
+async def ai_summary_stream(request):
+    """Stream an AI summary of the calibration stats"""
+    stats_data = build_stats(await sync_to_async(summary_buckets)(owner_id(await request.auser())))
+
+    async def chunks():
+        if not stats_data['resolved_predictions']:
+            raise ValueError('No resolved predictions to summarize')
+        async for text in get_gemini_service().astream_calibration_summary(stats_data):
+            yield text
+
+    return streaming_response(aevent_stream(chunks()))
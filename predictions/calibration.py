@@ -0,0 +1,498 @@
+"""
+Vectorized calibration analytics.
+
+Scored predictions are loaded once as two contiguous NumPy arrays and every
+metric is derived from a single ``np.digitize`` pass over the probabilities:
+per-bin counts and sums come from ``np.bincount`` and the rest is arithmetic
+on arrays with one element per bin. This is what ``stats`` uses when asked for
+configurable bins or the extended metrics; the default response is still
+served from the materialized ``CalibrationSummary``.
+"""
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+
+import django
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from .models import Prediction
+from .stats import MIN_BIN_COUNT, SCORED
+from .versions import PREDICTIONS, get_version, scoped
+
+UNIFORM = 'uniform'
+QUANTILE = 'quantile'
+BINNING_STRATEGIES = (UNIFORM, QUANTILE)
+
+MAX_BINS = 100
+# Quantile edges are computed from at most this many probabilities
+QUANTILE_SAMPLE_SIZE = 1_000_000
+
+# Probabilities are clipped away from 0 and 1 so log loss stays finite
+LOG_LOSS_EPSILON = 1e-15
+
+BOOTSTRAP_CONFIDENCE = 0.95
+MAX_BOOTSTRAP_RESAMPLES = 5000
+# Above this many draws (resamples x predictions) ``stats`` computes the
+# intervals in a background job instead of the request
+BOOTSTRAP_INLINE_MAX_DRAWS = 20_000_000
+# Resamples are drawn in blocks with their own seeds, so the intervals are
+# the same however the blocks are spread over processes
+BOOTSTRAP_BLOCK = 250
+BOOTSTRAP_SEED = 0
+# Index matrix size drawn at once (resamples x predictions)
+BOOTSTRAP_CHUNK_ELEMENTS = 4_000_000
+# Below this many draws (resamples x predictions) worker processes cost
+# more than they save
+BOOTSTRAP_PARALLEL_MIN_DRAWS = 50_000_000
+
+# Bin counts the chart can be asked for at once
+MAX_CHART_RESOLUTIONS = 5
+
+PERIODS = {'week': TruncWeek, 'month': TruncMonth}
+MAX_WINDOW = 100000
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def load_arrays(queryset):
+    """
+    Load the scored predictions of ``queryset`` as arrays.
+
+    Returns:
+        tuple: (probabilities, outcomes) float64 arrays of equal length,
+        outcomes being 1.0 or 0.0
+    """
+    rows = queryset.filter(SCORED).order_by().values_list('probability', 'outcome')
+    flat = np.fromiter(chain.from_iterable(rows.iterator(chunk_size=10000)), dtype=np.float64)
+    flat = flat.reshape(-1, 2)
+    return np.ascontiguousarray(flat[:, 0]), np.ascontiguousarray(flat[:, 1])
+
+
+# Bootstrap worker process pool singleton
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_bootstrap_pool():
+    """Get or create the pool of ``CALIBRATION_BOOTSTRAP_WORKERS`` processes."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: this runs on job threads of a threaded
+            # server, and a forked child can inherit locks held by other
+            # threads. Spawned workers import this module afresh.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.CALIBRATION_BOOTSTRAP_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _discard_bootstrap_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def bin_edges(probabilities, bins=10, strategy=UNIFORM):
+    """
+    Return the bin edges for ``probabilities``, from 0 to 1 inclusive.
+
+    Uniform bins are equally wide; quantile bins hold (roughly) equal numbers
+    of predictions. Quantile edges that coincide are merged, so fewer than
+    ``bins`` bins may come back.
+    """
+    if strategy == QUANTILE and len(probabilities):
+        # An evenly strided sample places the edges just as well and keeps
+        # the selection cheap for very large inputs
+        step = -(-len(probabilities) // QUANTILE_SAMPLE_SIZE)
+        inner = np.quantile(probabilities[::step], np.linspace(0, 1, bins + 1)[1:-1])
+        return np.unique(np.concatenate(([0.0], inner, [1.0])))
+    return np.linspace(0, 1, bins + 1)
+
+
+def _bootstrap_block(probabilities, outcomes, index, bin_count, resamples, seed):
+    """
+    Draw ``resamples`` bootstrap samples of the predictions.
+
+    Returns:
+        tuple: (frequencies, brier_scores); per-bin actual frequency of each
+        sample (NaN where a sample has nothing in a bin) and its Brier score
+    """
+    rng = np.random.default_rng(seed)
+    total = len(probabilities)
+    squared_error = (probabilities - outcomes) ** 2
+    frequencies = np.empty((resamples, bin_count))
+    brier_scores = np.empty(resamples)
+
+    step = max(1, BOOTSTRAP_CHUNK_ELEMENTS // total)
+    for start in range(0, resamples, step):
+        rows = min(step, resamples - start)
+        sample = rng.integers(0, total, size=(rows, total))
+        brier_scores[start:start + rows] = squared_error[sample].mean(axis=1)
+        # One bincount for all samples: key = sample row * bin_count + bin
+        keys = (np.arange(rows)[:, None] * bin_count + index[sample]).ravel()
+        counts = np.bincount(keys, minlength=rows * bin_count)
+        positives = np.bincount(keys, weights=outcomes[sample].ravel(), minlength=rows * bin_count)
+        with np.errstate(invalid='ignore'):
+            frequencies[start:start + rows] = (positives / counts).reshape(rows, bin_count)
+    return frequencies, brier_scores
+
+
+def bootstrap_intervals(probabilities, outcomes, index, bin_count, resamples, confidence=BOOTSTRAP_CONFIDENCE):
+    """
+    Percentile bootstrap intervals for the per-bin actual frequency and the
+    Brier score.
+
+    Large jobs are split over the ``CALIBRATION_BOOTSTRAP_WORKERS`` processes
+    of a pool shared by all requests.
+
+    Returns:
+        tuple: (frequency_intervals, brier_interval); the former is a
+        (bin_count, 2) array of lower and upper bounds
+    """
+    blocks = [
+        (start, min(BOOTSTRAP_BLOCK, resamples - start))
+        for start in range(0, resamples, BOOTSTRAP_BLOCK)
+    ]
+    seeds = np.random.SeedSequence(BOOTSTRAP_SEED).spawn(len(blocks))
+    args = [
+        (probabilities, outcomes, index, bin_count, size, seed)
+        for (start, size), seed in zip(blocks, seeds)
+    ]
+
+    results = None
+    parallel = settings.CALIBRATION_BOOTSTRAP_WORKERS > 1 and len(blocks) > 1
+    if parallel and len(probabilities) * resamples >= BOOTSTRAP_PARALLEL_MIN_DRAWS:
+        pool = get_bootstrap_pool()
+        try:
+            results = list(pool.map(_bootstrap_block, *zip(*args)))
+        except BrokenProcessPool:
+            # A worker died; the next call starts a new pool
+            _discard_bootstrap_pool(pool)
+    if results is None:
+        results = [_bootstrap_block(*block_args) for block_args in args]
+
+    frequencies = np.concatenate([frequency for frequency, brier in results])
+    brier_scores = np.concatenate([brier for frequency, brier in results])
+    tail = (1 - confidence) / 2 * 100
+    percentiles = [tail, 100 - tail]
+    frequency_intervals = np.nanpercentile(frequencies, percentiles, axis=0).T
+    brier_interval = np.percentile(brier_scores, percentiles)
+    return frequency_intervals, brier_interval
+
+
+def calibration_report(probabilities, outcomes, bins=10, strategy=UNIFORM, bootstrap=None):
+    """
+    Compute calibration metrics for arrays of probabilities and outcomes.
+
+    Every bin is half-open ``[lower, upper)`` except the last, which also
+    holds probability 1.
+
+    Returns:
+        dict: ``count``; ``brier_score`` with its Murphy decomposition
+        (``reliability``, ``resolution``, ``uncertainty``); ``log_loss``;
+        ``ece`` and ``mce`` (expected and maximum calibration error); and
+        ``bins``, one entry per non-empty bin. Metrics are None when there
+        are no predictions. With ``bootstrap`` set to a number of resamples,
+        ``brier_score_ci`` and each bin's ``actual_frequency_ci`` hold
+        ``BOOTSTRAP_CONFIDENCE`` intervals.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    outcomes = np.asarray(outcomes, dtype=np.float64)
+    total = len(probabilities)
+    edges = bin_edges(probabilities, bins, strategy)
+
+    if not total:
+        report = {
+            'count': 0, 'brier_score': None, 'reliability': None, 'resolution': None,
+            'uncertainty': None, 'log_loss': None, 'ece': None, 'mce': None, 'bins': [],
+        }
+        if bootstrap:
+            report['brier_score_ci'] = None
+        return report
+
+    # Bin once; everything per bin is derived from these three bincounts
+    index = np.digitize(probabilities, edges[1:-1], right=False)
+    bin_count = len(edges) - 1
+    counts = np.bincount(index, minlength=bin_count)
+    sum_probability = np.bincount(index, weights=probabilities, minlength=bin_count)
+    sum_outcome = np.bincount(index, weights=outcomes, minlength=bin_count)
+
+    filled = counts > 0
+    n = counts[filled]
+    avg_predicted = sum_probability[filled] / n
+    actual_frequency = sum_outcome[filled] / n
+    base_rate = outcomes.mean()
+
+    if bootstrap:
+        # Before error is reused in place below
+        frequency_intervals, brier_interval = bootstrap_intervals(
+            probabilities, outcomes, index, bin_count, bootstrap
+        )
+
+    gap = np.abs(avg_predicted - actual_frequency)
+    error = probabilities - outcomes
+    brier_score = error @ error / total
+    # |error| is the probability that was given to the outcome that did not
+    # happen, so 1 - |error| is the one given to the outcome that did.
+    # Computed in place: at millions of rows the temporaries cost more than
+    # the arithmetic.
+    likelihood = np.abs(error, out=error)
+    np.subtract(1, likelihood, out=likelihood)
+    np.maximum(likelihood, LOG_LOSS_EPSILON, out=likelihood)
+    log_loss = -np.log(likelihood, out=likelihood).sum() / total
+
+    lower, upper = edges[:-1][filled], edges[1:][filled]
+    report = {
+        'count': total,
+        'brier_score': float(brier_score),
+        'reliability': float(np.sum(n * (avg_predicted - actual_frequency) ** 2) / total),
+        'resolution': float(np.sum(n * (actual_frequency - base_rate) ** 2) / total),
+        'uncertainty': float(base_rate * (1 - base_rate)),
+        'log_loss': float(log_loss),
+        'ece': float(np.sum(n * gap) / total),
+        'mce': float(gap.max()),
+        'bins': [
+            {
+                'lower': float(lo),
+                'upper': float(hi),
+                'count': int(count),
+                'avg_predicted': float(predicted),
+                'actual_frequency': float(actual),
+            }
+            for lo, hi, count, predicted, actual in zip(lower, upper, n, avg_predicted, actual_frequency)
+        ],
+    }
+    if bootstrap:
+        report['brier_score_ci'] = [float(bound) for bound in brier_interval]
+        for bin_report, interval in zip(report['bins'], frequency_intervals[filled]):
+            bin_report['actual_frequency_ci'] = [float(bound) for bound in interval]
+    return report
+
+
+def calibration_metrics(queryset, bins=10, strategy=UNIFORM, bootstrap=None):
+    """``calibration_report`` for the scored predictions in ``queryset``."""
+    return calibration_report(*load_arrays(queryset), bins=bins, strategy=strategy, bootstrap=bootstrap)
+
+
+def _rounded(values, digits=4):
+    return [None if math.isnan(value) else round(value, digits) for value in values.tolist()]
+
+
+def calibration_chart(probabilities, outcomes, resolutions=(10,), strategy=UNIFORM):
+    """
+    The calibration curve at one or more numbers of bins, as parallel arrays.
+
+    Unlike ``calibration_report`` every bin is included (empty ones with a
+    count of 0 and null averages), so that ``edges``, which is one longer,
+    lines up with the other arrays.
+
+    Returns:
+        dict: ``count`` and ``resolutions``, one entry per bin count with
+        ``bins``, ``edges``, ``count``, ``avg_predicted`` and
+        ``actual_frequency``
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    outcomes = np.asarray(outcomes, dtype=np.float64)
+    curves = []
+    for bins in resolutions:
+        edges = bin_edges(probabilities, bins, strategy)
+        bin_count = len(edges) - 1
+        index = np.digitize(probabilities, edges[1:-1], right=False)
+        counts = np.bincount(index, minlength=bin_count)
+        with np.errstate(invalid='ignore'):
+            avg_predicted = np.bincount(index, weights=probabilities, minlength=bin_count) / counts
+            actual_frequency = np.bincount(index, weights=outcomes, minlength=bin_count) / counts
+        curves.append({
+            'bins': bins,
+            'edges': _rounded(edges),
+            'count': counts.tolist(),
+            'avg_predicted': _rounded(avg_predicted),
+            'actual_frequency': _rounded(actual_frequency),
+        })
+    return {'count': len(probabilities), 'resolutions': curves}
+
+
+def _window_metrics(index, probabilities, outcomes, bin_count, lower, upper):
+    """
+    Brier score and ECE of the predictions in each window ``[lower, upper)``.
+
+    Uses prefix sums, so any number of (overlapping) windows costs one pass
+    over the data plus a binary search per window and bin.
+
+    Returns:
+        tuple: (counts, brier_scores, eces) arrays, one element per window;
+        metrics of empty windows are NaN
+    """
+    error = probabilities - outcomes
+    squared_error = np.concatenate(([0.0], np.cumsum(error * error)))
+    counts = upper - lower
+
+    # Per bin, n * |avg predicted - actual frequency| = |sum(p) - sum(o)|
+    gaps = np.zeros(len(lower))
+    for b in range(bin_count):
+        positions = np.flatnonzero(index == b)
+        if not len(positions):
+            continue
+        cumulative_error = np.concatenate(([0.0], np.cumsum(error[positions])))
+        first = np.searchsorted(positions, lower)
+        last = np.searchsorted(positions, upper)
+        gaps += np.abs(cumulative_error[last] - cumulative_error[first])
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        brier_scores = (squared_error[upper] - squared_error[lower]) / counts
+        eces = gaps / counts
+    return counts, brier_scores, eces
+
+
+def calibration_timeseries(queryset, period='week', window=100, bins=10):
+    """
+    Brier score and ECE per calendar period, plus over a rolling window.
+
+    Scored predictions are read in one query ordered by creation time. Each
+    period reports its own predictions and the ``window`` most recent ones
+    as of its end, so the rolling values smooth out sparse periods.
+
+    Returns:
+        list: one dict per period that has scored predictions, oldest first
+    """
+    rows = (
+        queryset.filter(SCORED)
+        .annotate(period=PERIODS[period]('created_at'))
+        # Matches the created_at index read backwards
+        .order_by('created_at', '-id')
+        .values_list('period', 'probability', 'outcome')
+    )
+    starts, boundaries, probabilities, outcomes = [], [], [], []
+    for position, (start, probability, outcome) in enumerate(rows.iterator(chunk_size=10000)):
+        if not starts or start != starts[-1]:
+            starts.append(start)
+            boundaries.append(position)
+        probabilities.append(probability)
+        outcomes.append(outcome)
+    if not starts:
+        return []
+
+    probabilities = np.array(probabilities, dtype=np.float64)
+    outcomes = np.array(outcomes, dtype=np.float64)
+    edges = bin_edges(probabilities, bins)
+    index = np.digitize(probabilities, edges[1:-1], right=False)
+    bin_count = len(edges) - 1
+
+    period_lower = np.array(boundaries)
+    period_upper = np.append(period_lower[1:], len(probabilities))
+    rolling_lower = np.maximum(period_upper - window, 0)
+    counts, brier_scores, eces = _window_metrics(
+        index, probabilities, outcomes, bin_count,
+        np.concatenate((period_lower, rolling_lower)), np.concatenate((period_upper, period_upper)),
+    )
+
+    periods = len(starts)
+    return [
+        {
+            'start': start,
+            'count': int(counts[i]),
+            'brier_score': float(brier_scores[i]),
+            'ece': float(eces[i]),
+            'rolling_count': int(counts[periods + i]),
+            'rolling_brier_score': float(brier_scores[periods + i]),
+            'rolling_ece': float(eces[periods + i]),
+        }
+        for i, start in enumerate(starts)
+    ]
+
+
+def _cache_key(name, owner, options):
+    # Read the version first: the data loaded afterwards is at least as new
+    data = scoped(PREDICTIONS, owner)
+    version = get_version(data)
+    return '{}:{}:{}:{}'.format(
+        name, data, version, ':'.join(f'{option}={value}' for option, value in sorted(options.items()))
+    )
+
+
+def _cached(name, owner, options, compute):
+    """
+    Return ``compute(queryset)`` for the predictions of user id ``owner``,
+    cached under their data version so that repeated requests between
+    writes are free.
+    """
+    key = _cache_key(name, owner, options)
+    result = cache.get(key)
+    if result is None:
+        result = compute(Prediction.objects.filter(owner_id=owner))
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def cached_calibration_metrics(owner=None, **options):
+    """``calibration_metrics`` for the predictions of user id ``owner``, cached per data version."""
+    return _cached('calibration', owner, options, lambda queryset: calibration_metrics(queryset, **options))
+
+
+def calibration_metrics_from_cache(owner=None, **options):
+    """``cached_calibration_metrics`` if they are cached for the current data version, else None."""
+    return cache.get(_cache_key('calibration', owner, options))
+
+
+def cached_calibration_timeseries(owner=None, **options):
+    """``calibration_timeseries`` for the predictions of user id ``owner``, cached per data version."""
+    return _cached(
+        'calibration-timeseries', owner, options, lambda queryset: calibration_timeseries(queryset, **options)
+    )
+
+
+def cached_calibration_chart(owner=None, resolutions=(10,), strategy=UNIFORM):
+    """``calibration_chart`` for the predictions of user id ``owner``, cached per data version."""
+    return _cached(
+        'calibration-chart',
+        owner,
+        {'resolutions': ','.join(map(str, resolutions)), 'strategy': strategy},
+        lambda queryset: calibration_chart(*load_arrays(queryset), resolutions=resolutions, strategy=strategy),
+    )
+
+
+def _percent(value):
+    return f"{round(value * 100, 1):g}"
+
+
+def stats_payload(report):
+    """
+    Format a ``calibration_report`` for the ``stats`` response.
+
+    Returns:
+        dict: ``calibration_bins`` in the same shape as the default stats
+        (percentages, bins with fewer than ``MIN_BIN_COUNT`` predictions
+        left out) and the rounded ``metrics``
+    """
+    metrics = {}
+    for name in ('brier_score', 'reliability', 'resolution', 'uncertainty', 'log_loss', 'ece', 'mce'):
+        metrics[name] = None if report[name] is None else round(report[name], 4)
+    if 'brier_score_ci' in report:
+        interval = report['brier_score_ci']
+        metrics['brier_score_ci'] = interval and [round(bound, 4) for bound in interval]
+
+    bins = []
+    for b in report['bins']:
+        if b['count'] < MIN_BIN_COUNT:
+            continue
+        calibration_bin = {
+            'range': f"{_percent(b['lower'])}-{_percent(b['upper'])}%",
+            'count': b['count'],
+            'avg_predicted': round(b['avg_predicted'] * 100, 1),
+            'actual_frequency': round(b['actual_frequency'] * 100, 1)
+        }
+        if 'actual_frequency_ci' in b:
+            calibration_bin['actual_frequency_ci'] = [round(bound * 100, 1) for bound in b['actual_frequency_ci']]
+        bins.append(calibration_bin)
+    return {'calibration_bins': bins, 'metrics': metrics}
@@ -1,38 +1,288 @@
 """
 Gemini AI Service for generating personalized insights about predictions.
 """
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import threading
+import time
+
 import google.generativeai as genai
+from asgiref.sync import sync_to_async
 from django.conf import settings
+from django.core.cache import caches
+
+from backend.metrics import timed
+
+from .resilience import GeminiUnavailable, ResilientModel
+from .usage import check_budget, record_usage
+
+MODEL_NAME = 'gemini-2.5-flash-lite-preview-09-2025'
+
+FALLBACK_SUGGESTIONS = [
+    {"description": "It will rain in my city this week", "confidence": 50},
+    {"description": "I will complete my main work project by the end of this month", "confidence": 70},
+    {"description": "A major tech company will announce a new product in the next 30 days", "confidence": 60}
+]
+
+# Served while Gemini is unavailable (see predictions.resilience)
+FALLBACK_INSIGHT = "AI insights are temporarily unavailable. Please try again in a few minutes."
+FALLBACK_SUMMARY = "The AI summary is temporarily unavailable. Please try again in a few minutes."
+
+
+class ResponseCache:
+    """
+    Cache of Gemini responses keyed by a hash of the model name and prompt.
+
+    Entries live in a size-bounded in-memory LRU and, when ``cache_alias``
+    names a Django cache, in that cache as well so they survive restarts and
+    are shared between workers.
+    """
+
+    def __init__(self, max_entries=512, cache_alias=None):
+        self.max_entries = max_entries
+        self.cache_alias = cache_alias
+        self._entries = OrderedDict()  # key -> (expires_at, text)
+        self._lock = threading.Lock()
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    @staticmethod
+    def make_key(model_name, prompt):
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key, method, record_miss=True):
+        """Return the cached text for ``key`` or None, counting hits and misses per method."""
+        entry = self._memory_get(key)
+        if entry is None and self.cache_alias:
+            entry = caches[self.cache_alias].get(f"gemini:{key}")
+            if entry is not None:
+                self._remember(key, entry)
+        return self._record(entry, method, record_miss)
+
+    async def aget(self, key, method, record_miss=True):
+        """Async version of ``get``."""
+        entry = self._memory_get(key)
+        if entry is None and self.cache_alias:
+            entry = await caches[self.cache_alias].aget(f"gemini:{key}")
+            if entry is not None:
+                self._remember(key, entry)
+        return self._record(entry, method, record_miss)
+
+    def set(self, key, text, ttl):
+        entry = (time.time() + ttl, text)
+        self._remember(key, entry)
+        if self.cache_alias:
+            caches[self.cache_alias].set(f"gemini:{key}", entry, timeout=ttl)
+
+    async def aset(self, key, text, ttl):
+        """Async version of ``set``."""
+        entry = (time.time() + ttl, text)
+        self._remember(key, entry)
+        if self.cache_alias:
+            await caches[self.cache_alias].aset(f"gemini:{key}", entry, timeout=ttl)
+
+    def _memory_get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        return entry
+
+    def _record(self, entry, method, record_miss):
+        with self._lock:
+            if entry is not None:
+                self.hits[method] += 1
+                return entry[1]
+            if record_miss:
+                self.misses[method] += 1
+        return None
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def counters(self):
+        """Hit/miss counters per method."""
+        with self._lock:
+            methods = set(self.hits) | set(self.misses)
+            return {
+                method: {'hits': self.hits[method], 'misses': self.misses[method]}
+                for method in sorted(methods)
+            }
 
 
 class GeminiService:
     """Service class for interacting with Google's Gemini API."""
 
-    def __init__(self):
-        """Initialize the Gemini service with API key from settings."""
-        if not settings.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is not configured in settings")
-
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        # Use Gemini 2.5 Flash Lite preview model
-        self.model = genai.GenerativeModel('gemini-2.5-flash-lite-preview-09-2025')
+    def __init__(self, model=None):
+        """
+        Initialize the Gemini service with API key from settings.
 
-    def generate_prediction_insight(self, prediction_data):
+        Args:
+            model: Optional object with a ``generate_content`` method to use
+                instead of the Gemini API (e.g. a local fake in tests)
         """
-        Generate personalized insights for a prediction.
+        self.cache = ResponseCache(
+            max_entries=settings.GEMINI_CACHE_MAX_ENTRIES,
+            cache_alias=settings.GEMINI_CACHE_ALIAS,
+        )
+
+        if model is None:
+            if not settings.GEMINI_API_KEY:
+                raise ValueError("GEMINI_API_KEY is not configured in settings")
+
+            genai.configure(api_key=settings.GEMINI_API_KEY)
+            # Use Gemini 2.5 Flash Lite preview model
+            model = genai.GenerativeModel(MODEL_NAME)
+        self.model = model
+        # All calls go through the deadline/retry/breaker/concurrency rules
+        self.client = ResilientModel(model)
+
+    @property
+    def model_name(self):
+        return getattr(self.model, 'model_name', type(self.model).__name__)
+
+    def cache_key(self, prompt):
+        return ResponseCache.make_key(self.model_name, prompt)
+
+    def cached_response(self, method, prompt):
+        """Return the cached response text for ``prompt`` without calling the model."""
+        return self.cache.get(self.cache_key(prompt), method, record_miss=False)
+
+    def _generate(self, method, prompt, usages=None):
+        """
+        Generate text for ``prompt``, serving and storing it in the response cache.
+
+        Model calls are checked against the daily budgets and their token
+        usage is recorded (see predictions.usage).
 
         Args:
-            prediction_data (dict): Dictionary containing prediction information
-                - description: The prediction description
-                - probability: The predicted probability (0.0-1.0)
-                - resolved: Whether the prediction is resolved
-                - outcome: The actual outcome (if resolved)
-                - created_at: When the prediction was created
-                - resolve_by: When it should be resolved
+            method (str): Cache namespace, one of the ``GEMINI_CACHE_TTLS`` keys
+            prompt (str): The prompt text
+            usages (list): Append ``(method, usage_metadata)`` here instead of
+                recording it, for threads that should stay off the database;
+                the caller then checks the budget too
 
         Returns:
-            str: Generated insight text
+            str: Generated text
         """
+        key = self.cache_key(prompt)
+        text = self.cache.get(key, method)
+        if text is not None:
+            return text
+
+        if usages is None:
+            check_budget()
+        with timed('gemini'):
+            response = self.client.generate_content(prompt)
+        text = response.text
+        if usages is None:
+            record_usage(method, getattr(response, 'usage_metadata', None))
+        else:
+            usages.append((method, getattr(response, 'usage_metadata', None)))
+        ttl = settings.GEMINI_CACHE_TTLS.get(method, 0)
+        if ttl:
+            self.cache.set(key, text, ttl)
+        return text
+
+    async def _agenerate(self, method, prompt):
+        """Async version of ``_generate`` using the model's ``generate_content_async``."""
+        key = self.cache_key(prompt)
+        text = await self.cache.aget(key, method)
+        if text is not None:
+            return text
+
+        await sync_to_async(check_budget)()
+        with timed('gemini'):
+            response = await self.client.generate_content_async(prompt)
+        text = response.text
+        await sync_to_async(record_usage)(method, getattr(response, 'usage_metadata', None))
+        ttl = settings.GEMINI_CACHE_TTLS.get(method, 0)
+        if ttl:
+            await self.cache.aset(key, text, ttl)
+        return text
+
+    def _stream(self, method, prompt, fallback):
+        """
+        Like ``_generate`` but yield the text in chunks as the model produces them.
+
+        A cached response is yielded as a single chunk; a streamed one is
+        cached once it is complete. ``fallback`` is yielded instead if Gemini
+        is unavailable.
+        """
+        key = self.cache_key(prompt)
+        text = self.cache.get(key, method)
+        if text is not None:
+            yield text
+            return
+
+        parts = []
+        # Only the call is timed: the chunks usually arrive after the request's
+        # metrics have been recorded
+        try:
+            check_budget()
+            with timed('gemini'):
+                response = self.client.generate_content(prompt, stream=True)
+        except GeminiUnavailable:
+            yield fallback
+            return
+        usage = None
+        try:
+            for chunk in response:
+                # The last chunk has the totals
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        finally:
+            record_usage(method, usage)
+        ttl = settings.GEMINI_CACHE_TTLS.get(method, 0)
+        if ttl:
+            self.cache.set(key, ''.join(parts), ttl)
+
+    async def _astream(self, method, prompt, fallback):
+        """Async version of ``_stream``."""
+        key = self.cache_key(prompt)
+        text = await self.cache.aget(key, method)
+        if text is not None:
+            yield text
+            return
+
+        parts = []
+        try:
+            await sync_to_async(check_budget)()
+            with timed('gemini'):
+                response = await self.client.generate_content_async(prompt, stream=True)
+        except GeminiUnavailable:
+            yield fallback
+            return
+        usage = None
+        try:
+            async for chunk in response:
+                usage = getattr(chunk, 'usage_metadata', None) or usage
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        finally:
+            await sync_to_async(record_usage)(method, usage)
+        ttl = settings.GEMINI_CACHE_TTLS.get(method, 0)
+        if ttl:
+            await self.cache.aset(key, ''.join(parts), ttl)
+
+    def prediction_insight_prompt(self, prediction_data):
+        """Build the ``generate_prediction_insight`` prompt."""
         prob = prediction_data.get('probability') * 100
         resolved = prediction_data.get('resolved')
 
@@ -60,25 +310,179 @@ Write 1-2 short sentences in plain text (no markdown) about:
 - What to watch for when it resolves
 
 Be brief and conversational."""
+        return prompt
 
+    def generate_prediction_insight(self, prediction_data):
+        """
+        Generate personalized insights for a prediction.
+
+        Args:
+            prediction_data (dict): Dictionary containing prediction information
+                - description: The prediction description
+                - probability: The predicted probability (0.0-1.0)
+                - resolved: Whether the prediction is resolved
+                - outcome: The actual outcome (if resolved)
+                - created_at: When the prediction was created
+                - resolve_by: When it should be resolved
+
+        Returns:
+            str: Generated insight text
+        """
+        prompt = self.prediction_insight_prompt(prediction_data)
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            return self._generate('insight', prompt)
+        except GeminiUnavailable:
+            return FALLBACK_INSIGHT
         except Exception as e:
             return f"Error generating insight: {str(e)}"
 
-    def generate_calibration_summary(self, stats_data):
+    async def agenerate_prediction_insight(self, prediction_data):
+        """Async version of ``generate_prediction_insight``."""
+        prompt = self.prediction_insight_prompt(prediction_data)
+        try:
+            return await self._agenerate('insight', prompt)
+        except GeminiUnavailable:
+            return FALLBACK_INSIGHT
+        except Exception as e:
+            return f"Error generating insight: {str(e)}"
+
+    def stream_prediction_insight(self, prediction_data):
+        """Yield the ``generate_prediction_insight`` text as it is generated."""
+        return self._stream('insight', self.prediction_insight_prompt(prediction_data), FALLBACK_INSIGHT)
+
+    def astream_prediction_insight(self, prediction_data):
+        """Async version of ``stream_prediction_insight``."""
+        return self._astream('insight', self.prediction_insight_prompt(prediction_data), FALLBACK_INSIGHT)
+
+    def batch_insight_prompt(self, predictions):
         """
-        Generate a summary of overall calibration performance.
+        Build one prompt asking for insights on several predictions.
 
         Args:
-            stats_data (dict): Dictionary containing calibration statistics
-                - brier_score: Overall Brier score
-                - calibration_bins: List of calibration bins with predictions
+            predictions (dict): prediction id -> prediction data, as for
+                ``generate_prediction_insight``
+        """
+        entries = "\n".join(self._batch_insight_entry(pk, data) for pk, data in predictions.items())
+        return f"""Give a quick analysis of each of these predictions.
+
+PREDICTIONS:
+{entries}
+
+For a resolved prediction, write 2-3 short sentences analyzing whether the confidence was appropriate and one specific insight about it.
+For a pending prediction, write 1-2 short sentences about whether the confidence seems reasonable and what to watch for when it resolves.
+Use plain text (no markdown) and be conversational and helpful.
+
+Format your response as a JSON object mapping each prediction id to its analysis, like this:
+{{"<id>": "analysis text", "<another id>": "analysis text"}}
+
+IMPORTANT: Return ONLY the JSON object, no other text or formatting."""
+
+    @staticmethod
+    def _batch_insight_entry(pk, prediction_data):
+        prob = prediction_data.get('probability') * 100
+        if prediction_data.get('resolved'):
+            outcome = 'happened' if prediction_data.get('outcome') else 'did not happen'
+            status = f"resolved, it {outcome}"
+        else:
+            status = "still pending"
+        return f"- id {pk}: \"{prediction_data.get('description')}\" (confidence {prob:.0f}%, {status})"
+
+    def _batch_chunks(self, predictions):
+        """Split predictions into as few prompts as the batch limits allow."""
+        chunks, chunk, tokens = [], {}, 0
+        for pk, data in predictions.items():
+            # Rough token estimate: ~4 characters per token plus the answer
+            cost = len(self._batch_insight_entry(pk, data)) // 4 + settings.GEMINI_BATCH_TOKENS_PER_INSIGHT
+            if chunk and (tokens + cost > settings.GEMINI_BATCH_MAX_TOKENS
+                          or len(chunk) >= settings.GEMINI_BATCH_MAX_ITEMS):
+                chunks.append(chunk)
+                chunk, tokens = {}, 0
+            chunk[pk] = data
+            tokens += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _generate_insight_chunk(self, chunk, usages=None, only_generated=False):
+        try:
+            text = self._generate('insight_batch', self.batch_insight_prompt(chunk), usages).strip()
+            if text.startswith('```'):
+                text = text.split('```')[1]
+                if text.startswith('json'):
+                    text = text[4:]
+            answers = json.loads(text)
+        except GeminiUnavailable:
+            # Not cached, so the insights are generated once Gemini is back
+            return {} if only_generated else dict.fromkeys(chunk, FALLBACK_INSIGHT)
+        except Exception as e:
+            return {} if only_generated else {pk: f"Error generating insight: {str(e)}" for pk in chunk}
+
+        insights = {}
+        ttl = settings.GEMINI_CACHE_TTLS.get('insight', 0)
+        for pk, data in chunk.items():
+            insight = answers.get(str(pk)) if isinstance(answers, dict) else None
+            if not isinstance(insight, str):
+                if not only_generated:
+                    insights[pk] = "Error generating insight: missing from batch response"
+                continue
+            insights[pk] = insight
+            if ttl:
+                # Stored under the single-prediction prompt so ai_insight reuses it
+                self.cache.set(self.cache_key(self.prediction_insight_prompt(data)), insight, ttl)
+        return insights
+
+    def cached_prediction_insights(self, predictions):
+        """Return the cached insights among ``predictions`` (id -> data) as id -> text."""
+        insights = {}
+        for pk, data in predictions.items():
+            insight = self.cached_response('insight', self.prediction_insight_prompt(data))
+            if insight is not None:
+                insights[pk] = insight
+        return insights
+
+    def generate_prediction_insights(self, predictions, only_generated=False):
+        """
+        Generate insights for many predictions with as few model calls as possible.
+
+        Cached insights are reused; the rest are packed into prompts bounded
+        by ``GEMINI_BATCH_MAX_TOKENS``/``GEMINI_BATCH_MAX_ITEMS`` which run
+        concurrently, at most ``GEMINI_BATCH_CONCURRENCY`` at a time.
+
+        Args:
+            predictions (dict): prediction id -> prediction data, as for
+                ``generate_prediction_insight``
+            only_generated (bool): Leave out the predictions that got an
+                error or fallback text instead of an insight
 
         Returns:
-            str: Generated calibration summary
+            dict: prediction id -> insight text
         """
+        insights = self.cached_prediction_insights(predictions)
+        missing = {pk: data for pk, data in predictions.items() if pk not in insights}
+        chunks = self._batch_chunks(missing)
+        if len(chunks) == 1:
+            insights.update(self._generate_insight_chunk(chunks[0], only_generated=only_generated))
+        elif chunks:
+            try:
+                check_budget()
+            except GeminiUnavailable:
+                if not only_generated:
+                    insights.update(dict.fromkeys(missing, FALLBACK_INSIGHT))
+                return insights
+            # The threads leave the usage to this one, which has a database connection
+            usages = []
+            workers = min(len(chunks), settings.GEMINI_BATCH_CONCURRENCY)
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='gemini-batch') as pool:
+                for chunk_insights in pool.map(
+                    lambda chunk: self._generate_insight_chunk(chunk, usages, only_generated), chunks
+                ):
+                    insights.update(chunk_insights)
+            for method, usage_metadata in usages:
+                record_usage(method, usage_metadata)
+        return insights
+
+    def calibration_summary_prompt(self, stats_data):
+        """Build the ``generate_calibration_summary`` prompt."""
         brier_score = stats_data.get('brier_score', 0)
         total = stats_data.get('total_predictions', 0)
         resolved = stats_data.get('resolved_predictions', 0)
@@ -107,23 +511,48 @@ Focus on:
 3. One specific actionable tip to improve
 
 Keep it conversational and encouraging. Use simple percentages and comparisons."""
+        return prompt
 
-        try:
-            response = self.model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            return f"Error generating summary: {str(e)}"
-
-    def generate_prediction_suggestions(self, past_predictions=None):
+    def generate_calibration_summary(self, stats_data):
         """
-        Generate 3 relevant prediction suggestions for the user.
+        Generate a summary of overall calibration performance.
 
         Args:
-            past_predictions (list): Optional list of past prediction descriptions
+            stats_data (dict): Dictionary containing calibration statistics
+                - brier_score: Overall Brier score
+                - calibration_bins: List of calibration bins with predictions
 
         Returns:
-            list: Three prediction suggestions as dictionaries with 'description' and 'confidence' keys
+            str: Generated calibration summary
         """
+        prompt = self.calibration_summary_prompt(stats_data)
+        try:
+            return self._generate('summary', prompt)
+        except GeminiUnavailable:
+            return FALLBACK_SUMMARY
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    async def agenerate_calibration_summary(self, stats_data):
+        """Async version of ``generate_calibration_summary``."""
+        prompt = self.calibration_summary_prompt(stats_data)
+        try:
+            return await self._agenerate('summary', prompt)
+        except GeminiUnavailable:
+            return FALLBACK_SUMMARY
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    def stream_calibration_summary(self, stats_data):
+        """Yield the ``generate_calibration_summary`` text as it is generated."""
+        return self._stream('summary', self.calibration_summary_prompt(stats_data), FALLBACK_SUMMARY)
+
+    def astream_calibration_summary(self, stats_data):
+        """Async version of ``stream_calibration_summary``."""
+        return self._astream('summary', self.calibration_summary_prompt(stats_data), FALLBACK_SUMMARY)
+
+    def prediction_suggestions_prompt(self, past_predictions=None):
+        """Build the ``generate_prediction_suggestions`` prompt."""
         past_context = ""
         if past_predictions and len(past_predictions) > 0:
             past_list = "\n".join([f"- {p}" for p in past_predictions[:10]])
@@ -150,36 +579,58 @@ Format your response as a JSON array like this:
 ]
 
 IMPORTANT: Return ONLY the JSON array, no other text or formatting."""
+        return prompt
+
+    @staticmethod
+    def parse_suggestions(text):
+        """Parse the JSON array returned for a suggestions prompt."""
+        text = text.strip()
+        # Remove markdown code blocks if present
+        if text.startswith('```'):
+            text = text.split('```')[1]
+            if text.startswith('json'):
+                text = text[4:]
+            text = text.strip()
+
+        suggestions = json.loads(text)
+        return suggestions[:3]  # Ensure we only return 3
 
+    def generate_prediction_suggestions(self, past_predictions=None):
+        """
+        Generate 3 relevant prediction suggestions for the user.
+
+        Args:
+            past_predictions (list): Optional list of past prediction descriptions
+
+        Returns:
+            list: Three prediction suggestions as dictionaries with 'description' and 'confidence' keys
+        """
+        prompt = self.prediction_suggestions_prompt(past_predictions)
         try:
-            response = self.model.generate_content(prompt)
-            import json
-            # Try to parse JSON response
-            text = response.text.strip()
-            # Remove markdown code blocks if present
-            if text.startswith('```'):
-                text = text.split('```')[1]
-                if text.startswith('json'):
-                    text = text[4:]
-                text = text.strip()
+            return self.parse_suggestions(self._generate('suggestions', prompt))
+        except Exception as e:
+            # Fallback suggestions if API fails
+            return list(FALLBACK_SUGGESTIONS)
 
-            suggestions = json.loads(text)
-            return suggestions[:3]  # Ensure we only return 3
+    async def agenerate_prediction_suggestions(self, past_predictions=None):
+        """Async version of ``generate_prediction_suggestions``."""
+        prompt = self.prediction_suggestions_prompt(past_predictions)
+        try:
+            return self.parse_suggestions(await self._agenerate('suggestions', prompt))
         except Exception as e:
             # Fallback suggestions if API fails
-            return [
-                {"description": "It will rain in my city this week", "confidence": 50},
-                {"description": "I will complete my main work project by the end of this month", "confidence": 70},
-                {"description": "A major tech company will announce a new product in the next 30 days", "confidence": 60}
-            ]
+            return list(FALLBACK_SUGGESTIONS)
 
 
-# Singleton instance
+# Singleton instance: its circuit breaker and call limit are per process
 _gemini_service = None
+_gemini_service_lock = threading.Lock()
 
 def get_gemini_service():
     """Get or create the Gemini service singleton."""
     global _gemini_service
     if _gemini_service is None:
-        _gemini_service = GeminiService()
+        with _gemini_service_lock:
+            if _gemini_service is None:
+                _gemini_service = GeminiService()
     return _gemini_service
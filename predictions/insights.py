@@ -0,0 +1,177 @@
+"""
+AI insights of resolved predictions, generated ahead of time.
+
+With ``AI_INSIGHT_WARMER`` set, resolving a prediction queues it for a
+background thread once the transaction commits; the ``warm_ai_insights``
+command works through the rest. Both hand the predictions to
+``GeminiService.generate_prediction_insights`` in batches, so the model is
+called within the ``GEMINI_BATCH_*`` and ``GEMINI_MAX_CONCURRENCY`` limits,
+and store the insights in ``PredictionInsight`` with the hash of the prompt
+they answer. A prediction whose stored hash matches its current prompt is
+skipped, and the AI endpoints answer from the store before asking Gemini.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .gemini_service import get_gemini_service
+from .models import Prediction, PredictionInsight
+
+logger = logging.getLogger(__name__)
+
+# Predictions handed to GeminiService at a time
+WARM_BATCH_SIZE = 200
+
+
+def prompt_hash(gemini, prediction):
+    """Hash of the model and the insight prompt of ``prediction``."""
+    return gemini.cache_key(gemini.prediction_insight_prompt(prediction.insight_data()))
+
+
+def stored_insights(predictions, gemini=None):
+    """
+    Return the stored insights among ``predictions`` that match their current
+    prompt, as id -> text.
+
+    Args:
+        predictions: Prediction instances
+    """
+    if gemini is None:
+        try:
+            gemini = get_gemini_service()
+        except ValueError:
+            # Gemini is not configured, so there is nothing to match
+            return {}
+    hashes = {prediction.pk: prompt_hash(gemini, prediction) for prediction in predictions}
+    rows = PredictionInsight.objects.filter(prediction_id__in=hashes).values_list('prediction_id', 'prompt_hash', 'text')
+    return {pk: text for pk, stored_hash, text in rows if hashes[pk] == stored_hash}
+
+
+def stored_insight(prediction):
+    """The stored insight of ``prediction`` if it matches its current prompt, else None."""
+    return stored_insights([prediction]).get(prediction.pk)
+
+
+def warm(predictions, gemini=None):
+    """
+    Generate and store the insights of resolved ``predictions`` that have none
+    for their current prompt, in the order given.
+
+    Stops early if Gemini is unavailable (a whole batch fails).
+
+    Returns:
+        tuple: ``(stored, up to date)`` numbers of predictions
+    """
+    gemini = gemini or get_gemini_service()
+    stored = up_to_date = 0
+    batch = []
+    for prediction in predictions:
+        if prediction.resolved:
+            batch.append(prediction)
+        if len(batch) == WARM_BATCH_SIZE:
+            done, current = _warm_batch(gemini, batch)
+            stored, up_to_date, batch = stored + done, up_to_date + current, []
+            if not done and current < WARM_BATCH_SIZE:
+                return stored, up_to_date
+    if batch:
+        done, current = _warm_batch(gemini, batch)
+        stored, up_to_date = stored + done, up_to_date + current
+    return stored, up_to_date
+
+
+def _warm_batch(gemini, predictions):
+    hashes = {prediction.pk: prompt_hash(gemini, prediction) for prediction in predictions}
+    current = set(
+        PredictionInsight.objects.filter(prediction_id__in=hashes)
+        .filter(prompt_hash__in=set(hashes.values()))
+        .values_list('prediction_id', 'prompt_hash')
+    )
+    missing = {
+        str(prediction.pk): prediction for prediction in predictions
+        if (prediction.pk, hashes[prediction.pk]) not in current
+    }
+    if not missing:
+        return 0, len(predictions)
+
+    insights = gemini.generate_prediction_insights(
+        {pk: prediction.insight_data() for pk, prediction in missing.items()}, only_generated=True
+    )
+    now = timezone.now()
+    PredictionInsight.objects.bulk_create(
+        [
+            PredictionInsight(
+                prediction=missing[pk], prompt_hash=hashes[missing[pk].pk], text=text, generated_at=now
+            )
+            for pk, text in insights.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['prediction'],
+        update_fields=['prompt_hash', 'text', 'generated_at'],
+    )
+    return len(insights), len(predictions) - len(missing)
+
+
+class InsightWarmer:
+    """
+    Background thread generating the insights of just resolved predictions,
+    most recently resolved first.
+    """
+
+    def __init__(self):
+        self._pending = []  # prediction ids, the most recent last
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def schedule(self, pks):
+        """Queue predictions to warm, ahead of those already waiting."""
+        with self._lock:
+            pks = set(pks)
+            self._pending = [pk for pk in self._pending if pk not in pks] + list(pks)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='insight-warmer', daemon=True)
+                self._thread.start()
+
+    def wait(self):
+        """Block until everything queued so far has been warmed."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._thread = None
+                        return
+                    pks = self._pending[-WARM_BATCH_SIZE:][::-1]
+                    del self._pending[-WARM_BATCH_SIZE:]
+                try:
+                    predictions = Prediction.objects.in_bulk(pks)
+                    warm(predictions[pk] for pk in pks if pk in predictions)
+                except Exception:
+                    logger.exception('Warming %d AI insights failed', len(pks))
+        finally:
+            connection.close()
+
+
+warmer = InsightWarmer()
+
+
+def warm_later(pks):
+    """
+    Warm the insights of predictions ``pks`` once the current transaction
+    commits, if ``AI_INSIGHT_WARMER`` is set. With ``AI_JOBS_EAGER`` they
+    are warmed synchronously instead, like the AI jobs.
+    """
+    if not settings.AI_INSIGHT_WARMER:
+        return
+    pks = list(pks)
+    if settings.AI_JOBS_EAGER:
+        warm(Prediction.objects.filter(pk__in=pks))
+    else:
+        transaction.on_commit(lambda: warmer.schedule(pks))
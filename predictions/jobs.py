@@ -0,0 +1,208 @@
+"""
+In-process background runner for Gemini requests and other slow work.
+
+Views create an ``AIJob`` row and return its id straight away; the request
+itself runs on a small thread pool and the result is stored on the job for
+clients to poll at ``/api/ai_jobs/{id}/``. Besides the Gemini requests this
+runs the bootstrap confidence intervals too large for a ``stats`` request.
+
+Jobs are kept for ``AI_JOB_RETENTION_DAYS`` after they finish. Jobs that
+are still pending or running ``AI_JOB_STALE_AFTER`` seconds after they were
+queued, such as those lost when a process restarted, are marked failed.
+``purge_jobs`` does both; it runs at most every ``PURGE_INTERVAL`` seconds
+when jobs are queued and from the ``purge_ai_jobs`` command.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .calibration import calibration_metrics_from_cache, cached_calibration_metrics, stats_payload
+from .gemini_service import get_gemini_service
+from .models import AIJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    AIJob.KIND_SUMMARY: lambda payload: get_gemini_service().generate_calibration_summary(payload),
+    AIJob.KIND_INSIGHT: lambda payload: get_gemini_service().generate_prediction_insight(payload),
+    AIJob.KIND_SUGGESTIONS: lambda payload: get_gemini_service().generate_prediction_suggestions(
+        payload.get('past_predictions')
+    ),
+    AIJob.KIND_INSIGHTS: lambda payload: {
+        **payload.get('stored', {}), **get_gemini_service().generate_prediction_insights(payload['predictions'])
+    },
+    AIJob.KIND_CALIBRATION: lambda payload: stats_payload(
+        cached_calibration_metrics(owner=payload['owner'], **payload['options'])
+    ),
+}
+
+# Lookups answering a job from a cache without calling the model or
+# computing anything
+CACHED_RESULTS = {
+    AIJob.KIND_SUMMARY: lambda payload: _cached_response('summary', 'calibration_summary_prompt', payload),
+    AIJob.KIND_INSIGHT: lambda payload: _cached_response('insight', 'prediction_insight_prompt', payload),
+    AIJob.KIND_INSIGHTS: lambda payload: _all_cached_insights(get_gemini_service(), payload),
+    AIJob.KIND_CALIBRATION: lambda payload: _cached_calibration(payload),
+}
+
+
+def _all_cached_insights(gemini, payload):
+    predictions = payload['predictions']
+    insights = gemini.cached_prediction_insights(predictions)
+    if len(insights) < len(predictions):
+        return None
+    return {**payload.get('stored', {}), **insights}
+
+
+def _cached_calibration(payload):
+    report = calibration_metrics_from_cache(owner=payload['owner'], **payload['options'])
+    return None if report is None else stats_payload(report)
+
+
+def _cached_response(method, prompt, payload):
+    gemini = get_gemini_service()
+    return gemini.cached_response(method, getattr(gemini, prompt)(payload))
+
+
+# Seconds between the purges run when jobs are queued
+PURGE_INTERVAL = 60 * 60
+
+# Thread pool singleton
+_executor = None
+
+_last_purge = None
+_purge_lock = threading.Lock()
+
+
+def get_executor():
+    """Get or create the job thread pool."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.AI_JOB_WORKERS, thread_name_prefix='ai-job')
+    return _executor
+
+
+def enqueue(kind, payload, result=None, owner=None):
+    """
+    Create a job for ``owner`` (an ``owner_id``) and schedule it once the
+    current transaction commits.
+
+    Jobs whose response is already cached, or given as ``result`` (e.g. a
+    stored insight), are created as finished. With
+    ``AI_JOBS_EAGER`` set the job runs synchronously instead, which is what
+    the tests use.
+
+    Returns:
+        AIJob: the created job
+    """
+    _purge_now_and_then()
+    if result is None:
+        result = cached_result(kind, payload)
+    if result is not None:
+        return AIJob.objects.create(
+            owner_id=owner, kind=kind, payload=payload, status=AIJob.STATUS_SUCCEEDED,
+            result=result, finished_at=timezone.now()
+        )
+
+    job = AIJob.objects.create(owner_id=owner, kind=kind, payload=payload)
+    if settings.AI_JOBS_EAGER:
+        run_job(job.pk)
+        job.refresh_from_db()
+    else:
+        transaction.on_commit(lambda: get_executor().submit(_run_in_thread, job.pk))
+    return job
+
+
+def enqueue_once(kind, payload, owner=None):
+    """
+    ``enqueue``, unless ``owner`` already has a job of this kind and payload
+    pending or running (and not yet stale): return that one rather than do
+    the work twice.
+    """
+    job = AIJob.objects.filter(
+        owner_id=owner,
+        kind=kind,
+        payload=payload,
+        status__in=[AIJob.STATUS_PENDING, AIJob.STATUS_RUNNING],
+        created_at__gte=timezone.now() - timedelta(seconds=settings.AI_JOB_STALE_AFTER),
+    ).order_by('created_at').first()
+    return job or enqueue(kind, payload, owner=owner)
+
+
+def cached_result(kind, payload):
+    """Return the cached result for a job, or None if it has to run."""
+    lookup = CACHED_RESULTS.get(kind)
+    if lookup is None:
+        return None
+    try:
+        return lookup(payload)
+    except Exception:
+        return None
+
+
+def run_job(job_id):
+    """Run a pending job and store its result or error."""
+    updated = AIJob.objects.filter(pk=job_id, status=AIJob.STATUS_PENDING).update(status=AIJob.STATUS_RUNNING)
+    if not updated:
+        return
+    job = AIJob.objects.get(pk=job_id)
+
+    try:
+        result = HANDLERS[job.kind](job.payload)
+    except Exception as e:
+        logger.exception('AI job %s failed', job_id)
+        job.status = AIJob.STATUS_FAILED
+        job.error = str(e)
+    else:
+        job.status = AIJob.STATUS_SUCCEEDED
+        job.result = result
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'finished_at'])
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        # Worker threads get their own connection; don't leak it.
+        connection.close()
+
+
+def purge_jobs(now=None):
+    """
+    Delete jobs finished more than ``AI_JOB_RETENTION_DAYS`` ago and mark
+    jobs queued more than ``AI_JOB_STALE_AFTER`` seconds ago that are still
+    pending or running as failed.
+
+    Returns:
+        tuple: ``(deleted, failed)`` numbers of jobs
+    """
+    now = now or timezone.now()
+    deleted, _ = AIJob.objects.filter(
+        status__in=[AIJob.STATUS_SUCCEEDED, AIJob.STATUS_FAILED],
+        finished_at__lt=now - timedelta(days=settings.AI_JOB_RETENTION_DAYS),
+    ).delete()
+    failed = AIJob.objects.filter(
+        status__in=[AIJob.STATUS_PENDING, AIJob.STATUS_RUNNING],
+        created_at__lt=now - timedelta(seconds=settings.AI_JOB_STALE_AFTER),
+    ).update(status=AIJob.STATUS_FAILED, error='The job did not finish in time', finished_at=now)
+    return deleted, failed
+
+
+def _purge_now_and_then():
+    global _last_purge
+    with _purge_lock:
+        if _last_purge is not None and time.monotonic() - _last_purge < PURGE_INTERVAL:
+            return
+        _last_purge = time.monotonic()
+    try:
+        with transaction.atomic():
+            purge_jobs()
+    except Exception:
+        logger.exception('Purging AI jobs failed')
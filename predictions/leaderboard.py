@@ -0,0 +1,141 @@
+"""
+Calibration compared across users: a leaderboard and cohort curves.
+
+Both are computed from the per-owner ``CalibrationSummary`` rows in one
+grouped query, so the cost grows with the number of users (a dozen summary
+rows each) and not with the number of predictions. Cohorts are Django user
+groups.
+
+ECE here is over the ``stats`` buckets (predictions of 100% have a bucket
+of their own): the sum over buckets of |sum of probabilities - number of
+outcomes| divided by the number of resolved predictions.
+
+Results are cached under the ``LEADERBOARD`` data version, which owned
+prediction writes and group membership changes bump once they commit.
+"""
+from collections import defaultdict
+
+from django.contrib.auth.models import Group
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Abs
+
+from .models import CalibrationSummary
+from .response_cache import get_or_compute
+from .stats import UNSCORED, build_stats
+from .versions import LEADERBOARD, version_info
+
+ORDERINGS = ('brier_score', 'ece')
+DEFAULT_MIN_RESOLVED = 20
+
+
+def leaderboard(min_resolved=DEFAULT_MIN_RESOLVED, order='brier_score', cohort=None):
+    """
+    Rank users with at least ``min_resolved`` resolved predictions, best
+    (lowest) ``order`` first; ties go to the user with more resolved
+    predictions.
+
+    Args:
+        cohort: only rank members of the group with this name
+
+    Returns:
+        list: dicts with rank, user, resolved_predictions, brier_score and ece
+    """
+    summaries = CalibrationSummary.objects.filter(owner__isnull=False).exclude(bucket=UNSCORED)
+    if cohort is not None:
+        summaries = summaries.filter(owner__groups__name=cohort)
+    rows = (
+        summaries.order_by()
+        .values('owner__username')
+        .annotate(
+            resolved=Sum('count'),
+            squared_error=Sum('sum_squared_error'),
+            gap=Sum(Abs(F('sum_probability') - F('sum_outcome'))),
+        )
+        .filter(resolved__gte=max(min_resolved, 1))
+    )
+    entries = [
+        {
+            'user': row['owner__username'],
+            'resolved_predictions': row['resolved'],
+            'brier_score': round(row['squared_error'] / row['resolved'], 4),
+            'ece': round(row['gap'] / row['resolved'], 4),
+        }
+        for row in rows
+    ]
+    entries.sort(key=lambda entry: (entry[order], -entry['resolved_predictions'], entry['user']))
+    for rank, entry in enumerate(entries, 1):
+        entry['rank'] = rank
+    return entries
+
+
+def cohort_comparison(names=None):
+    """
+    The ``stats`` of each cohort's predictions taken together, plus ECE and
+    the number of members.
+
+    Args:
+        names: group names to compare, or None for every group
+
+    Returns:
+        list: one dict per cohort, by name
+    """
+    groups = Group.objects.order_by('name').annotate(members=Count('user'))
+    # One filter on the groups relation: each filter() call joins it again,
+    # which would count a member of several groups once per group
+    if names is not None:
+        groups = groups.filter(name__in=names)
+        summaries = CalibrationSummary.objects.filter(owner__groups__name__in=names)
+    else:
+        summaries = CalibrationSummary.objects.filter(owner__groups__isnull=False)
+
+    buckets = defaultdict(dict)
+    for row in (
+        summaries.order_by()
+        .values('owner__groups__name', 'bucket')
+        .annotate(
+            count=Sum('count'),
+            sum_probability=Sum('sum_probability'),
+            sum_outcome=Sum('sum_outcome'),
+            sum_squared_error=Sum('sum_squared_error'),
+        )
+    ):
+        buckets[row.pop('owner__groups__name')][row['bucket']] = row
+
+    cohorts = []
+    for group in groups:
+        cohort_buckets = buckets.get(group.name, {})
+        stats = build_stats(cohort_buckets)
+        gap = sum(
+            abs(b['sum_probability'] - b['sum_outcome']) for bucket, b in cohort_buckets.items() if bucket != UNSCORED
+        )
+        resolved = stats['resolved_predictions']
+        cohorts.append({
+            'cohort': group.name,
+            'members': group.members,
+            **stats,
+            'ece': round(gap / resolved, 4) if resolved else None,
+        })
+    return cohorts
+
+
+def _cached(name, options, compute):
+    version, updated_at = version_info(LEADERBOARD)
+    stamp = updated_at.timestamp() if updated_at else 0
+    key = '{}:{}:{}:{}'.format(
+        name, version, stamp, ':'.join(f'{option}={value}' for option, value in sorted(options.items()))
+    )
+    return get_or_compute(key, compute)
+
+
+def cached_leaderboard(**options):
+    """``leaderboard``, cached per leaderboard data version."""
+    return _cached('leaderboard', options, lambda: leaderboard(**options))
+
+
+def cached_cohort_comparison(names=None):
+    """``cohort_comparison``, cached per leaderboard data version."""
+    return _cached(
+        'leaderboard-cohorts',
+        {'names': names and ','.join(names)},
+        lambda: cohort_comparison(names),
+    )
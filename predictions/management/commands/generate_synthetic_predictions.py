@@ -0,0 +1,95 @@
+import math
+import random
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from predictions.management.utils import owner_for
+from predictions.models import Prediction
+from predictions.signals import summary_updates_paused
+from predictions.stats import rebuild_summary, record_changes
+
+
+def true_probability(probability, sharpness):
+    """
+    Chance that a prediction made at ``probability`` comes true.
+
+    Scales the log-odds by ``sharpness``: 1 is perfectly calibrated, below 1
+    the forecaster is overconfident (outcomes are closer to 50/50 than
+    predicted) and above 1 underconfident.
+    """
+    if probability <= 0.0 or probability >= 1.0:
+        return probability
+    log_odds = math.log(probability / (1 - probability)) * sharpness
+    return 1 / (1 + math.exp(-log_odds))
+
+
+class Command(BaseCommand):
+    help = 'Create synthetic predictions with a controllable calibration curve (for benchmarks and demos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help='Number of predictions to create')
+        parser.add_argument(
+            '--sharpness',
+            type=float,
+            default=1.0,
+            help='Calibration curve: 1 is perfectly calibrated, <1 overconfident, >1 underconfident',
+        )
+        parser.add_argument('--resolved', type=float, default=0.7, help='Fraction of predictions that are resolved')
+        parser.add_argument('--days', type=int, default=730, help='Spread creation times over this many past days')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows written per transaction')
+        parser.add_argument('--owner', help='Username the predictions belong to (default: unowned)')
+        parser.add_argument('--clear', action='store_true', help="Delete the owner's predictions first")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count < 0 or options['batch_size'] < 1:
+            raise CommandError('count must be >= 0 and --batch-size >= 1')
+        if not 0.0 <= options['resolved'] <= 1.0:
+            raise CommandError('--resolved must be between 0 and 1')
+
+        owner = owner_for(options['owner'])
+        if options['clear']:
+            self.clear(owner)
+
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        span = timedelta(days=options['days'])
+        created = 0
+        while created < count:
+            size = min(options['batch_size'], count - created)
+            predictions = []
+            for i in range(created, created + size):
+                # Forecasters favour round numbers
+                probability = round(rng.random(), 2)
+                resolved = rng.random() < options['resolved']
+                created_at = now - span * (1 - (i + 1) / count)
+                predictions.append(Prediction(
+                    id=uuid.UUID(int=rng.getrandbits(128), version=4),
+                    owner_id=owner,
+                    description=f'Synthetic prediction number {i}',
+                    probability=probability,
+                    created_at=created_at,
+                    resolve_by=created_at + timedelta(days=rng.randint(1, 60)),
+                    resolved=resolved,
+                    outcome=(rng.random() < true_probability(probability, options['sharpness'])) if resolved else None,
+                ))
+            with transaction.atomic():
+                Prediction.objects.bulk_create(predictions)
+                record_changes(added=[(p.probability, p.resolved, p.outcome) for p in predictions], owner=owner)
+            created += size
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} synthetic predictions'))
+
+    def clear(self, owner):
+        """
+        Delete the predictions of ``owner`` and rebuild the summary once,
+        rather than update it for every deleted prediction.
+        """
+        with transaction.atomic(), summary_updates_paused():
+            Prediction.objects.filter(owner_id=owner).delete()
+            rebuild_summary(Prediction.objects.all())
@@ -0,0 +1,182 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from predictions.management.utils import owner_for
+from predictions.models import Prediction
+from predictions.serializers import PredictionImportSerializer
+from predictions.stats import record_changes
+
+FORMATS = ('csv', 'ndjson')
+UPDATE_FIELDS = ['owner', 'description', 'probability', 'created_at', 'resolve_by', 'resolved', 'outcome']
+
+
+def read_csv(stream):
+    """Yield (line number, row, error) for each CSV record; empty cells are null."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, {key: value if value != '' else None for key, value in row.items()}, None
+
+
+def read_ndjson(stream):
+    """Yield (line number, row, error) for each non-blank NDJSON line."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'Invalid JSON: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, 'Expected a JSON object'
+            continue
+        yield line_number, row, None
+
+
+READERS = {'csv': read_csv, 'ndjson': read_ndjson}
+
+
+class Command(BaseCommand):
+    help = (
+        'Import predictions from a CSV or NDJSON file or stdin. Rows are validated like the API; '
+        'rows whose id already exists replace that prediction, so imports can be re-run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='File to import (.gz allowed), or - for stdin')
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Input format (default: from the file extension, csv for stdin)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows written per transaction',
+        )
+        parser.add_argument('--owner', help='Username the predictions belong to (default: unowned)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self.guess_format(path)
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+        self.owner = owner_for(options['owner'])
+
+        created = updated = rejected = 0
+        with self.open(path) as stream:
+            rows = READERS[input_format](stream)
+            while batch := list(islice(rows, batch_size)):
+                batch_created, batch_updated, errors = self.import_batch(batch, self.owner)
+                created += batch_created
+                updated += batch_updated
+                rejected += len(errors)
+                for line_number, error in errors:
+                    self.stderr.write(f'Line {line_number}: {error}')
+
+        summary = f'Imported {created + updated} predictions ({created} created, {updated} updated)'
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'{summary}, rejected {rejected} rows'))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
+
+    @staticmethod
+    def guess_format(path):
+        name = path.removesuffix('.gz')
+        for input_format in FORMATS:
+            if name.endswith(f'.{input_format}'):
+                return input_format
+        if path == '-':
+            return 'csv'
+        raise CommandError(f'Cannot tell the format of {path}; use --format')
+
+    @staticmethod
+    @contextmanager
+    def open(path):
+        if path == '-':
+            yield io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        elif path.endswith('.gz'):
+            with gzip.open(path, 'rt', encoding='utf-8', newline='') as stream:
+                yield stream
+        else:
+            with open(path, encoding='utf-8', newline='') as stream:
+                yield stream
+
+    def import_batch(self, batch, owner=None):
+        """
+        Validate and upsert one batch of rows in a single transaction, as
+        predictions of user id ``owner``.
+
+        Returns:
+            tuple: (created, updated, errors) with errors as (line number,
+            message) pairs
+        """
+        validator = PredictionImportSerializer()
+        errors = []
+        rows = {}
+        for line_number, row, error in batch:
+            if error is None:
+                try:
+                    data = validator.run_validation(row)
+                except ValidationError as e:
+                    error = json.dumps(e.detail)
+            if error is not None:
+                errors.append((line_number, error))
+                continue
+            # A later row with the same id wins, as if imported one by one
+            rows[data.get('id') or uuid.uuid4()] = data
+
+        if not rows:
+            return 0, 0, errors
+
+        with transaction.atomic():
+            existing = {
+                pk: (previous_owner, (probability, resolved, outcome), created_at)
+                for pk, previous_owner, probability, resolved, outcome, created_at in (
+                    Prediction.objects.select_for_update()
+                    .filter(pk__in=list(rows))
+                    .values_list('id', 'owner', 'probability', 'resolved', 'outcome', 'created_at')
+                )
+            }
+            now = timezone.now()
+            predictions = []
+            for pk, data in rows.items():
+                data = {**data, 'id': pk, 'owner_id': owner}
+                if data.get('created_at') is None:
+                    data['created_at'] = existing[pk][2] if pk in existing else now
+                predictions.append(Prediction(**data))
+
+            Prediction.objects.bulk_create(
+                predictions,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPDATE_FIELDS,
+            )
+            # Replaced rows may have belonged to someone else
+            removed = defaultdict(list)
+            for previous_owner, state, created_at in existing.values():
+                removed[previous_owner].append(state)
+            for previous_owner, states in removed.items():
+                if previous_owner != owner:
+                    record_changes(removed=states, owner=previous_owner)
+            record_changes(
+                removed=removed.get(owner, []),
+                added=[(p.probability, p.resolved, p.outcome) for p in predictions],
+                owner=owner,
+            )
+
+        return len(rows) - len(existing), len(existing), errors
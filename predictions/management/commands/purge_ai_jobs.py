@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from predictions.jobs import purge_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete AI jobs finished more than AI_JOB_RETENTION_DAYS ago and mark jobs still '
+        'pending or running after AI_JOB_STALE_AFTER seconds as failed'
+    )
+
+    def handle(self, *args, **options):
+        deleted, failed = purge_jobs()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} finished jobs, marked {failed} stale jobs failed'))
@@ -0,0 +1,48 @@
+import math
+
+from django.core.management.base import BaseCommand
+from predictions.models import Prediction
+from predictions.stats import ALL_BUCKETS, aggregate_owner_buckets, all_summary_buckets, rebuild_summary
+
+FIELDS = ['count', 'sum_probability', 'sum_outcome', 'sum_squared_error']
+
+
+class Command(BaseCommand):
+    help = "Recompute every owner's calibration summary from all predictions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report differences between the stored and recomputed summary',
+        )
+
+    def handle(self, *args, **options):
+        stored = all_summary_buckets()
+        if options['check']:
+            expected = aggregate_owner_buckets(Prediction.objects.all())
+        else:
+            expected = rebuild_summary(Prediction.objects.all())
+
+        drifted = 0
+        for owner in sorted(set(stored) | set(expected), key=lambda owner: (owner is not None, owner)):
+            label = 'Unowned' if owner is None else f'Owner {owner}'
+            for bucket in ALL_BUCKETS:
+                old = stored.get(owner, {}).get(bucket, {})
+                new = expected.get(owner, {}).get(bucket, {})
+                for field in FIELDS:
+                    old_value = old.get(field, 0)
+                    new_value = new.get(field, 0)
+                    if not math.isclose(old_value, new_value, rel_tol=1e-9, abs_tol=1e-9):
+                        drifted += 1
+                        self.stdout.write(f'{label} bucket {bucket} {field}: stored {old_value}, actual {new_value}')
+
+        if options['check']:
+            if drifted:
+                self.stdout.write(self.style.WARNING(f'Calibration summary is out of date ({drifted} values differ)'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Calibration summary is up to date'))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt calibration summary ({drifted} values corrected)')
+            )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from predictions.insights import WARM_BATCH_SIZE, warm
+from predictions.management.utils import owner_for
+from predictions.models import Prediction
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate and store the AI insights of resolved predictions, newest first, '
+        'skipping those already stored for their current prompt'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Only look at this many of the newest resolved predictions')
+        parser.add_argument('--owner', help="Only this user's predictions")
+        parser.add_argument('--all-owners', action='store_true', help="Every user's predictions (default: unowned)")
+
+    def handle(self, *args, **options):
+        if options['limit'] is not None and options['limit'] < 1:
+            raise CommandError('--limit must be >= 1')
+        if options['owner'] and options['all_owners']:
+            raise CommandError('--owner and --all-owners cannot be combined')
+
+        predictions = Prediction.objects.filter(resolved=True)
+        if not options['all_owners']:
+            predictions = predictions.filter(owner_id=owner_for(options['owner']))
+        # Predictions do not record when they were resolved; the newest are
+        # the likeliest to have been resolved recently
+        predictions = predictions.order_by('-created_at', 'id').only(
+            'id', 'description', 'probability', 'created_at', 'resolve_by', 'resolved', 'outcome'
+        )
+        if options['limit']:
+            predictions = predictions[:options['limit']]
+
+        stored, up_to_date = warm(predictions.iterator(chunk_size=WARM_BATCH_SIZE))
+        self.stdout.write(self.style.SUCCESS(f'Stored {stored} insights ({up_to_date} already up to date)'))
@@ -0,0 +1,15 @@
+"""
+Helpers shared by the management commands.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import CommandError
+
+
+def owner_for(username):
+    """The user id of ``username``, or None for unowned predictions."""
+    if username is None:
+        return None
+    try:
+        return get_user_model().objects.get_by_natural_key(username).pk
+    except get_user_model().DoesNotExist:
+        raise CommandError(f'No user named {username}')
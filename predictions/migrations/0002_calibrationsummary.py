@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:01
+
+from django.db import migrations, models
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+
+# The bucketing of predictions.stats when this migration was written; kept
+# here so later changes to it cannot change what this migration does
+BIN_COUNT = 10
+BIN_SIZE = 0.1
+UNSCORED = -1
+OUT_OF_RANGE = BIN_COUNT
+BIN_EDGES = [(i * BIN_SIZE, (i + 1) * BIN_SIZE) for i in range(BIN_COUNT)]
+ALL_BUCKETS = range(UNSCORED, OUT_OF_RANGE + 1)
+
+
+def aggregate_buckets(queryset):
+    whens = [When(Q(resolved=False) | Q(outcome__isnull=True), then=Value(UNSCORED))]
+    whens += [
+        When(probability__gte=lower, probability__lt=upper, then=Value(i))
+        for i, (lower, upper) in enumerate(BIN_EDGES)
+    ]
+    outcome = Case(When(outcome=True, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+    error = F('probability') - outcome
+    rows = (
+        queryset.order_by()
+        .annotate(bucket=Case(*whens, default=Value(OUT_OF_RANGE), output_field=IntegerField()))
+        .values('bucket')
+        .annotate(
+            count=Count('pk'),
+            sum_probability=Sum('probability'),
+            sum_outcome=Sum(Case(When(outcome=True, then=Value(1)), default=Value(0), output_field=IntegerField())),
+            sum_squared_error=Sum(error * error, output_field=FloatField()),
+        )
+    )
+    return {
+        row['bucket']: {
+            'count': row['count'],
+            'sum_probability': row['sum_probability'] or 0.0,
+            'sum_outcome': row['sum_outcome'] or 0,
+            'sum_squared_error': row['sum_squared_error'] or 0.0,
+        }
+        for row in rows
+    }
+
+
+def populate_summary(apps, schema_editor):
+    Prediction = apps.get_model('predictions', 'Prediction')
+    CalibrationSummary = apps.get_model('predictions', 'CalibrationSummary')
+    buckets = aggregate_buckets(Prediction.objects.all())
+    CalibrationSummary.objects.bulk_create([
+        CalibrationSummary(bucket=bucket, **buckets.get(bucket, {}))
+        for bucket in ALL_BUCKETS
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalibrationSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.SmallIntegerField(unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('sum_probability', models.FloatField(default=0.0)),
+                ('sum_outcome', models.BigIntegerField(default=0)),
+                ('sum_squared_error', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ['bucket'],
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
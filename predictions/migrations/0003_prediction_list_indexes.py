@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0002_calibrationsummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['-created_at', 'id'], name='prediction_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['resolved', '-created_at', 'id'], name='prediction_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['outcome', '-created_at', 'id'], name='prediction_outcome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['resolve_by'], name='prediction_resolve_by_idx'),
+        ),
+    ]
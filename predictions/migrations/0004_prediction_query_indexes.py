@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0003_prediction_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('outcome__isnull', False), ('resolved', True)), fields=['probability', 'outcome', 'resolved'], name='prediction_scored_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('resolved', False)), fields=['resolve_by'], name='prediction_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0005_aijob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aijob',
+            name='kind',
+            field=models.CharField(choices=[('summary', 'Calibration summary'), ('insight', 'Prediction insight'), ('suggestions', 'Prediction suggestions'), ('insights', 'Batch prediction insights')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+def create_versions(apps, schema_editor):
+    # Created up front so concurrent first writes only ever UPDATE the row
+    DataVersion = apps.get_model('predictions', 'DataVersion')
+    DataVersion.objects.create(name='predictions')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0006_aijob_insights_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
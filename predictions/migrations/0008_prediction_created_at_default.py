@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:26
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0007_dataversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prediction',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
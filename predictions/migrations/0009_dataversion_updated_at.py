@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_profile_version(apps, schema_editor):
+    DataVersion = apps.get_model('predictions', 'DataVersion')
+    DataVersion.objects.get_or_create(name='profile')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0008_prediction_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataversion',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(create_profile_version, migrations.RunPython.noop),
+    ]
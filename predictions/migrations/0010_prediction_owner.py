@@ -0,0 +1,96 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0009_dataversion_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='calibrationsummary',
+            options={'ordering': ['owner', 'bucket']},
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_resolved_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_outcome_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_resolve_by_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_scored_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='prediction',
+            name='prediction_due_idx',
+        ),
+        migrations.AddField(
+            model_name='calibrationsummary',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='prediction',
+            name='owner',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='predictions', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='user',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='prediction_profile', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='calibrationsummary',
+            name='bucket',
+            field=models.SmallIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['owner', '-created_at', 'id'], name='prediction_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['owner', 'resolved', '-created_at', 'id'], name='prediction_resolved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['owner', 'outcome', '-created_at', 'id'], name='prediction_outcome_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(fields=['owner', 'resolve_by'], name='prediction_resolve_by_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('outcome__isnull', False), ('resolved', True)), fields=['owner', 'probability', 'outcome', 'resolved'], name='prediction_scored_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='prediction',
+            index=models.Index(condition=models.Q(('resolved', False)), fields=['owner', 'resolve_by'], name='prediction_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='calibrationsummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', False)), fields=('owner', 'bucket'), name='calibration_summary_owner_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='calibrationsummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('owner__isnull', True)), fields=('bucket',), name='calibration_summary_unowned_bucket'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0010_prediction_owner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AIUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('method', models.CharField(max_length=20)),
+                ('calls', models.BigIntegerField(default=0)),
+                ('prompt_tokens', models.BigIntegerField(default=0)),
+                ('response_tokens', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'method'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'method'), name='ai_usage_day_method')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:54
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0011_aiusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionInsight',
+            fields=[
+                ('prediction', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stored_insight', serialize=False, to='predictions.prediction')),
+                ('prompt_hash', models.CharField(max_length=64)),
+                ('text', models.TextField()),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('predictions', '0013_aijob_owner'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='aijob',
+            name='kind',
+            field=models.CharField(choices=[('summary', 'Calibration summary'), ('insight', 'Prediction insight'), ('suggestions', 'Prediction suggestions'), ('insights', 'Batch prediction insights'), ('calibration', 'Calibration confidence intervals')], max_length=20),
+        ),
+    ]
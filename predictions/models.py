@@ -1,25 +1,251 @@
-from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.utils import timezone
 import uuid
 
+
+def owner_id(user):
+    """
+    The ``Prediction.owner`` id of ``user``'s data: None for anonymous users
+    (and None), who share the unowned predictions.
+    """
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+class PredictionQuerySet(models.QuerySet):
+    def owned_by(self, user):
+        """Predictions belonging to ``user`` (see ``owner_id``)."""
+        return self.filter(owner_id=owner_id(user))
+
+
 class Prediction(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Null for predictions made without logging in. Not indexed on its own:
+    # every index below leads with it.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='predictions',
+        db_index=False,
+    )
     description = models.TextField()
     probability = models.FloatField()  # 0.0 to 1.0
-    created_at = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add so that imports can keep the
+    # original creation times
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
     resolve_by = models.DateTimeField(null=True, blank=True)
     resolved = models.BooleanField(default=False)
     outcome = models.BooleanField(null=True, blank=True)
 
+    objects = PredictionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        # Every query is scoped to one owner, so every index leads with the
+        # owner and a user's queries only ever touch their own rows
+        indexes = [
+            # Keyset pagination of the list endpoint
+            models.Index(fields=['owner', '-created_at', 'id'], name='prediction_created_idx'),
+            # ?resolved= and ?outcome= filters, in pagination order
+            models.Index(fields=['owner', 'resolved', '-created_at', 'id'], name='prediction_resolved_idx'),
+            models.Index(fields=['owner', 'outcome', '-created_at', 'id'], name='prediction_outcome_idx'),
+            # ?resolve_by_after= / ?resolve_by_before= ranges
+            models.Index(fields=['owner', 'resolve_by'], name='prediction_resolve_by_idx'),
+            # Covering index for scans of scored predictions (SQLite only
+            # treats it as covering when the filtered columns are included)
+            models.Index(
+                fields=['owner', 'probability', 'outcome', 'resolved'],
+                condition=models.Q(resolved=True, outcome__isnull=False),
+                name='prediction_scored_idx',
+            ),
+            # "Due soon": pending predictions by resolve date
+            models.Index(
+                fields=['owner', 'resolve_by'],
+                condition=models.Q(resolved=False),
+                name='prediction_due_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.description[:50]} ({int(self.probability * 100)}%)"
 
+    def insight_data(self):
+        """The fields GeminiService uses to build an insight prompt."""
+        return {
+            'description': self.description,
+            'probability': self.probability,
+            'resolved': self.resolved,
+            'outcome': self.outcome,
+            'created_at': self.created_at,
+            'resolve_by': self.resolve_by
+        }
+
+    def save(self, *args, **kwargs):
+        # The calibration summary is updated from save signals; keep it in
+        # the same transaction as the row itself.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class CalibrationSummary(models.Model):
+    """
+    Running aggregates for one calibration bucket of one owner's predictions
+    (see predictions.stats).
+
+    Every prediction is counted in exactly one bucket, so summing an owner's
+    rows gives their totals.
+    """
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        db_index=False,
+    )
+    bucket = models.SmallIntegerField()
+    count = models.BigIntegerField(default=0)
+    sum_probability = models.FloatField(default=0.0)
+    sum_outcome = models.BigIntegerField(default=0)
+    sum_squared_error = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ['owner', 'bucket']
+        constraints = [
+            # NULLs are distinct in unique indexes, so the unowned buckets
+            # need a constraint of their own
+            models.UniqueConstraint(
+                fields=['owner', 'bucket'],
+                condition=models.Q(owner__isnull=False),
+                name='calibration_summary_owner_bucket',
+            ),
+            models.UniqueConstraint(
+                fields=['bucket'],
+                condition=models.Q(owner__isnull=True),
+                name='calibration_summary_unowned_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"Bucket {self.bucket} ({self.count} predictions)"
+
+
+class DataVersion(models.Model):
+    """
+    Counter bumped on every write to a named data set (see predictions.versions).
+
+    Derived results cached under the current version are invalidated by the
+    next write without having to track what depends on what.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
 
 class UserProfile(models.Model):
+    # Null for the profile shown to anonymous users
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='prediction_profile',
+    )
     name = models.CharField(max_length=200, blank=True)
     notes = models.TextField(blank=True)
 
     def __str__(self):
         return self.name or "User Profile"
+
+
+class AIJob(models.Model):
+    """A Gemini request or other slow work run by the background job runner (see predictions.jobs)."""
+    KIND_SUMMARY = 'summary'
+    KIND_INSIGHT = 'insight'
+    KIND_SUGGESTIONS = 'suggestions'
+    KIND_INSIGHTS = 'insights'
+    KIND_CALIBRATION = 'calibration'
+    KIND_CHOICES = [
+        (KIND_SUMMARY, 'Calibration summary'),
+        (KIND_INSIGHT, 'Prediction insight'),
+        (KIND_SUGGESTIONS, 'Prediction suggestions'),
+        (KIND_INSIGHTS, 'Batch prediction insights'),
+        (KIND_CALIBRATION, 'Calibration confidence intervals'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Whose request it was (see ``owner_id``); only they can read the job
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.status})"
+
+
+class AIUsage(models.Model):
+    """Gemini calls and tokens of one day, per method (see predictions.usage)."""
+    day = models.DateField()
+    method = models.CharField(max_length=20)
+    calls = models.BigIntegerField(default=0)
+    prompt_tokens = models.BigIntegerField(default=0)
+    response_tokens = models.BigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'method']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'method'], name='ai_usage_day_method'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} on {self.day}: {self.calls} calls"
+
+
+class PredictionInsight(models.Model):
+    """
+    An AI insight generated ahead of time (see predictions.insights).
+
+    ``prompt_hash`` identifies the model and prompt it was generated from;
+    once the prediction changes it no longer matches and the insight is
+    regenerated.
+    """
+    prediction = models.OneToOneField(
+        Prediction, on_delete=models.CASCADE, primary_key=True, related_name='stored_insight'
+    )
+    prompt_hash = models.CharField(max_length=64)
+    text = models.TextField()
+    generated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Insight for {self.prediction_id}"
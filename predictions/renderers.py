@@ -0,0 +1,82 @@
+"""
+Row-oriented renderers for exporting predictions.
+
+Besides the usual ``render`` they can ``stream`` rows one line at a time,
+which is what the export endpoint uses so that memory use does not grow
+with the number of rows.
+"""
+import csv
+import datetime
+import json
+import uuid
+
+from rest_framework.renderers import BaseRenderer
+
+
+def _value(value):
+    """Format a database value the way the JSON API shows it."""
+    if isinstance(value, datetime.datetime):
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value.removesuffix('+00:00') + 'Z'
+        return value
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+class RowRenderer(BaseRenderer):
+    """Renders a list of rows (dicts with the same keys) as text lines."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            # e.g. an error response
+            data = [data]
+        if not data:
+            return b''
+        columns = list(data[0])
+        rows = ([row[column] for column in columns] for row in data)
+        return ''.join(self.stream(columns, rows)).encode(self.charset)
+
+    def stream(self, columns, rows):
+        """Yield the text for ``columns`` and then each row of values."""
+        raise NotImplementedError
+
+
+class _LineBuffer:
+    def write(self, line):
+        return line
+
+
+class CSVRenderer(RowRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, columns, rows):
+        writer = csv.writer(_LineBuffer())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow([_value(value) for value in row])
+
+
+class NDJSONRenderer(RowRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, columns, rows):
+        for row in rows:
+            yield json.dumps({column: _value(value) for column, value in zip(columns, row)}) + '\n'
+
+
+def encode_lines(lines, charset='utf-8', chunk_size=64 * 1024):
+    """Join streamed lines into encoded chunks of about ``chunk_size`` bytes."""
+    buffer, size = [], 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(buffer).encode(charset)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode(charset)
@@ -0,0 +1,203 @@
+"""
+Deadlines, retries, a circuit breaker and a concurrency limit for model calls.
+
+``ResilientModel`` wraps a Gemini model (or a local fake with the same
+``generate_content``/``generate_content_async`` methods):
+
+- every attempt has a deadline of ``GEMINI_TIMEOUT`` seconds; it is passed
+  to the client as ``request_options`` and also enforced here, so a hung
+  socket cannot hold a request longer than that;
+- transient failures (timeouts, connection errors, 408/429/5xx statuses) are
+  retried up to ``GEMINI_RETRIES`` times after an exponential backoff with
+  full jitter;
+- after ``GEMINI_BREAKER_THRESHOLD`` consecutive transient failures the
+  breaker opens and calls fail immediately for ``GEMINI_BREAKER_RESET``
+  seconds, then one trial call decides whether it closes again;
+- at most ``GEMINI_MAX_CONCURRENCY`` calls are in flight; a call that cannot
+  get a slot within its deadline fails without reaching the model.
+
+Calls that fail for any of these reasons raise ``GeminiUnavailable``, for
+which ``GeminiService`` serves a cached or fallback answer. Streamed calls
+are covered up to the model's first response; the chunks that follow are
+not.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# HTTP statuses worth retrying (google.api_core exceptions carry one as ``code``)
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+# How often an async call waiting for a slot checks again
+SLOT_POLL_INTERVAL = 0.01
+
+
+class GeminiUnavailable(Exception):
+    """The model could not be called or kept failing."""
+
+
+class CircuitOpen(GeminiUnavailable):
+    """The circuit breaker is open."""
+
+
+def is_transient(error):
+    """Whether ``error`` may go away if the call is retried."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, 'code', None) in TRANSIENT_STATUSES
+
+
+def backoff_delay(attempt, base, cap, rng=random):
+    """Seconds to wait before retry number ``attempt`` (from 0): full jitter."""
+    return rng.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Closed, open or half-open breaker counting consecutive failures.
+
+    Half-open lets a single trial call through; its success closes the
+    breaker and its failure opens it again.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open only the first caller may."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+class ResilientModel:
+    """A model whose calls go through the deadline, retry, breaker and concurrency rules."""
+
+    def __init__(self, model, timeout=None, retries=None, backoff=None, max_backoff=None,
+                 breaker=None, max_concurrency=None, sleep=time.sleep, rng=random):
+        self.model = model
+        self.timeout = settings.GEMINI_TIMEOUT if timeout is None else timeout
+        self.retries = settings.GEMINI_RETRIES if retries is None else retries
+        self.backoff = settings.GEMINI_RETRY_BACKOFF if backoff is None else backoff
+        self.max_backoff = settings.GEMINI_RETRY_MAX_BACKOFF if max_backoff is None else max_backoff
+        self.breaker = breaker or CircuitBreaker(settings.GEMINI_BREAKER_THRESHOLD, settings.GEMINI_BREAKER_RESET)
+        max_concurrency = settings.GEMINI_MAX_CONCURRENCY if max_concurrency is None else max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        # Runs the sync calls so they can be abandoned at their deadline; a
+        # call keeps its slot until it really returns
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='gemini-call')
+        self.sleep = sleep
+        self.rng = rng
+
+    def generate_content(self, prompt, **kwargs):
+        kwargs.setdefault('request_options', {'timeout': self.timeout})
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._call(prompt, kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                self.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return response
+
+    async def generate_content_async(self, prompt, **kwargs):
+        kwargs.setdefault('request_options', {'timeout': self.timeout})
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._acall(prompt, kwargs)
+            except Exception as e:
+                delay = self._failed(e, attempt)
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return response
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpen('Gemini is failing; not calling it for now')
+
+    def _failed(self, error, attempt):
+        """Record a failed attempt; return the backoff before the next or raise."""
+        if isinstance(error, GeminiUnavailable):
+            # The model was not called, so this says nothing about its health
+            raise error
+        if not is_transient(error):
+            # The model answered, just not with a response
+            self.breaker.record_success()
+            raise error
+        self.breaker.record_failure()
+        if attempt >= self.retries:
+            raise GeminiUnavailable(f'Gemini call failed: {str(error) or type(error).__name__}') from error
+        return backoff_delay(attempt, self.backoff, self.max_backoff, self.rng)
+
+    def _call(self, prompt, kwargs):
+        deadline = time.monotonic() + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            raise GeminiUnavailable('Too many Gemini calls in flight')
+        try:
+            self._check_breaker()
+            future = self._executor.submit(self.model.generate_content, prompt, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=max(deadline - time.monotonic(), 0))
+
+    async def _acall(self, prompt, kwargs):
+        deadline = time.monotonic() + self.timeout
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise GeminiUnavailable('Too many Gemini calls in flight')
+            await asyncio.sleep(SLOT_POLL_INTERVAL)
+        try:
+            self._check_breaker()
+            # Cancelled at the deadline, which frees the slot
+            return await asyncio.wait_for(
+                self.model.generate_content_async(prompt, **kwargs), max(deadline - time.monotonic(), 0)
+            )
+        finally:
+            self._slots.release()
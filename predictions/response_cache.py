@@ -0,0 +1,105 @@
+"""
+Server-side cache of serialized API responses.
+
+Entries live in the Django cache named by ``RESPONSE_CACHE_ALIAS`` under the
+data version they were computed from. The post_save/post_delete signal
+handlers bump the version on every Prediction write, as do the bulk
+endpoints and commands that bypass the signals, so a write invalidates
+every response derived from the data without deleting anything: stale
+entries are never read again and expire after ``RESPONSE_CACHE_TIMEOUT``.
+
+Concurrent misses for the same key are computed once. Threads of this
+process wait for the one computing the value and share its result; other
+processes (with a shared file or database cache) wait on a lock entry for up
+to ``LOCK_TIMEOUT`` seconds before computing it themselves.
+"""
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.cache import caches
+
+# How long a computation may hold the cross-process lock, and how often
+# waiting processes look for its result
+LOCK_TIMEOUT = 10
+POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class SingleFlight:
+    """Runs a function once for all concurrent callers with the same key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, function):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result()
+
+        try:
+            result = function()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_flights = SingleFlight()
+
+
+def _cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def get_or_compute(key, compute, cacheable=None):
+    """
+    Return the cached value of ``key``, computing and storing it on a miss.
+
+    A computed value for which ``cacheable(value)`` is false is returned
+    without being stored.
+    """
+    value = _cache().get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    return _flights.do(key, lambda: _fill(key, compute, cacheable))
+
+
+def _fill(key, compute, cacheable):
+    cache = _cache()
+    lock_key = f'{key}:lock'
+    locked = cache.add(lock_key, 1, LOCK_TIMEOUT)
+    if not locked:
+        # Another process is computing it; give up waiting if it takes too long
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            if cache.get(lock_key) is None:
+                break
+
+    try:
+        # It may have been stored between our miss and taking the lock
+        value = cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            if cacheable is None or cacheable(value):
+                cache.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+        return value
+    finally:
+        if locked:
+            cache.delete(lock_key)
@@ -1,13 +1,36 @@
 from rest_framework import serializers
-from .models import Prediction, UserProfile
+from .models import AIJob, Prediction, UserProfile
 from django.utils import timezone
 
-class PredictionSerializer(serializers.ModelSerializer):
+from backend.metrics import timed
+
+
+class TimedSerializerMixin:
+    """Count the time spent validating and representing objects in the request's metrics"""
+
+    def run_validation(self, data=serializers.empty):
+        with timed('serializer'):
+            return super().run_validation(data)
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class PredictionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Prediction
         fields = ['id', 'description', 'probability', 'created_at', 'resolve_by', 'resolved', 'outcome']
         read_only_fields = ['id', 'created_at']
 
+    def __init__(self, *args, **kwargs):
+        """Accept an optional ``fields`` argument restricting the output fields"""
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def validate_description(self, value):
         """Validate prediction description"""
         if not value or not value.strip():
@@ -31,8 +54,33 @@ class PredictionSerializer(serializers.ModelSerializer):
         return value
 
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class PredictionImportSerializer(PredictionSerializer):
+    """
+    Validates imported predictions: the same rules as the API, except that
+    ``id`` and ``created_at`` may be given and ``resolve_by`` may be in the
+    past (it is history).
+    """
+    # Declared explicitly: the model field would add a UniqueValidator (one
+    # query per row) and imports update existing ids instead of failing
+    id = serializers.UUIDField(required=False, allow_null=True)
+    created_at = serializers.DateTimeField(required=False, allow_null=True)
+
+    class Meta(PredictionSerializer.Meta):
+        read_only_fields = []
+
+    def validate_resolve_by(self, value):
+        return value
+
+
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = UserProfile
         fields = ['id', 'name', 'notes']
         read_only_fields = ['id']
+
+
+class AIJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = AIJob
+        fields = ['id', 'kind', 'status', 'result', 'error', 'created_at', 'finished_at']
+        read_only_fields = fields
@@ -0,0 +1,102 @@
+"""
+Signal handlers keeping derived data and data versions in step with writes.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Prediction, UserProfile
+from .stats import record_changes
+from .versions import LEADERBOARD, PREDICTIONS, PROFILE, bump_version, bump_version_on_commit, scoped
+
+
+_summary_paused = ContextVar('summary_updates_paused', default=False)
+
+
+@contextmanager
+def summary_updates_paused():
+    """
+    Leave the calibration summary alone while predictions are saved or
+    deleted in the block, for bulk work that rebuilds it afterwards.
+    """
+    token = _summary_paused.set(True)
+    try:
+        yield
+    finally:
+        _summary_paused.reset(token)
+
+
+def _calibration_state(prediction):
+    return (prediction.probability, prediction.resolved, prediction.outcome)
+
+
+@receiver(pre_save, sender=Prediction)
+def capture_previous_state(sender, instance, raw=False, **kwargs):
+    """Remember the stored row so post_save can apply the difference."""
+    instance._previous_calibration_state = None
+    if raw or instance._state.adding or _summary_paused.get():
+        return
+    instance._previous_calibration_state = (
+        Prediction.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list('owner', 'probability', 'resolved', 'outcome')
+        .first()
+    )
+
+
+@receiver(post_save, sender=Prediction)
+def update_summary_on_save(sender, instance, raw=False, **kwargs):
+    if raw or _summary_paused.get():
+        return
+    previous = getattr(instance, '_previous_calibration_state', None)
+    if previous and previous[0] != instance.owner_id:
+        # Moved to another owner
+        record_changes(removed=[previous[1:]], owner=previous[0])
+        previous = None
+    record_changes(
+        removed=[previous[1:]] if previous else [],
+        added=[_calibration_state(instance)],
+        owner=instance.owner_id,
+    )
+
+
+def _deleting_users(origin):
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is get_user_model()
+
+
+@receiver(post_delete, sender=Prediction)
+def update_summary_on_delete(sender, instance, origin=None, **kwargs):
+    if _summary_paused.get():
+        return
+    if _deleting_users(origin):
+        # The owner's summary rows are deleted in the same cascade, possibly
+        # already; counting into them would create new ones
+        return
+    record_changes(removed=[_calibration_state(instance)], owner=instance.owner_id)
+
+
+@receiver(post_delete, sender=get_user_model())
+def bump_deleted_user_versions(sender, instance, **kwargs):
+    bump_version(scoped(PREDICTIONS, instance.pk))
+    bump_version_on_commit(LEADERBOARD)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def bump_profile_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_version(scoped(PROFILE, instance.user_id))
+
+
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+@receiver(post_delete, sender=Group)
+def bump_leaderboard_version(sender, action=None, **kwargs):
+    """Cohorts are user groups, so membership changes alter the comparison."""
+    if action is None or action.startswith('post_'):
+        bump_version_on_commit(LEADERBOARD)
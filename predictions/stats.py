@@ -0,0 +1,231 @@
+"""
+Calibration statistics computed in the database.
+
+Every prediction falls into exactly one bucket: ``UNSCORED`` for predictions
+that have no outcome yet, one of the ``BIN_COUNT`` calibration bins, or
+``OUT_OF_RANGE`` for resolved predictions that no bin covers (e.g. 100%).
+Aggregating per bucket gives everything ``stats`` needs in a single query.
+
+The same per-bucket aggregates are kept materialized in ``CalibrationSummary``
+for each owner and updated on every write, so ``stats`` only has to read
+``BIN_COUNT + 2`` rows regardless of how many predictions exist.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Q, Sum, Value, When
+
+from .models import CalibrationSummary
+from .versions import LEADERBOARD, PREDICTIONS, bump_version, bump_version_on_commit, scoped
+
+BIN_COUNT = 10
+BIN_SIZE = 0.1
+MIN_BIN_COUNT = 3
+
+UNSCORED = -1
+OUT_OF_RANGE = BIN_COUNT
+
+# Computed exactly like the original Python loop so that floating point
+# boundaries (e.g. 3 * 0.1 == 0.30000000000000004) bin identically in SQL.
+BIN_EDGES = [(i * BIN_SIZE, (i + 1) * BIN_SIZE) for i in range(BIN_COUNT)]
+
+ALL_BUCKETS = range(UNSCORED, OUT_OF_RANGE + 1)
+
+SCORED = Q(resolved=True, outcome__isnull=False)
+UNSCORED_Q = Q(resolved=False) | Q(outcome__isnull=True)
+
+
+def bucket_for(probability, resolved, outcome):
+    """Return the bucket a prediction with the given values belongs to."""
+    if not resolved or outcome is None:
+        return UNSCORED
+    for i, (lower, upper) in enumerate(BIN_EDGES):
+        if lower <= probability < upper:
+            return i
+    return OUT_OF_RANGE
+
+
+def bucket_expression():
+    """SQL equivalent of ``bucket_for``."""
+    whens = [When(UNSCORED_Q, then=Value(UNSCORED))]
+    whens += [
+        When(probability__gte=lower, probability__lt=upper, then=Value(i))
+        for i, (lower, upper) in enumerate(BIN_EDGES)
+    ]
+    return Case(*whens, default=Value(OUT_OF_RANGE), output_field=IntegerField())
+
+
+def _outcome_value():
+    return Case(When(outcome=True, then=Value(1.0)), default=Value(0.0), output_field=FloatField())
+
+
+def _outcome_count():
+    return Case(When(outcome=True, then=Value(1)), default=Value(0), output_field=IntegerField())
+
+
+def _aggregate(queryset, *group_by):
+    error = F('probability') - _outcome_value()
+    return (
+        queryset.order_by()
+        .annotate(bucket=bucket_expression())
+        .values(*group_by, 'bucket')
+        .annotate(
+            count=Count('pk'),
+            sum_probability=Sum('probability'),
+            sum_outcome=Sum(_outcome_count()),
+            sum_squared_error=Sum(error * error, output_field=FloatField()),
+        )
+    )
+
+
+def _totals(row):
+    return {
+        'count': row['count'],
+        'sum_probability': row['sum_probability'] or 0.0,
+        'sum_outcome': row['sum_outcome'] or 0,
+        'sum_squared_error': row['sum_squared_error'] or 0.0,
+    }
+
+
+def aggregate_buckets(queryset):
+    """
+    Aggregate a Prediction queryset per bucket in one grouped query.
+
+    Returns:
+        dict: bucket -> dict with count, sum_probability, sum_outcome and
+        sum_squared_error
+    """
+    return {row['bucket']: _totals(row) for row in _aggregate(queryset)}
+
+
+def aggregate_owner_buckets(queryset):
+    """
+    Like ``aggregate_buckets``, separately for each owner.
+
+    Returns:
+        dict: owner id (None for unowned predictions) -> bucket -> aggregates
+    """
+    owners = defaultdict(dict)
+    for row in _aggregate(queryset, 'owner'):
+        owners[row['owner']][row['bucket']] = _totals(row)
+    return dict(owners)
+
+
+def build_stats(buckets):
+    """Build the ``stats`` response payload from per-bucket aggregates."""
+    total_predictions = sum(b['count'] for b in buckets.values())
+    scored = [b for key, b in buckets.items() if key != UNSCORED]
+    resolved_predictions = sum(b['count'] for b in scored)
+
+    if not resolved_predictions:
+        return {
+            'total_predictions': total_predictions,
+            'resolved_predictions': 0,
+            'brier_score': None,
+            'calibration_bins': []
+        }
+
+    brier_score = sum(b['sum_squared_error'] for b in scored) / resolved_predictions
+
+    bins = []
+    for i, (lower, upper) in enumerate(BIN_EDGES):
+        bucket = buckets.get(i)
+        if bucket is None or bucket['count'] < MIN_BIN_COUNT:
+            continue
+        count = bucket['count']
+        bins.append({
+            'range': f"{int(lower * 100)}-{int(upper * 100)}%",
+            'count': count,
+            'avg_predicted': round(bucket['sum_probability'] / count * 100, 1),
+            'actual_frequency': round(bucket['sum_outcome'] / count * 100, 1)
+        })
+
+    return {
+        'total_predictions': total_predictions,
+        'resolved_predictions': resolved_predictions,
+        'brier_score': round(brier_score, 4),
+        'calibration_bins': bins
+    }
+
+
+def calibration_stats(queryset):
+    """Compute the ``stats`` payload for a Prediction queryset."""
+    return build_stats(aggregate_buckets(queryset))
+
+
+SUMMARY_FIELDS = ('bucket', 'count', 'sum_probability', 'sum_outcome', 'sum_squared_error')
+
+
+def summary_buckets(owner=None):
+    """Read the materialized per-bucket aggregates of user id ``owner`` (None: unowned)."""
+    return {row['bucket']: row for row in CalibrationSummary.objects.filter(owner_id=owner).values(*SUMMARY_FIELDS)}
+
+
+def all_summary_buckets():
+    """Read the materialized aggregates of every owner: owner id -> bucket -> aggregates."""
+    owners = defaultdict(dict)
+    for row in CalibrationSummary.objects.values('owner', *SUMMARY_FIELDS):
+        owners[row.pop('owner')][row['bucket']] = row
+    return dict(owners)
+
+
+def record_changes(removed=(), added=(), owner=None):
+    """
+    Apply prediction writes to the calibration summary.
+
+    Every prediction write goes through here, so this also bumps the
+    predictions data version of the owner (and, for owned predictions, the
+    leaderboard's).
+
+    Args:
+        removed: (probability, resolved, outcome) tuples of rows as they were
+            before the write (deleted rows, or the old state of updated rows)
+        added: (probability, resolved, outcome) tuples of rows as they are
+            after the write
+        owner: user id the rows belong to, None for unowned rows
+    """
+    deltas = defaultdict(lambda: {'count': 0, 'sum_probability': 0.0, 'sum_outcome': 0, 'sum_squared_error': 0.0})
+    for sign, rows in ((-1, removed), (1, added)):
+        for probability, resolved, outcome in rows:
+            delta = deltas[bucket_for(probability, resolved, outcome)]
+            observed = 1 if outcome else 0
+            delta['count'] += sign
+            delta['sum_probability'] += sign * probability
+            delta['sum_outcome'] += sign * observed
+            delta['sum_squared_error'] += sign * (probability - observed) ** 2
+
+    with transaction.atomic():
+        bump_version(scoped(PREDICTIONS, owner))
+        if owner is not None:
+            bump_version_on_commit(LEADERBOARD)
+        for bucket, delta in sorted(deltas.items()):
+            if not any(delta.values()):
+                continue
+            updated = CalibrationSummary.objects.filter(owner_id=owner, bucket=bucket).update(
+                **{field: F(field) + value for field, value in delta.items()}
+            )
+            if not updated:
+                CalibrationSummary.objects.create(owner_id=owner, bucket=bucket, **delta)
+
+
+def rebuild_summary(queryset):
+    """
+    Recompute the calibration summary of every owner from ``queryset``.
+
+    Returns:
+        dict: the freshly computed aggregates, owner id -> bucket -> aggregates
+    """
+    owners = aggregate_owner_buckets(queryset)
+    owners.setdefault(None, {})
+    with transaction.atomic():
+        stale = CalibrationSummary.objects.values_list('owner', flat=True).distinct()
+        for owner in set(stale) | set(owners):
+            bump_version(scoped(PREDICTIONS, owner))
+        bump_version_on_commit(LEADERBOARD)
+        CalibrationSummary.objects.all().delete()
+        CalibrationSummary.objects.bulk_create([
+            CalibrationSummary(owner_id=owner, bucket=bucket, **buckets.get(bucket, {}))
+            for owner, buckets in owners.items()
+            for bucket in ALL_BUCKETS
+        ])
+    return owners
@@ -0,0 +1,40 @@
+"""
+Server-sent events for the streaming AI endpoints (see async_views).
+
+The model's text is forwarded chunk by chunk as ``text/event-stream`` so the
+client can show it while it is still being generated. Each chunk is sent as
+a default ``message`` event with ``{"text": ...}``; the stream always ends
+with a ``done`` event, carrying ``{"error": ...}`` if generation failed.
+
+A stream holds its connection for as long as the model generates, so the
+streams are only served by the async views, and only routed under
+``/api/predictions/`` when ``ASGI`` is set.
+"""
+import json
+
+from django.http import StreamingHttpResponse
+
+
+def sse_event(data, event=None):
+    """Format one server-sent event with a JSON payload."""
+    message = f"event: {event}\n" if event else ""
+    return f"{message}data: {json.dumps(data)}\n\n"
+
+
+async def aevent_stream(chunks):
+    """Wrap an async iterator of text chunks as server-sent events."""
+    try:
+        async for text in chunks:
+            yield sse_event({'text': text})
+    except Exception as e:
+        yield sse_event({'error': f'AI service error: {str(e)}'}, 'done')
+    else:
+        yield sse_event({}, 'done')
+
+
+def streaming_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
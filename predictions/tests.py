@@ -1,3 +1,1806 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import importlib
+import json
+import math
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from types import SimpleNamespace
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser, Group, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+
+from backend import metrics
+
+from . import async_views, gemini_service, jobs, urls
+from .calibration import calibration_chart, calibration_metrics, calibration_report
+from .insights import prompt_hash, warmer
+from .gemini_service import FALLBACK_INSIGHT, FALLBACK_SUGGESTIONS, FALLBACK_SUMMARY, GeminiService
+from .models import AIJob, AIUsage, CalibrationSummary, DataVersion, Prediction, PredictionInsight, UserProfile
+from .resilience import CircuitBreaker, CircuitOpen, GeminiUnavailable, ResilientModel
+from .response_cache import SingleFlight, get_or_compute
+from .serializers import PredictionSerializer
+from .stats import aggregate_buckets, build_stats, calibration_stats, summary_buckets
+from .throttling import take
+from .versions import PREDICTIONS
+from .views import cache_response
+
+
+def legacy_stats(predictions):
+    """The original in-Python ``stats`` computation, used as a reference."""
+    predictions = [p for p in predictions if p.resolved and p.outcome is not None]
+    if not predictions:
+        return None, []
+    brier_score = sum((p.probability - (1.0 if p.outcome else 0.0)) ** 2 for p in predictions) / len(predictions)
+    bins = []
+    for i in range(10):
+        lower = i * 0.1
+        upper = (i + 1) * 0.1
+        bin_predictions = [p for p in predictions if lower <= p.probability < upper]
+        if len(bin_predictions) >= 3:
+            bins.append({
+                'range': f"{int(lower * 100)}-{int(upper * 100)}%",
+                'count': len(bin_predictions),
+                'avg_predicted': round(sum(p.probability for p in bin_predictions) / len(bin_predictions) * 100, 1),
+                'actual_frequency': round(sum(1 if p.outcome else 0 for p in bin_predictions) / len(bin_predictions) * 100, 1)
+            })
+    return round(brier_score, 4), bins
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Local stand-in for the Gemini model that records its prompts."""
+
+    def __init__(self, text='Fake Gemini response'):
+        self.text = text
+        self.prompts = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        self.prompts.append(prompt)
+        if stream:
+            # Stream word by word, like the API's partial responses
+            return [FakeResponse(word) for word in re.findall(r'\S+\s*', self.text)]
+        return FakeResponse(self.text)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        response = self.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return FakeAsyncStream(response)
+        return response
+
+
+class FakeAsyncStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self.chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeGeminiMixin:
+    fake_text = 'Fake Gemini response'
+
+    def setUp(self):
+        super().setUp()
+        # Empties the AI rate limit buckets
+        cache.clear()
+        self.model = FakeModel(self.fake_text)
+        gemini_service._gemini_service = GeminiService(model=self.model)
+
+    def tearDown(self):
+        gemini_service._gemini_service = None
+        super().tearDown()
+
+
+def make_predictions(count, seed=0):
+    rng = random.Random(seed)
+    # Include values sitting exactly on (float) bin boundaries and 100%
+    edge_values = [0.0, 0.1, 0.2, 0.3, 0.7, 0.9, 1.0]
+    predictions = []
+    for i in range(count):
+        probability = rng.choice(edge_values) if i % 4 == 0 else round(rng.random(), 2)
+        resolved = rng.random() < 0.8
+        predictions.append(Prediction.objects.create(
+            description=f'Synthetic prediction number {i}',
+            probability=probability,
+            resolved=resolved,
+            outcome=(rng.random() < probability) if resolved else None,
+        ))
+    return predictions
+
+
+class CalibrationStatsTests(TestCase):
+    def test_matches_legacy_computation(self):
+        make_predictions(400)
+        stats = calibration_stats(Prediction.objects.all())
+        brier_score, bins = legacy_stats(Prediction.objects.all())
+
+        self.assertEqual(stats['total_predictions'], 400)
+        self.assertEqual(stats['resolved_predictions'], Prediction.objects.filter(resolved=True).count())
+        self.assertEqual(stats['brier_score'], brier_score)
+        self.assertEqual(stats['calibration_bins'], bins)
+
+    def test_no_resolved_predictions(self):
+        Prediction.objects.create(description='An unresolved prediction', probability=0.4)
+        stats = calibration_stats(Prediction.objects.all())
+        self.assertEqual(stats, {
+            'total_predictions': 1,
+            'resolved_predictions': 0,
+            'brier_score': None,
+            'calibration_bins': []
+        })
+
+
+class CalibrationEngineTests(TestCase):
+    def test_metrics_match_reference(self):
+        predictions = [p for p in make_predictions(300) if p.resolved]
+        probabilities = [p.probability for p in predictions]
+        outcomes = [1.0 if p.outcome else 0.0 for p in predictions]
+        total = len(predictions)
+        report = calibration_metrics(Prediction.objects.all(), bins=5)
+
+        bins = {}
+        for probability, outcome in zip(probabilities, outcomes):
+            index = sum(probability >= i * 0.2 for i in range(1, 5))
+            bins.setdefault(index, []).append((probability, outcome))
+        base_rate = sum(outcomes) / total
+        reliability = resolution = ece = mce = 0.0
+        for members in bins.values():
+            avg_predicted = sum(p for p, o in members) / len(members)
+            actual_frequency = sum(o for p, o in members) / len(members)
+            reliability += len(members) * (avg_predicted - actual_frequency) ** 2 / total
+            resolution += len(members) * (actual_frequency - base_rate) ** 2 / total
+            ece += len(members) * abs(avg_predicted - actual_frequency) / total
+            mce = max(mce, abs(avg_predicted - actual_frequency))
+        log_loss = -sum(
+            math.log(max(p if o else 1 - p, 1e-15)) for p, o in zip(probabilities, outcomes)
+        ) / total
+
+        self.assertEqual(report['count'], total)
+        self.assertAlmostEqual(report['brier_score'], sum((p - o) ** 2 for p, o in zip(probabilities, outcomes)) / total)
+        self.assertAlmostEqual(report['reliability'], reliability)
+        self.assertAlmostEqual(report['resolution'], resolution)
+        self.assertAlmostEqual(report['uncertainty'], base_rate * (1 - base_rate))
+        self.assertAlmostEqual(report['log_loss'], log_loss)
+        self.assertAlmostEqual(report['ece'], ece)
+        self.assertAlmostEqual(report['mce'], mce)
+        self.assertEqual([b['count'] for b in report['bins']], [len(bins[i]) for i in sorted(bins)])
+
+    def test_quantile_bins_hold_equal_counts(self):
+        probabilities = [i / 1000 for i in range(1000)]
+        report = calibration_report(probabilities, [0.0] * 1000, bins=4, strategy='quantile')
+        self.assertEqual([b['count'] for b in report['bins']], [250] * 4)
+        # Probability 1 falls in the last bin
+        report = calibration_report([0.2, 1.0], [0.0, 1.0], bins=10)
+        self.assertEqual([b['upper'] for b in report['bins']], [0.30000000000000004, 1.0])
+
+    def test_empty(self):
+        report = calibration_report([], [], bins=10, strategy='quantile')
+        self.assertEqual(report['count'], 0)
+        self.assertIsNone(report['brier_score'])
+        self.assertEqual(report['bins'], [])
+
+    def test_stats_parameters(self):
+        make_predictions(200)
+        client = APIClient()
+        default = client.get('/api/predictions/stats/').json()
+        self.assertNotIn('metrics', default)
+
+        stats = client.get('/api/predictions/stats/?metrics=true').json()
+        self.assertEqual(stats['metrics']['brier_score'], default['brier_score'])
+        self.assertEqual(set(stats['metrics']), {
+            'brier_score', 'reliability', 'resolution', 'uncertainty', 'log_loss', 'ece', 'mce'
+        })
+
+        stats = client.get('/api/predictions/stats/?bins=4&binning=quantile').json()
+        self.assertEqual(len(stats['calibration_bins']), 4)
+        self.assertEqual(stats['calibration_bins'][0]['range'][:2], '0-')
+
+        for query in ('bins=0', 'bins=abc', 'bins=101', 'binning=log', 'metrics=maybe'):
+            self.assertEqual(client.get(f'/api/predictions/stats/?{query}').status_code, 400, query)
+
+    def test_metrics_keep_default_bins(self):
+        for probability, outcome in ((1.0, True), (0.95, False), (0.35, False)):
+            for _ in range(6):
+                Prediction.objects.create(
+                    description='Binned prediction', probability=probability, resolved=True, outcome=outcome
+                )
+        client = APIClient()
+        default = client.get('/api/predictions/stats/').json()
+        stats = client.get('/api/predictions/stats/?metrics=true').json()
+        self.assertEqual(stats['calibration_bins'], default['calibration_bins'])
+        self.assertEqual([b['count'] for b in default['calibration_bins']], [6, 6])
+
+
+class CalibrationChartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_chart_matches_report(self):
+        make_predictions(200)
+        chart = self.client.get('/api/predictions/stats/chart/?bins=10,4').json()
+        self.assertEqual([curve['bins'] for curve in chart['resolutions']], [10, 4])
+
+        for curve in chart['resolutions']:
+            self.assertEqual(len(curve['edges']), curve['bins'] + 1)
+            self.assertEqual(len(curve['count']), curve['bins'])
+            report = calibration_metrics(Prediction.objects.all(), bins=curve['bins'])
+            self.assertEqual(chart['count'], report['count'])
+            filled = [i for i, count in enumerate(curve['count']) if count]
+            self.assertEqual([curve['count'][i] for i in filled], [b['count'] for b in report['bins']])
+            for i, b in zip(filled, report['bins']):
+                self.assertAlmostEqual(curve['avg_predicted'][i], b['avg_predicted'], places=4)
+                self.assertAlmostEqual(curve['actual_frequency'][i], b['actual_frequency'], places=4)
+
+    def test_empty_bins_are_null(self):
+        chart = calibration_chart([0.05, 0.95], [0.0, 1.0], resolutions=(4,))
+        self.assertEqual(chart['resolutions'][0], {
+            'bins': 4,
+            'edges': [0.0, 0.25, 0.5, 0.75, 1.0],
+            'count': [1, 0, 0, 1],
+            'avg_predicted': [0.05, None, None, 0.95],
+            'actual_frequency': [0.0, None, None, 1.0],
+        })
+
+    def test_cached_per_data_version(self):
+        make_predictions(50)
+        chart = self.client.get('/api/predictions/stats/chart/').json()
+        # The data version, for the ETag and the cache key
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/predictions/stats/chart/').json(), chart)
+
+        make_predictions(10, seed=1)
+        self.assertGreater(self.client.get('/api/predictions/stats/chart/').json()['count'], chart['count'])
+
+    def test_invalid_parameters(self):
+        for query in ('bins=0', 'bins=10,abc', 'bins=1,2,3,4,5,6', 'binning=log'):
+            self.assertEqual(self.client.get(f'/api/predictions/stats/chart/?{query}').status_code, 400, query)
+
+
+class BootstrapTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_intervals_contain_estimates(self):
+        rng = np.random.default_rng(1)
+        probabilities = rng.random(500)
+        outcomes = (rng.random(500) < probabilities).astype(float)
+        report = calibration_report(probabilities, outcomes, bins=5, bootstrap=400)
+
+        low, high = report['brier_score_ci']
+        self.assertLess(low, report['brier_score'])
+        self.assertGreater(high, report['brier_score'])
+        for calibration_bin in report['bins']:
+            low, high = calibration_bin['actual_frequency_ci']
+            self.assertLessEqual(low, calibration_bin['actual_frequency'])
+            self.assertGreaterEqual(high, calibration_bin['actual_frequency'])
+
+        # Resamples are seeded per block, so results are reproducible
+        again = calibration_report(probabilities, outcomes, bins=5, bootstrap=400)
+        self.assertEqual(again['brier_score_ci'], report['brier_score_ci'])
+
+    @override_settings(CALIBRATION_BOOTSTRAP_WORKERS=2)
+    def test_worker_processes_give_the_same_intervals(self):
+        rng = np.random.default_rng(2)
+        probabilities = rng.random(200)
+        outcomes = (rng.random(200) < probabilities).astype(float)
+        report = calibration_report(probabilities, outcomes, bootstrap=500)
+        with mock.patch('predictions.calibration.BOOTSTRAP_PARALLEL_MIN_DRAWS', 0):
+            parallel = calibration_report(probabilities, outcomes, bootstrap=500)
+        self.assertEqual(parallel['brier_score_ci'], report['brier_score_ci'])
+        self.assertEqual(parallel['bins'], report['bins'])
+
+    def test_stats_ci_is_cached_per_data_version(self):
+        make_predictions(100)
+        client = APIClient()
+        url = '/api/predictions/stats/?ci=bootstrap&n=200'
+        stats = client.get(url).json()
+        self.assertEqual(len(stats['metrics']['brier_score_ci']), 2)
+        for calibration_bin in stats['calibration_bins']:
+            self.assertEqual(len(calibration_bin['actual_frequency_ci']), 2)
+
+        # Only the data version: the whole response comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get(url).json(), stats)
+
+        make_predictions(5, seed=1)
+        with self.assertNumQueries(4):
+            self.assertEqual(client.get(url).json()['total_predictions'], 105)
+
+        for query in ('ci=normal', 'ci=bootstrap&n=0', 'ci=bootstrap&n=100000'):
+            self.assertEqual(client.get(f'/api/predictions/stats/?{query}').status_code, 400, query)
+
+    @override_settings(AI_JOBS_EAGER=True)
+    def test_large_bootstraps_run_as_jobs(self):
+        make_predictions(100)
+        client = APIClient()
+        url = '/api/predictions/stats/?ci=bootstrap&n=200'
+        with mock.patch('predictions.views.BOOTSTRAP_INLINE_MAX_DRAWS', 1000):
+            response = client.get(url)
+            self.assertEqual(response.status_code, 202)
+            self.assertNotIn('metrics', response.json())
+            job = response.json()['calibration_job']
+            self.assertEqual(job['kind'], AIJob.KIND_CALIBRATION)
+            self.assertEqual(len(job['result']['metrics']['brier_score_ci']), 2)
+
+            # Once computed, the intervals are answered inline
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['metrics'], job['result']['metrics'])
+            self.assertEqual(response.json()['calibration_bins'], job['result']['calibration_bins'])
+
+    @override_settings(AI_JOBS_EAGER=False)
+    def test_large_bootstraps_share_the_job_under_way(self):
+        make_predictions(100)
+        client = APIClient()
+        url = '/api/predictions/stats/?ci=bootstrap&n=200'
+        with mock.patch('predictions.views.BOOTSTRAP_INLINE_MAX_DRAWS', 1000):
+            # The jobs stay pending: their on_commit callbacks never run here
+            first = client.get(url).json()['calibration_job']
+            self.assertEqual(client.get(url).json()['calibration_job']['id'], first['id'])
+            self.assertNotEqual(client.get(f'{url}&bins=5').json()['calibration_job']['id'], first['id'])
+
+            AIJob.objects.filter(pk=first['id']).update(status=AIJob.STATUS_FAILED)
+            self.assertNotEqual(client.get(url).json()['calibration_job']['id'], first['id'])
+        self.assertEqual(AIJob.objects.filter(kind=AIJob.KIND_CALIBRATION).count(), 3)
+
+
+class TimeseriesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_matches_reference(self):
+        predictions = make_predictions(300)
+        start = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        for i, prediction in enumerate(predictions):
+            prediction.created_at = start + timedelta(hours=13 * i)
+        Prediction.objects.bulk_update(predictions, ['created_at'])
+
+        response = APIClient().get('/api/predictions/stats/timeseries/?bucket=week&window=25&bins=5')
+        self.assertEqual(response.status_code, 200)
+        series = response.json()['series']
+
+        scored = [p for p in predictions if p.resolved]
+
+        def metrics(window):
+            brier = sum((p.probability - p.outcome) ** 2 for p in window) / len(window)
+            gaps = {}
+            for p in window:
+                index = sum(p.probability >= i * 0.2 for i in range(1, 5))
+                gaps[index] = gaps.get(index, 0) + p.probability - p.outcome
+            return brier, sum(abs(gap) for gap in gaps.values()) / len(window)
+
+        weeks = {}
+        for p in scored:
+            monday = (p.created_at - timedelta(days=p.created_at.weekday())).date()
+            weeks.setdefault(monday, []).append(p)
+        self.assertEqual(len(series), len(weeks))
+        for point, (monday, members) in zip(series, sorted(weeks.items())):
+            self.assertEqual(point['start'][:10], monday.isoformat())
+            self.assertEqual(point['count'], len(members))
+            brier, ece = metrics(members)
+            self.assertAlmostEqual(point['brier_score'], brier, delta=1e-4)
+            self.assertAlmostEqual(point['ece'], ece, delta=1e-4)
+
+            last = scored.index(members[-1])
+            window = scored[max(0, last - 24):last + 1]
+            self.assertEqual(point['rolling_count'], len(window))
+            brier, ece = metrics(window)
+            self.assertAlmostEqual(point['rolling_brier_score'], brier, delta=1e-4)
+            self.assertAlmostEqual(point['rolling_ece'], ece, delta=1e-4)
+
+    def test_monthly_and_validation(self):
+        make_predictions(40)
+        client = APIClient()
+        series = client.get('/api/predictions/stats/timeseries/?bucket=month').json()['series']
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]['count'], Prediction.objects.filter(resolved=True).count())
+
+        for query in ('bucket=day', 'window=0', 'window=x'):
+            self.assertEqual(client.get(f'/api/predictions/stats/timeseries/?{query}').status_code, 400, query)
+
+    def test_empty(self):
+        response = APIClient().get('/api/predictions/stats/timeseries/')
+        self.assertEqual(response.json(), {'bucket': 'week', 'window': 100, 'series': []})
+
+
+class CalibrationSummaryTests(TestCase):
+    def assertSummaryCurrent(self):
+        self.assertEqual(build_stats(summary_buckets()), calibration_stats(Prediction.objects.all()))
+
+    def test_summary_follows_writes(self):
+        predictions = make_predictions(60)
+        self.assertSummaryCurrent()
+
+        client = APIClient()
+        pending = [p for p in predictions if not p.resolved]
+        client.post(f'/api/predictions/{pending[0].id}/resolve/', {'outcome': True}, format='json')
+        client.patch(f'/api/predictions/{predictions[1].id}/', {'probability': 0.35}, format='json')
+        client.delete(f'/api/predictions/{predictions[2].id}/')
+        self.assertSummaryCurrent()
+
+        Prediction.objects.filter(probability__lt=0.5).delete()
+        self.assertSummaryCurrent()
+
+    def test_stats_endpoint_reads_summary_only(self):
+        make_predictions(50)
+        # The summary rows, plus the data version for the ETag
+        with self.assertNumQueries(2):
+            response = APIClient().get('/api/predictions/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_predictions'], 50)
+
+    def test_rebuild_command_repairs_drift(self):
+        make_predictions(30)
+        CalibrationSummary.objects.filter(bucket=5).update(count=999)
+
+        out = StringIO()
+        call_command('rebuild_calibration_summary', '--check', stdout=out)
+        self.assertIn('out of date', out.getvalue())
+
+        call_command('rebuild_calibration_summary', stdout=StringIO())
+        self.assertSummaryCurrent()
+
+
+class PredictionListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictions = make_predictions(45)
+
+    def test_cursor_pages_cover_every_prediction_once(self):
+        seen = []
+        url = '/api/predictions/?page_size=10'
+        while url:
+            page = self.client.get(url).json()
+            seen += [p['id'] for p in page['results']]
+            url = page['next']
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(set(seen), {str(p.id) for p in self.predictions})
+
+    def test_fields_projection(self):
+        page = self.client.get('/api/predictions/?fields=id,probability').json()
+        self.assertEqual(set(page['results'][0]), {'id', 'probability'})
+
+        response = self.client.get('/api/predictions/?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_filters(self):
+        page = self.client.get('/api/predictions/?resolved=false&page_size=100').json()
+        self.assertEqual(len(page['results']), sum(not p.resolved for p in self.predictions))
+        self.assertTrue(all(not p['resolved'] for p in page['results']))
+
+        page = self.client.get('/api/predictions/?outcome=true&page_size=100').json()
+        self.assertEqual(len(page['results']), sum(p.outcome is True for p in self.predictions))
+
+        response = self.client.get('/api/predictions/?resolve_by_after=yesterday')
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        make_predictions(30)
+        self.expected = self.client.get('/api/predictions/?page_size=500').json()['results']
+
+    def export(self, query, **extra):
+        response = self.client.get(f'/api/predictions/export/?{query}', **extra)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_ndjson_matches_api(self):
+        response, content = self.export('format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(rows, self.expected)
+
+    def test_csv(self):
+        response, content = self.export('format=csv&resolved=false&fields=id,probability,outcome')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="predictions.csv"')
+        rows = list(csv.reader(StringIO(content.decode())))
+        self.assertEqual(rows[0], ['id', 'probability', 'outcome'])
+        pending = [p for p in self.expected if not p['resolved']]
+        self.assertEqual(rows[1:], [[p['id'], str(p['probability']), ''] for p in pending])
+
+    def test_gzip_is_optional(self):
+        response, content = self.export('format=csv', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+        response, compressed = self.export('format=csv&compress=true', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed), content)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/predictions/export/?format=xml').status_code, 404)
+
+
+class ImportCommandTests(TestCase):
+    def write(self, name, content):
+        path = Path(self.tmp.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_predictions', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_round_trip_export_is_idempotent(self):
+        make_predictions(40)
+        client = APIClient()
+        exported = b''.join(client.get('/api/predictions/export/?format=ndjson').streaming_content).decode()
+        before = client.get('/api/predictions/?page_size=500').json()['results']
+        stats = client.get('/api/predictions/stats/').json()
+
+        Prediction.objects.all().delete()
+        path = self.write('history.ndjson', exported)
+        out, err = self.run_import(path, '--batch-size', '7')
+        self.assertIn('40 created, 0 updated', out)
+        self.assertEqual(err, '')
+
+        out, err = self.run_import(path)
+        self.assertIn('0 created, 40 updated', out)
+        self.assertEqual(client.get('/api/predictions/?page_size=500').json()['results'], before)
+        self.assertEqual(client.get('/api/predictions/stats/').json(), stats)
+
+    def test_csv_with_rejected_rows(self):
+        existing = make_predictions(1)[0]
+        path = self.write('history.csv', '\n'.join([
+            'id,description,probability,resolve_by,resolved,outcome',
+            f'{existing.id},An updated description of it,0.9,2020-01-01T00:00:00Z,true,true',
+            ',A brand new historical prediction,0.25,,false,',
+            ',short,0.5,,false,',
+            ',Probability far too high here,1.5,,false,',
+        ]) + '\n')
+        out, err = self.run_import(path)
+        self.assertIn('1 created, 1 updated', out)
+        self.assertIn('rejected 2 rows', out)
+        self.assertIn('Line 4: {"description"', err)
+        self.assertIn('Line 5: {"probability"', err)
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.description, existing.probability, existing.outcome), ('An updated description of it', 0.9, True))
+        self.assertTrue(Prediction.objects.filter(description='A brand new historical prediction').exists())
+        self.assertEqual(build_stats(summary_buckets()), calibration_stats(Prediction.objects.all()))
+
+    def test_bad_json_and_unknown_format(self):
+        path = self.write('history.ndjson', 'not json\n[1]\n{"description": "A prediction from json", "probability": 0.4}\n')
+        out, err = self.run_import(path)
+        self.assertIn('1 created', out)
+        self.assertIn('Line 1: Invalid JSON', err)
+        self.assertIn('Line 2: Expected a JSON object', err)
+
+        with self.assertRaises(CommandError):
+            self.run_import(self.write('history.txt', ''))
+
+
+class SyntheticDataTests(TestCase):
+    def test_calibration_curve(self):
+        call_command('generate_synthetic_predictions', 3000, '--batch-size', '1000', stdout=StringIO())
+        self.assertEqual(Prediction.objects.count(), 3000)
+        self.assertEqual(build_stats(summary_buckets()), calibration_stats(Prediction.objects.all()))
+        calibrated = calibration_metrics(Prediction.objects.all())
+
+        call_command('generate_synthetic_predictions', 3000, '--sharpness', '0.2', '--seed', '1', '--clear', stdout=StringIO())
+        overconfident = calibration_metrics(Prediction.objects.all())
+        self.assertLess(calibrated['ece'], 0.05)
+        self.assertGreater(overconfident['ece'], 0.15)
+
+    def test_clear_keeps_other_owners(self):
+        user = User.objects.create_user('synthetic')
+        call_command('generate_synthetic_predictions', 50, '--owner', 'synthetic', stdout=StringIO())
+        make_predictions(10)
+        PredictionInsight.objects.create(
+            prediction=Prediction.objects.filter(owner=user, resolved=True).first(), prompt_hash='hash', text='Insight'
+        )
+
+        # The summary is rebuilt once, not updated per deleted prediction
+        with mock.patch('predictions.signals.record_changes') as record_changes:
+            call_command(
+                'generate_synthetic_predictions', 20, '--owner', 'synthetic', '--seed', '1', '--clear',
+                stdout=StringIO(),
+            )
+        record_changes.assert_not_called()
+        self.assertEqual(Prediction.objects.filter(owner=user).count(), 20)
+        self.assertEqual(Prediction.objects.filter(owner=None).count(), 10)
+        self.assertFalse(PredictionInsight.objects.exists())
+        self.assertEqual(build_stats(summary_buckets(user.pk)), calibration_stats(Prediction.objects.filter(owner=user)))
+        self.assertEqual(build_stats(summary_buckets()), calibration_stats(Prediction.objects.filter(owner=None)))
+
+
+class BulkEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_bulk_create(self):
+        items = [{'description': f'Bulk prediction number {i}', 'probability': i / 10} for i in range(10)]
+        response = self.client.post('/api/predictions/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 10)
+        self.assertEqual(Prediction.objects.count(), 10)
+        self.assertEqual(build_stats(summary_buckets())['total_predictions'], 10)
+
+    def test_bulk_create_reports_item_errors(self):
+        items = [
+            {'description': 'A perfectly valid prediction', 'probability': 0.5},
+            {'description': 'short', 'probability': 1.5},
+        ]
+        response = self.client.post('/api/predictions/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['errors']
+        self.assertEqual([e['index'] for e in errors], [1])
+        self.assertEqual(set(errors[0]['errors']), {'description', 'probability'})
+        self.assertFalse(Prediction.objects.exists())
+
+    def test_bulk_resolve(self):
+        predictions = make_predictions(20)
+        pending = [p for p in predictions if not p.resolved]
+        payload = {str(p.id): i % 2 == 0 for i, p in enumerate(pending)}
+        response = self.client.post('/api/predictions/bulk_resolve/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resolved'], len(pending))
+        self.assertFalse(Prediction.objects.filter(resolved=False).exists())
+        self.assertEqual(build_stats(summary_buckets()), calibration_stats(Prediction.objects.all()))
+
+    def test_bulk_resolve_reports_item_errors(self):
+        prediction = make_predictions(1)[0]
+        missing = '00000000-0000-0000-0000-000000000000'
+        payload = {str(prediction.id): 'yes', missing: True, 'not-a-uuid': False}
+        response = self.client.post('/api/predictions/bulk_resolve/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), set(payload))
+
+
+@override_settings(AI_JOBS_EAGER=True)
+class AIJobTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_stats_queues_summary_job(self):
+        make_predictions(20)
+        stats = self.client.get('/api/predictions/stats/?ai_summary=true').json()
+        job = stats['ai_summary_job']
+        self.assertEqual(job['status'], AIJob.STATUS_SUCCEEDED)
+
+        response = self.client.get(f"/api/ai_jobs/{job['id']}/")
+        self.assertEqual(response.json()['result'], 'Fake Gemini response')
+        self.assertIn('Brier Score', self.model.prompts[0])
+
+    def test_insight_returns_job(self):
+        prediction = make_predictions(1)[0]
+        response = self.client.get(f'/api/predictions/{prediction.id}/ai_insight/')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['kind'], AIJob.KIND_INSIGHT)
+        self.assertEqual(response.json()['result'], 'Fake Gemini response')
+
+    def test_suggestions_job(self):
+        suggestions = [{'description': f'Suggestion {i}', 'confidence': 50} for i in range(3)]
+        self.model.text = json.dumps(suggestions)
+        response = self.client.get('/api/predictions/ai_suggest/')
+        self.assertEqual(response.json()['result'], suggestions)
+
+    def test_purge(self):
+        now = timezone.now()
+        old = now - timedelta(days=8)
+        for job_status in (AIJob.STATUS_SUCCEEDED, AIJob.STATUS_FAILED):
+            AIJob.objects.create(kind=AIJob.KIND_INSIGHT, status=job_status, finished_at=old)
+            AIJob.objects.create(kind=AIJob.KIND_INSIGHT, status=job_status, finished_at=now)
+        stale = AIJob.objects.create(kind=AIJob.KIND_INSIGHT, status=AIJob.STATUS_RUNNING)
+        AIJob.objects.filter(pk=stale.pk).update(created_at=now - timedelta(hours=1))
+        fresh = AIJob.objects.create(kind=AIJob.KIND_INSIGHT)
+
+        out = StringIO()
+        call_command('purge_ai_jobs', stdout=out)
+        self.assertIn('Deleted 2 finished jobs, marked 1 stale jobs failed', out.getvalue())
+        self.assertEqual(AIJob.objects.count(), 4)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, AIJob.STATUS_FAILED)
+        self.assertIsNotNone(stale.finished_at)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, AIJob.STATUS_PENDING)
+
+    def test_enqueue_purges_now_and_then(self):
+        AIJob.objects.create(
+            kind=AIJob.KIND_INSIGHT, status=AIJob.STATUS_SUCCEEDED, finished_at=timezone.now() - timedelta(days=8)
+        )
+        with mock.patch('predictions.jobs._last_purge', None):
+            self.client.get('/api/predictions/ai_suggest/')
+        self.assertEqual(AIJob.objects.count(), 1)
+
+    def test_jobs_are_scoped_to_owner(self):
+        alice = User.objects.create_user('alice')
+        bob = User.objects.create_user('bob')
+        self.client.force_authenticate(alice)
+        job = self.client.get('/api/predictions/ai_suggest/').json()
+        self.assertEqual(AIJob.objects.get(pk=job['id']).owner, alice)
+        self.assertEqual(self.client.get(f"/api/ai_jobs/{job['id']}/").status_code, 200)
+
+        self.client.force_authenticate(bob)
+        self.assertEqual(self.client.get(f"/api/ai_jobs/{job['id']}/").status_code, 404)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(f"/api/ai_jobs/{job['id']}/").status_code, 404)
+
+
+class BatchFakeModel(FakeModel):
+    """Answers batch insight prompts with a JSON object keyed by prediction id."""
+
+    def generate_content(self, prompt, **kwargs):
+        self.prompts.append(prompt)
+        ids = re.findall(r'^- id (\S+):', prompt, re.MULTILINE)
+        return FakeResponse(json.dumps({pk: f'Insight for {pk}' for pk in ids}))
+
+
+@override_settings(AI_JOBS_EAGER=True)
+class BatchInsightTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = BatchFakeModel()
+        gemini_service._gemini_service = GeminiService(model=self.model)
+        self.client = APIClient()
+
+    def test_batch_uses_one_prompt_and_fills_insight_cache(self):
+        predictions = make_predictions(5)
+        ids = [str(p.id) for p in predictions]
+        response = self.client.post('/api/predictions/ai_insights/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual(job['kind'], AIJob.KIND_INSIGHTS)
+        self.assertEqual(job['result'], {pk: f'Insight for {pk}' for pk in ids})
+        self.assertEqual(len(self.model.prompts), 1)
+
+        # Single insights are now answered from the cache
+        response = self.client.get(f'/api/predictions/{ids[0]}/ai_insight/')
+        self.assertEqual(response.json()['result'], f'Insight for {ids[0]}')
+        self.assertEqual(len(self.model.prompts), 1)
+
+        # And so is a repeated batch
+        job = self.client.post('/api/predictions/ai_insights/', {'ids': ids}, format='json').json()
+        self.assertEqual(job['result'], {pk: f'Insight for {pk}' for pk in ids})
+        self.assertEqual(len(self.model.prompts), 1)
+
+    @override_settings(GEMINI_BATCH_MAX_ITEMS=2)
+    def test_batch_is_chunked(self):
+        ids = [str(p.id) for p in make_predictions(5)]
+        job = self.client.post('/api/predictions/ai_insights/', {'ids': ids}, format='json').json()
+        self.assertEqual(job['result'], {pk: f'Insight for {pk}' for pk in ids})
+        self.assertEqual(len(self.model.prompts), 3)
+
+    def test_missing_answers_are_reported_per_prediction(self):
+        ids = [str(p.id) for p in make_predictions(2)]
+        self.model.generate_content = lambda prompt, **kwargs: FakeResponse(json.dumps({ids[0]: 'Only one'}))
+        job = self.client.post('/api/predictions/ai_insights/', {'ids': ids}, format='json').json()
+        self.assertEqual(job['result'][ids[0]], 'Only one')
+        self.assertTrue(job['result'][ids[1]].startswith('Error generating insight'))
+
+    def test_invalid_ids(self):
+        prediction = make_predictions(1)[0]
+        missing = '00000000-0000-0000-0000-000000000000'
+        response = self.client.post(
+            '/api/predictions/ai_insights/', {'ids': [str(prediction.id), 'nope', missing]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['errors']), {'nope', missing})
+        self.assertEqual(self.client.post('/api/predictions/ai_insights/', {'ids': []}, format='json').status_code, 400)
+        self.assertFalse(AIJob.objects.exists())
+
+
+def parse_events(content):
+    """Parse a text/event-stream body into (event, data) pairs."""
+    events = []
+    for block in content.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields.get('event', 'message'), json.loads(fields['data'])))
+    return events
+
+
+async def read_stream(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class StreamingAIViewTests(FakeGeminiMixin, TestCase):
+    fake_text = 'Your calibration\nlooks good.'
+
+    async def stream(self, url):
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.streaming)
+        return parse_events((await read_stream(response)).decode())
+
+    async def test_insight_streams_chunks(self):
+        prediction = (await sync_to_async(make_predictions)(1))[0]
+        events = await self.stream(f'/api/async/predictions/{prediction.id}/ai_insight/stream/')
+        self.assertEqual(events, [
+            ('message', {'text': 'Your '}),
+            ('message', {'text': 'calibration\n'}),
+            ('message', {'text': 'looks '}),
+            ('message', {'text': 'good.'}),
+            ('done', {}),
+        ])
+
+        # The complete text is cached for the JSON endpoint and later streams
+        events = await self.stream(f'/api/async/predictions/{prediction.id}/ai_insight/stream/')
+        self.assertEqual(events, [('message', {'text': self.fake_text}), ('done', {})])
+        self.assertEqual(len(self.model.prompts), 1)
+
+    async def test_summary_stream_reports_errors(self):
+        events = await self.stream('/api/async/predictions/stats/ai_summary/stream/')
+        self.assertEqual(events[-1][0], 'done')
+        self.assertIn('No resolved predictions', events[-1][1]['error'])
+
+        await sync_to_async(make_predictions)(20)
+        events = await self.stream('/api/async/predictions/stats/ai_summary/stream/')
+        self.assertEqual(''.join(data['text'] for event, data in events[:-1]), self.fake_text)
+        self.assertEqual(events[-1], ('done', {}))
+
+    async def test_unknown_prediction(self):
+        response = await self.async_client.get(
+            '/api/async/predictions/00000000-0000-0000-0000-000000000000/ai_insight/stream/'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_streams_are_only_routed_under_asgi(self):
+        prediction = make_predictions(1)[0]
+        self.assertEqual(self.client.get(f'/api/predictions/{prediction.id}/ai_insight/stream/').status_code, 404)
+        self.assertEqual(self.client.get('/api/predictions/stats/ai_summary/stream/').status_code, 404)
+
+        try:
+            with override_settings(ASGI=True):
+                routes = {
+                    pattern.name: pattern.callback for pattern in importlib.reload(urls).urlpatterns
+                    if hasattr(pattern, 'name')
+                }
+            self.assertIs(routes['ai-insight-stream'], async_views.ai_insight_stream)
+            self.assertIs(routes['ai-summary-stream'], async_views.ai_summary_stream)
+        finally:
+            importlib.reload(urls)
+
+
+class AIJobThreadPoolTests(FakeGeminiMixin, TransactionTestCase):
+    def test_job_runs_in_background(self):
+        prediction = make_predictions(1)[0]
+        client = APIClient()
+        finished = threading.Event()
+        original = jobs.run_job
+
+        def run_job(job_id):
+            try:
+                original(job_id)
+            finally:
+                finished.set()
+
+        # Polling while the job runs would race it for SQLite's table locks
+        with mock.patch('predictions.jobs.run_job', run_job):
+            job = client.get(f'/api/predictions/{prediction.id}/ai_insight/').json()
+            self.assertTrue(finished.wait(5))
+        job = client.get(f"/api/ai_jobs/{job['id']}/").json()
+        self.assertEqual(job['status'], AIJob.STATUS_SUCCEEDED)
+        self.assertEqual(job['result'], 'Fake Gemini response')
+
+
+class ResponseCacheTests(FakeGeminiMixin, TestCase):
+    def test_repeated_summary_is_served_from_cache(self):
+        gemini = gemini_service.get_gemini_service()
+        stats = {'total_predictions': 5, 'resolved_predictions': 5, 'brier_score': 0.2, 'calibration_bins': []}
+        self.assertEqual(gemini.generate_calibration_summary(stats), 'Fake Gemini response')
+        self.assertEqual(gemini.generate_calibration_summary(dict(stats)), 'Fake Gemini response')
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertEqual(gemini.cache.counters()['summary'], {'hits': 1, 'misses': 1})
+
+        stats['brier_score'] = 0.1
+        gemini.generate_calibration_summary(stats)
+        self.assertEqual(len(self.model.prompts), 2)
+
+    @override_settings(GEMINI_CACHE_TTLS={'insight': 60})
+    def test_lru_eviction_and_ttl(self):
+        cache = gemini_service.ResponseCache(max_entries=2)
+        for key in 'abc':
+            cache.set(key, key.upper(), ttl=60)
+        self.assertIsNone(cache.get('a', 'insight'))
+        self.assertEqual(cache.get('c', 'insight'), 'C')
+
+        cache.set('d', 'D', ttl=-1)
+        self.assertIsNone(cache.get('d', 'insight'))
+
+    @override_settings(AI_JOBS_EAGER=True)
+    def test_cached_insight_job_is_created_finished(self):
+        prediction = make_predictions(1)[0]
+        client = APIClient()
+        client.get(f'/api/predictions/{prediction.id}/ai_insight/')
+        job = client.get(f'/api/predictions/{prediction.id}/ai_insight/').json()
+        self.assertEqual(job['status'], AIJob.STATUS_SUCCEEDED)
+        self.assertEqual(len(self.model.prompts), 1)
+
+
+class AsyncAIViewTests(FakeGeminiMixin, TestCase):
+    async def test_async_insight(self):
+        prediction = await Prediction.objects.acreate(description='An async prediction', probability=0.6)
+        response = await self.async_client.get(f'/api/async/predictions/{prediction.id}/ai_insight/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'insight': 'Fake Gemini response'})
+
+        response = await self.async_client.get(f'/api/async/predictions/{prediction.id}/ai_insight/')
+        self.assertEqual(len(self.model.prompts), 1)
+
+    async def test_async_summary(self):
+        await sync_to_async(make_predictions)(20)
+        response = await self.async_client.get('/api/async/predictions/stats/ai_summary/')
+        data = response.json()
+        self.assertEqual(data['total_predictions'], 20)
+        self.assertEqual(data['ai_summary'], 'Fake Gemini response')
+
+    async def test_async_suggestions_fall_back_on_bad_json(self):
+        self.model.text = 'not json'
+        response = await self.async_client.get('/api/async/predictions/ai_suggest/')
+        self.assertEqual(response.json()['suggestions'], gemini_service.FALLBACK_SUGGESTIONS)
+
+
+class RequestMetricsTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        for histogram in metrics.HISTOGRAMS:
+            histogram.clear()
+
+    def server_timing(self, response):
+        return {
+            name: dict(param.split('=', 1) for param in params)
+            for name, *params in (entry.split(';') for entry in response['Server-Timing'].split(', '))
+        }
+
+    def test_server_timing_header(self):
+        make_predictions(3)
+        response = self.client.get('/api/predictions/')
+        timing = self.server_timing(response)
+        self.assertEqual(set(timing), {'total', 'db', 'serializer', 'gemini'})
+        self.assertGreater(float(timing['serializer']['dur']), 0)
+        self.assertRegex(timing['db']['desc'], r'^"[1-9]\d* queries"$')
+        self.assertGreaterEqual(float(timing['total']['dur']), float(timing['db']['dur']))
+
+    def test_gemini_time_is_recorded(self):
+        prediction = make_predictions(1)[0]
+        with mock.patch.object(self.model, 'generate_content', side_effect=lambda prompt, **kwargs: (
+            time.sleep(0.01), FakeResponse('Slow response'))[1]
+        ):
+            response = self.client.get(f'/api/async/predictions/{prediction.id}/ai_insight/')
+        self.assertGreaterEqual(float(self.server_timing(response)['gemini']['dur']), 10)
+
+    def test_prometheus_histograms(self):
+        self.client.get('/api/predictions/')
+        self.client.get('/api/predictions/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+        self.client.force_login(User.objects.create_user('user'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/api/metrics/')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', text)
+        self.assertIn('http_request_duration_seconds_count{view="prediction-list",method="GET"} 2', text)
+        self.assertIn('http_request_db_queries_bucket{view="prediction-list",method="GET",le="+Inf"} 2', text)
+        self.assertIn('http_request_gemini_duration_seconds_sum{view="prediction-list",method="GET"} 0.0', text)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.prediction = make_predictions(5)[0]
+        # Written in an earlier second, so responses carry Last-Modified
+        DataVersion.objects.update(updated_at=F('updated_at') - timedelta(seconds=2))
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get('/api/predictions/')
+        etag = response['ETag']
+        self.assertRegex(etag, r'^"\d+-[0-9a-f]{16}"$')
+        self.assertIn('Last-Modified', response)
+
+        with mock.patch.object(PredictionSerializer, 'to_representation') as to_representation:
+            response = self.client.get('/api/predictions/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        to_representation.assert_not_called()
+
+    def test_write_changes_etag(self):
+        for url in ('/api/predictions/', f'/api/predictions/{self.prediction.id}/', '/api/predictions/stats/'):
+            etag = self.client.get(url)['ETag']
+            self.client.post(f'/api/predictions/{self.prediction.id}/resolve/', {'outcome': False}, format='json')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_last_modified_waits_for_the_second_to_pass(self):
+        url = f'/api/predictions/{self.prediction.id}/'
+        resolve = f'/api/predictions/{self.prediction.id}/resolve/'
+        second = timezone.now().replace(microsecond=0) - timedelta(seconds=10)
+        with mock.patch('django.utils.timezone.now', return_value=second + timedelta(microseconds=100)):
+            self.client.post(resolve, {'outcome': False}, format='json')
+            response = self.client.get(url)
+            self.assertNotIn('Last-Modified', response)
+            etag = response['ETag']
+
+            # A second write within the same second
+            self.client.post(resolve, {'outcome': True}, format='json')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIs(response.json()['outcome'], True)
+
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'], http_date(second.timestamp()))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_depends_on_representation(self):
+        etag = self.client.get('/api/predictions/')['ETag']
+        response = self.client.get('/api/predictions/?fields=id', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_stats_with_ai_summary_is_not_conditional(self):
+        response = self.client.get('/api/predictions/stats/?ai_summary=false')
+        self.assertNotIn('ETag', response)
+
+    def test_profile(self):
+        UserProfile.objects.create(pk=1)
+        etag = self.client.get('/api/profile/')['ETag']
+        self.assertEqual(self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.patch('/api/profile/1/', {'name': 'Ada'}, format='json')
+        response = self.client.get('/api/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Ada')
+
+
+class ServerResponseCacheTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.predictions = make_predictions(5)
+
+    def test_list_and_stats_are_served_from_cache(self):
+        for url in ('/api/predictions/', '/api/predictions/stats/'):
+            data = self.client.get(url).json()
+            with self.assertNumQueries(1):
+                self.assertEqual(self.client.get(url).json(), data)
+
+    def test_writes_invalidate(self):
+        self.client.get('/api/predictions/')
+        self.client.get('/api/predictions/stats/')
+
+        created = Prediction.objects.create(description='Created through the ORM', probability=0.5)
+        self.assertEqual(self.client.get('/api/predictions/').json()['results'][0]['id'], str(created.id))
+        self.assertEqual(self.client.get('/api/predictions/stats/').json()['total_predictions'], 6)
+
+        created.delete()
+        self.assertNotIn(str(created.id), [p['id'] for p in self.client.get('/api/predictions/').json()['results']])
+        self.assertEqual(self.client.get('/api/predictions/stats/').json()['total_predictions'], 5)
+
+    def test_stats_with_ai_summary_is_not_cached(self):
+        self.client.get('/api/predictions/stats/?ai_summary=false')
+        # The summary is read again, without looking up the data version
+        with self.assertNumQueries(1):
+            self.client.get('/api/predictions/stats/?ai_summary=false')
+
+    def test_concurrent_misses_compute_once(self):
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def compute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return {'value': 42}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do('key', compute))) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'value': 42}] * 5)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_failed_computation_is_shared_and_not_cached(self):
+        def compute():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            get_or_compute('responses:test-failure', compute)
+        self.assertEqual(get_or_compute('responses:test-failure', lambda: 'ok'), 'ok')
+
+    def test_only_ok_responses_are_cached_with_their_headers(self):
+        responses = [
+            Response({'pending': True}, status=202, headers={'Retry-After': '5'}),
+            Response({'done': True}, headers={'X-Answer': '42'}),
+        ]
+
+        @cache_response(PREDICTIONS)
+        def view(viewset, request):
+            return responses.pop(0)
+
+        def get():
+            request = Request(APIRequestFactory().get('/api/predictions/test/'))
+            request.user = AnonymousUser()
+            return view(None, request)
+
+        cache.clear()
+        first = get()
+        self.assertEqual((first.status_code, first.data, first['Retry-After']), (202, {'pending': True}, '5'))
+        for _ in range(2):
+            # Computed once, then served from the cache
+            response = get()
+            self.assertEqual((response.status_code, response.data, response['X-Answer']), (200, {'done': True}, '42'))
+
+
+class TenancyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user('alice')
+        self.bob = User.objects.create_user('bob')
+        self.anonymous = APIClient()
+        self.alice_client = APIClient()
+        self.alice_client.force_authenticate(self.alice)
+        self.bob_client = APIClient()
+        self.bob_client.force_authenticate(self.bob)
+
+    def create(self, client, probability=0.7, count=1):
+        return [
+            client.post(
+                '/api/predictions/', {'description': f'Prediction number {i} here', 'probability': probability},
+                format='json',
+            ).json()['id']
+            for i in range(count)
+        ]
+
+    def test_predictions_are_scoped_to_owner(self):
+        alice_ids = self.create(self.alice_client, count=3)
+        bob_ids = self.create(self.bob_client, count=2)
+        anonymous_ids = self.create(self.anonymous)
+
+        for client, ids in ((self.alice_client, alice_ids), (self.bob_client, bob_ids), (self.anonymous, anonymous_ids)):
+            listed = [p['id'] for p in client.get('/api/predictions/').json()['results']]
+            self.assertCountEqual(listed, ids)
+        self.assertEqual(Prediction.objects.get(pk=alice_ids[0]).owner, self.alice)
+
+        self.assertEqual(self.bob_client.get(f'/api/predictions/{alice_ids[0]}/').status_code, 404)
+        self.assertEqual(
+            self.bob_client.post(f'/api/predictions/{alice_ids[0]}/resolve/', {'outcome': True}, format='json').status_code,
+            404,
+        )
+        response = self.bob_client.post('/api/predictions/bulk_resolve/', {alice_ids[0]: True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.bob_client.delete(f'/api/predictions/{alice_ids[0]}/').status_code, 404)
+        self.assertEqual(
+            self.anonymous.get(f'/api/async/predictions/{alice_ids[0]}/ai_insight/stream/').status_code, 404
+        )
+
+    def test_stats_are_per_owner(self):
+        alice_ids = self.create(self.alice_client, probability=0.9, count=4)
+        self.alice_client.post('/api/predictions/bulk_resolve/', {pk: True for pk in alice_ids}, format='json')
+        self.bob_client.post('/api/predictions/bulk/', [
+            {'description': f'Bulk prediction number {i}', 'probability': 0.2} for i in range(5)
+        ], format='json')
+
+        alice_stats = self.alice_client.get('/api/predictions/stats/').json()
+        self.assertEqual((alice_stats['total_predictions'], alice_stats['resolved_predictions']), (4, 4))
+        self.assertAlmostEqual(alice_stats['brier_score'], 0.01)
+        bob_stats = self.bob_client.get('/api/predictions/stats/').json()
+        self.assertEqual((bob_stats['total_predictions'], bob_stats['resolved_predictions']), (5, 0))
+        self.assertEqual(self.anonymous.get('/api/predictions/stats/').json()['total_predictions'], 0)
+
+        chart = self.alice_client.get('/api/predictions/stats/chart/').json()
+        self.assertEqual(chart['count'], 4)
+        self.assertEqual(self.bob_client.get('/api/predictions/stats/chart/').json()['count'], 0)
+
+        # Summaries stay consistent with the rows, per owner
+        for owner in (self.alice, self.bob, None):
+            expected = aggregate_buckets(Prediction.objects.owned_by(owner))
+            stored = summary_buckets(owner.pk if owner else None)
+            self.assertEqual({b: row['count'] for b, row in stored.items() if row['count']},
+                             {b: row['count'] for b, row in expected.items()})
+
+    def test_caches_and_etags_are_per_owner(self):
+        self.create(self.alice_client, count=2)
+        alice = self.alice_client.get('/api/predictions/')
+        bob = self.bob_client.get('/api/predictions/')
+        self.assertEqual(len(bob.json()['results']), 0)
+        self.assertNotEqual(alice['ETag'], bob['ETag'])
+
+        # A write by one user leaves the others' validators current
+        self.create(self.alice_client)
+        self.assertEqual(self.bob_client.get('/api/predictions/', HTTP_IF_NONE_MATCH=bob['ETag']).status_code, 304)
+
+    def test_profiles_are_per_user(self):
+        self.alice_client.patch('/api/profile/1/', {'name': 'Alice'}, format='json')
+        self.assertEqual(self.alice_client.get('/api/profile/').json()['name'], 'Alice')
+        self.assertEqual(self.bob_client.get('/api/profile/').json()['name'], '')
+        self.assertEqual(self.anonymous.get('/api/profile/').json()['name'], '')
+
+    def test_posting_a_profile_saves_over_the_users_profile(self):
+        profile = self.alice_client.get('/api/profile/').json()
+        response = self.alice_client.post('/api/profile/', {'name': 'Alice', 'notes': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], profile['id'])
+        self.assertEqual(self.alice_client.get('/api/profile/').json()['notes'], 'Hi')
+        # Before the profile exists too
+        self.assertEqual(self.bob_client.post('/api/profile/', {'name': 'Bob'}, format='json').status_code, 200)
+        self.assertEqual(UserProfile.objects.filter(user=self.bob).count(), 1)
+        self.assertEqual(UserProfile.objects.get(user=self.alice).name, 'Alice')
+
+    def test_moving_a_prediction_updates_both_summaries(self):
+        prediction = Prediction.objects.create(description='Owned by Alice', probability=0.4, owner=self.alice)
+        prediction.owner = self.bob
+        prediction.save()
+        self.assertEqual(sum(row['count'] for row in summary_buckets(self.alice.pk).values()), 0)
+        self.assertEqual(sum(row['count'] for row in summary_buckets(self.bob.pk).values()), 1)
+
+    def test_deleting_a_user_deletes_their_predictions_and_summary(self):
+        Prediction.objects.create(
+            description='Owned by Alice', probability=0.4, resolved=True, outcome=True, owner=self.alice
+        )
+        Prediction.objects.create(description='Owned by Bob', probability=0.4, owner=self.bob)
+        alice_pk = self.alice.pk
+        self.alice.delete()
+
+        self.assertFalse(Prediction.objects.filter(owner_id=alice_pk).exists())
+        self.assertFalse(CalibrationSummary.objects.filter(owner_id=alice_pk).exists())
+        self.assertEqual(sum(row['count'] for row in summary_buckets(self.bob.pk).values()), 1)
+        # Summary maintenance carries on for a new user with the same id
+        user = User.objects.create_user('carol', id=alice_pk)
+        Prediction.objects.create(description='Owned by Carol', probability=0.4, owner=user)
+        Prediction.objects.filter(owner=user).first().delete()
+        self.assertEqual(sum(row['count'] for row in summary_buckets(alice_pk).values()), 0)
+
+    def test_rebuild_command_rebuilds_every_owner(self):
+        Prediction.objects.create(description='Owned by Alice', probability=0.4, owner=self.alice)
+        make_predictions(10)
+        CalibrationSummary.objects.filter(owner=self.alice).update(count=5)
+
+        out = StringIO()
+        call_command('rebuild_calibration_summary', '--check', stdout=out)
+        self.assertIn(f'Owner {self.alice.pk} bucket', out.getvalue())
+        call_command('rebuild_calibration_summary', stdout=StringIO())
+        self.assertEqual(sum(row['count'] for row in summary_buckets(self.alice.pk).values()), 1)
+        self.assertEqual(sum(row['count'] for row in summary_buckets().values()), 10)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.forecasters = Group.objects.create(name='forecasters')
+        self.users = {}
+        # name -> (probability, outcomes)
+        self.records = {
+            'sharp': (0.9, [True] * 9 + [False]),
+            'hedger': (0.5, [True] * 5 + [False] * 5),
+            'overconfident': (0.9, [True] * 5 + [False] * 5),
+            'newcomer': (0.9, [True] * 2),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, (probability, outcomes) in self.records.items():
+                user = self.users[name] = User.objects.create_user(name)
+                for outcome in outcomes:
+                    Prediction.objects.create(
+                        description=f'Prediction by {name}', probability=probability,
+                        resolved=True, outcome=outcome, owner=user,
+                    )
+            self.forecasters.user_set.add(self.users['sharp'], self.users['overconfident'])
+            # Unowned predictions are not ranked
+            make_predictions(20)
+        self.client.force_authenticate(self.users['hedger'])
+
+    def expected(self, name):
+        probability, outcomes = self.records[name]
+        return {
+            'brier_score': round(sum((probability - o) ** 2 for o in outcomes) / len(outcomes), 4),
+            'ece': round(abs(probability * len(outcomes) - sum(outcomes)) / len(outcomes), 4),
+        }
+
+    def test_ranking(self):
+        data = self.client.get('/api/leaderboard/?min_resolved=5').json()
+        self.assertEqual([e['user'] for e in data['results']], ['sharp', 'hedger', 'overconfident'])
+        self.assertEqual([e['rank'] for e in data['results']], [1, 2, 3])
+        for entry in data['results']:
+            self.assertEqual(entry['resolved_predictions'], 10)
+            self.assertEqual({k: entry[k] for k in ('brier_score', 'ece')}, self.expected(entry['user']))
+
+        by_ece = self.client.get('/api/leaderboard/?min_resolved=5&order=ece').json()['results']
+        self.assertEqual([e['user'] for e in by_ece], ['hedger', 'sharp', 'overconfident'])
+
+        # The default threshold leaves everyone out; a low one lets the newcomer in
+        self.assertEqual(self.client.get('/api/leaderboard/').json()['count'], 0)
+        self.assertEqual(self.client.get('/api/leaderboard/?min_resolved=1').json()['results'][0]['user'], 'newcomer')
+
+        for query in ('order=name', 'min_resolved=0', 'limit=5000'):
+            self.assertEqual(self.client.get(f'/api/leaderboard/?{query}').status_code, 400, query)
+
+    def test_requires_login(self):
+        for url in ('/api/leaderboard/', '/api/leaderboard/cohorts/'):
+            self.assertEqual(APIClient().get(url).status_code, 403, url)
+
+    def test_cohort_and_you(self):
+        client = APIClient()
+        client.force_authenticate(self.users['overconfident'])
+        data = client.get('/api/leaderboard/?min_resolved=5&cohort=forecasters&limit=1').json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual([e['user'] for e in data['results']], ['sharp'])
+        self.assertEqual(data['you']['rank'], 2)
+
+    def test_cohort_comparison(self):
+        others = Group.objects.create(name='others')
+        with self.captureOnCommitCallbacks(execute=True):
+            others.user_set.add(self.users['hedger'])
+        cohorts = self.client.get('/api/leaderboard/cohorts/').json()['cohorts']
+        self.assertEqual([c['cohort'] for c in cohorts], ['forecasters', 'others'])
+
+        forecasters = cohorts[0]
+        self.assertEqual((forecasters['members'], forecasters['resolved_predictions']), (2, 20))
+        self.assertEqual(forecasters['calibration_bins'], [
+            {'range': '90-100%', 'count': 20, 'avg_predicted': 90.0, 'actual_frequency': 70.0}
+        ])
+        self.assertEqual(forecasters['ece'], 0.2)
+        self.assertEqual(cohorts[1]['ece'], self.expected('hedger')['ece'])
+
+        only = self.client.get('/api/leaderboard/cohorts/?cohort=others').json()['cohorts']
+        self.assertEqual([c['cohort'] for c in only], ['others'])
+
+    def test_members_of_several_cohorts_count_once_in_each(self):
+        others = Group.objects.create(name='others')
+        with self.captureOnCommitCallbacks(execute=True):
+            others.user_set.add(self.users['sharp'])
+        for query in ('', '?cohort=forecasters', '?cohort=forecasters,others'):
+            cohorts = {
+                c['cohort']: c for c in self.client.get(f'/api/leaderboard/cohorts/{query}').json()['cohorts']
+            }
+            self.assertEqual(cohorts['forecasters']['resolved_predictions'], 20, query)
+            self.assertEqual(cohorts['forecasters']['ece'], 0.2, query)
+            if 'others' in cohorts:
+                self.assertEqual(cohorts['others']['resolved_predictions'], 10, query)
+                self.assertEqual(cohorts['others']['ece'], self.expected('sharp')['ece'], query)
+
+    def test_cached_until_a_write_commits(self):
+        url = '/api/leaderboard/?min_resolved=5'
+        first = self.client.get(url).json()
+        # Only the version lookup
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url).json(), first)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(10):
+                Prediction.objects.create(
+                    description='Another miss by sharp', probability=0.9, resolved=True, outcome=False,
+                    owner=self.users['sharp'],
+                )
+        results = self.client.get(url).json()['results']
+        self.assertEqual(results[-1]['user'], 'sharp')
+        self.assertEqual(results[-1]['resolved_predictions'], 20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.forecasters.user_set.remove(self.users['sharp'])
+        cohort = self.client.get(f'{url}&cohort=forecasters').json()['results']
+        self.assertEqual([e['user'] for e in cohort], ['overconfident'])
+
+
+class StatusError(Exception):
+    """An API error with an HTTP status, like google.api_core's."""
+
+    def __init__(self, code):
+        super().__init__(f'HTTP {code}')
+        self.code = code
+
+
+class FlakyModel(FakeModel):
+    """FakeModel that takes ``latency`` seconds per call and raises the queued ``errors`` first."""
+
+    def __init__(self, text='Fake Gemini response', latency=0, errors=()):
+        super().__init__(text)
+        self.latency = latency
+        self.errors = list(errors)
+        self.lock = threading.Lock()
+        self.in_flight = self.max_in_flight = 0
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return self._respond(prompt, stream)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        await asyncio.sleep(self.latency)
+        response = self._respond(prompt, stream)
+        return FakeAsyncStream(response) if stream else response
+
+    def _respond(self, prompt, stream):
+        if self.errors:
+            self.prompts.append(prompt)
+            raise self.errors.pop(0)
+        return FakeModel.generate_content(self, prompt, stream=stream)
+
+
+class ResilienceTests(TestCase):
+    def resilient(self, model, **options):
+        self.sleeps = []
+        options.setdefault('timeout', 1)
+        options.setdefault('retries', 2)
+        options.setdefault('backoff', 0.5)
+        options.setdefault('max_backoff', 0.75)
+        options.setdefault('breaker', CircuitBreaker(5, 30))
+        return ResilientModel(model, sleep=self.sleeps.append, rng=random.Random(0), **options)
+
+    def test_transient_errors_are_retried_with_jittered_backoff(self):
+        model = FlakyModel(errors=[ConnectionError('reset'), StatusError(503)])
+        client = self.resilient(model)
+        self.assertEqual(client.generate_content('prompt').text, 'Fake Gemini response')
+        self.assertEqual(len(model.prompts), 3)
+        # Up to 0.5 then up to min(0.75, 1.0) seconds
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertTrue(0 <= self.sleeps[0] <= 0.5 and 0 <= self.sleeps[1] <= 0.75, self.sleeps)
+        self.assertEqual(client.breaker.failures, 0)
+
+        model.errors = [StatusError(429)] * 3
+        with self.assertRaises(GeminiUnavailable):
+            client.generate_content('prompt')
+        self.assertEqual(client.breaker.failures, 3)
+
+    def test_other_errors_are_not_retried(self):
+        model = FlakyModel(errors=[StatusError(400), ValueError('bad prompt')])
+        client = self.resilient(model)
+        for error in (StatusError, ValueError):
+            with self.assertRaises(error):
+                client.generate_content('prompt')
+        self.assertEqual((len(model.prompts), self.sleeps, client.breaker.failures), (2, [], 0))
+
+    def test_deadline(self):
+        # No backoff: the async retries really sleep
+        client = self.resilient(FlakyModel(latency=0.5), timeout=0.05, retries=1, backoff=0)
+        start = time.monotonic()
+        with self.assertRaises(GeminiUnavailable):
+            client.generate_content('prompt')
+        with self.assertRaises(GeminiUnavailable):
+            async_to_sync(client.generate_content_async)('prompt')
+        self.assertLess(time.monotonic() - start, 0.45)
+        self.assertEqual(client.breaker.failures, 4)
+
+    def test_breaker_opens_then_lets_a_trial_call_through(self):
+        now = [0]
+        model = FlakyModel(errors=[ConnectionError()] * 3)
+        client = self.resilient(model, retries=0, breaker=CircuitBreaker(2, 30, clock=lambda: now[0]))
+        for _ in range(2):
+            with self.assertRaises(GeminiUnavailable):
+                client.generate_content('prompt')
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(CircuitOpen):
+            client.generate_content('prompt')
+        with self.assertRaises(CircuitOpen):
+            async_to_sync(client.generate_content_async)('prompt')
+        self.assertEqual(len(model.prompts), 2)
+
+        # A failed trial opens it again at once
+        now[0] = 30
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(GeminiUnavailable):
+            client.generate_content('prompt')
+        self.assertEqual(client.breaker.state, CircuitBreaker.OPEN)
+
+        now[0] = 60
+        self.assertEqual(client.generate_content('prompt').text, 'Fake Gemini response')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_concurrency_limit(self):
+        model = FlakyModel(latency=0.05)
+        client = self.resilient(model, max_concurrency=2)
+        threads = [threading.Thread(target=client.generate_content, args=('prompt',)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(model.prompts), 6)
+        self.assertEqual(model.max_in_flight, 2)
+
+        # A call that cannot get a slot before its deadline does not reach the model
+        model.latency = 0.3
+        client = self.resilient(model, max_concurrency=1, timeout=0.1, retries=0)
+        blocker = threading.Thread(target=lambda: self.assertRaises(GeminiUnavailable, client.generate_content, 'a'))
+        blocker.start()
+        time.sleep(0.02)
+        with self.assertRaisesRegex(GeminiUnavailable, 'in flight'):
+            client.generate_content('b')
+        blocker.join()
+        client._executor.shutdown()
+        self.assertEqual(model.prompts[-1], 'a')
+
+    def test_service_serves_cached_or_fallback_answers_while_open(self):
+        model = FlakyModel()
+        service = GeminiService(model=model)
+        cached, uncached = [p.insight_data() for p in make_predictions(2)]
+        self.assertEqual(service.generate_prediction_insight(cached), 'Fake Gemini response')
+
+        for _ in range(service.client.breaker.failure_threshold):
+            service.client.breaker.record_failure()
+        stats = {'brier_score': 0.2, 'total_predictions': 5, 'resolved_predictions': 5, 'calibration_bins': []}
+        self.assertEqual(service.generate_prediction_insight(cached), 'Fake Gemini response')
+        self.assertEqual(service.generate_prediction_insight(uncached), FALLBACK_INSIGHT)
+        self.assertEqual(async_to_sync(service.agenerate_prediction_insight)(uncached), FALLBACK_INSIGHT)
+        self.assertEqual(list(service.stream_prediction_insight(uncached)), [FALLBACK_INSIGHT])
+        self.assertEqual(service.generate_calibration_summary(stats), FALLBACK_SUMMARY)
+        self.assertEqual(service.generate_prediction_suggestions(), FALLBACK_SUGGESTIONS)
+        self.assertEqual(service.generate_prediction_insights({'a': uncached}), {'a': FALLBACK_INSIGHT})
+        self.assertEqual(len(model.prompts), 1)
+
+        # Fallbacks are not cached
+        service.client.breaker.record_success()
+        self.assertEqual(service.generate_prediction_insight(uncached), 'Fake Gemini response')
+
+
+@override_settings(AI_RATE_LIMIT_CLIENT='2/min', AI_RATE_LIMIT_GLOBAL='3/min', AI_JOBS_EAGER=True)
+class AIRateLimitTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def test_token_bucket(self):
+        buckets = {'client': (2, 60), 'global': (3, 60)}
+        self.assertEqual([take(buckets, now=0) for _ in range(3)], [0, 0, 30])
+        # The client's refills at 2 and the global one at 3 per minute
+        self.assertEqual(take(buckets, now=30), 0)
+        self.assertEqual(take(buckets, now=30), 30)
+        other = {'other': (2, 60), 'global': (3, 60)}
+        self.assertEqual(take(other, now=30), 0)
+        self.assertEqual(take(other, now=30), 10)
+        # An empty global bucket took nothing from the other client's
+        self.assertEqual(take({'other': (2, 60)}, now=30), 0)
+
+    def test_ai_endpoints_are_limited_per_client_and_globally(self):
+        prediction = make_predictions(5)[0]
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/predictions/ai_suggest/').status_code, 202)
+        response = self.client.get(f'/api/predictions/{prediction.id}/ai_insight/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.client.get('/api/predictions/stats/?ai_summary=true').status_code, 429)
+        self.assertEqual(self.client.get(f'/api/async/predictions/{prediction.id}/ai_insight/stream/').status_code, 429)
+        # Other endpoints are not limited
+        self.assertEqual(self.client.get('/api/predictions/stats/').status_code, 200)
+
+        # Another client has its own bucket but shares the global one
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other'))
+        self.assertEqual(other.get('/api/predictions/ai_suggest/').status_code, 202)
+        self.assertEqual(other.get('/api/predictions/ai_suggest/').status_code, 429)
+        self.assertEqual(len(self.model.prompts), 3)
+
+    async def test_async_views(self):
+        for _ in range(2):
+            response = await self.async_client.get('/api/async/predictions/ai_suggest/')
+            self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/async/predictions/ai_suggest/')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('throttled', json.loads(response.content)['detail'])
+
+
+class UsageFakeModel(FakeModel):
+    """FakeModel reporting 10 prompt and 5 response tokens per call."""
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        response = super().generate_content(prompt, stream=stream, **kwargs)
+        usage = SimpleNamespace(prompt_token_count=10, candidates_token_count=5)
+        for chunk in response if stream else [response]:
+            chunk.usage_metadata = usage
+        return response
+
+
+@override_settings(AI_JOBS_EAGER=True)
+class AIUsageTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = UsageFakeModel()
+        gemini_service._gemini_service = GeminiService(model=self.model)
+        self.client = APIClient()
+        self.predictions = make_predictions(3)
+
+    def insight(self, prediction):
+        return self.client.get(f'/api/predictions/{prediction.id}/ai_insight/').json()['result']
+
+    def test_usage_is_recorded_per_method(self):
+        self.insight(self.predictions[0])
+        self.insight(self.predictions[0])
+        list(gemini_service.get_gemini_service().stream_prediction_insight(self.predictions[1].insight_data()))
+        self.client.get('/api/predictions/ai_suggest/')
+        self.assertEqual(
+            list(AIUsage.objects.values_list('method', 'calls', 'prompt_tokens', 'response_tokens')),
+            [('insight', 2, 20, 10), ('suggestions', 1, 10, 5)],
+        )
+
+    @override_settings(AI_DAILY_CALL_BUDGET=2)
+    def test_call_budget(self):
+        self.assertEqual(self.insight(self.predictions[0]), 'Fake Gemini response')
+        self.assertEqual(self.insight(self.predictions[1]), 'Fake Gemini response')
+        # Spent: cached answers are still served, the rest fall back
+        self.assertEqual(self.insight(self.predictions[0]), 'Fake Gemini response')
+        self.assertEqual(self.insight(self.predictions[2]), FALLBACK_INSIGHT)
+        self.assertEqual(
+            list(gemini_service.get_gemini_service().stream_prediction_insight(self.predictions[2].insight_data())),
+            [FALLBACK_INSIGHT],
+        )
+        self.assertEqual(len(self.model.prompts), 2)
+
+    @override_settings(AI_DAILY_TOKEN_BUDGET=30)
+    def test_token_budget(self):
+        self.insight(self.predictions[0])
+        self.insight(self.predictions[1])
+        self.assertEqual(self.insight(self.predictions[2]), FALLBACK_INSIGHT)
+
+    @override_settings(AI_DAILY_TOKEN_BUDGET=100)
+    def test_admin_endpoint(self):
+        self.insight(self.predictions[0])
+        self.assertEqual(self.client.get('/api/ai_usage/').status_code, 403)
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        data = self.client.get('/api/ai_usage/').json()
+        self.assertEqual(data['today']['calls'], 1)
+        self.assertEqual(data['today']['budgets'], {'calls': None, 'tokens': {'limit': 100, 'remaining': 85}})
+        self.assertEqual(
+            [(day['method'], day['calls'], day['prompt_tokens'], day['response_tokens']) for day in data['days']],
+            [('insight', 1, 10, 5)],
+        )
+        self.assertEqual(self.client.get('/api/ai_usage/?days=0').status_code, 400)
+
+
+@override_settings(AI_JOBS_EAGER=True)
+class InsightWarmerTests(FakeGeminiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.model = BatchFakeModel()
+        self.gemini = gemini_service._gemini_service = GeminiService(model=self.model)
+        self.client = APIClient()
+        self.predictions = make_predictions(10)
+        self.resolved = [p for p in self.predictions if p.resolved]
+
+    def warm(self, *args):
+        out = StringIO()
+        call_command('warm_ai_insights', *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_stores_insights_once_per_prompt(self):
+        self.assertIn(f'Stored {len(self.resolved)} insights (0 already up to date)', self.warm())
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertEqual(
+            {(i.prediction_id, i.prompt_hash, i.text) for i in PredictionInsight.objects.all()},
+            {(p.id, prompt_hash(self.gemini, p), f'Insight for {p.id}') for p in self.resolved},
+        )
+
+        self.assertIn(f'Stored 0 insights ({len(self.resolved)} already up to date)', self.warm())
+        self.assertEqual(len(self.model.prompts), 1)
+
+        # A changed prediction gets a new insight
+        changed = self.resolved[0]
+        changed.outcome = not changed.outcome
+        changed.save()
+        self.gemini.cache.clear()
+        self.assertIn(f'Stored 1 insights ({len(self.resolved) - 1} already up to date)', self.warm())
+        self.assertEqual(len(self.model.prompts), 2)
+
+    def test_command_options(self):
+        self.assertIn('Stored 2 insights', self.warm('--limit', '2'))
+        newest = Prediction.objects.filter(resolved=True).order_by('-created_at', 'id')[:2]
+        self.assertEqual(set(PredictionInsight.objects.values_list('prediction_id', flat=True)), {p.id for p in newest})
+
+        owned = Prediction.objects.create(
+            description='Owned prediction', probability=0.5, resolved=True, outcome=True,
+            owner=User.objects.create_user('owner'),
+        )
+        # Unowned predictions by default
+        self.assertIn('Stored 0 insights (2 already up to date)', self.warm('--limit', '2'))
+        self.assertIn('Stored 1 insights', self.warm('--owner', 'owner'))
+        self.assertTrue(PredictionInsight.objects.filter(prediction=owned).exists())
+        with self.assertRaises(CommandError):
+            self.warm('--limit', '0')
+
+    def test_failures_are_not_stored(self):
+        for _ in range(self.gemini.client.breaker.failure_threshold):
+            self.gemini.client.breaker.record_failure()
+        self.assertIn('Stored 0 insights', self.warm())
+        self.assertFalse(PredictionInsight.objects.exists())
+
+    def test_interactive_requests_are_served_from_storage(self):
+        self.warm()
+        # Only the store has them now
+        self.gemini.cache.clear()
+        prediction = self.resolved[0]
+        expected = f'Insight for {prediction.id}'
+
+        self.assertEqual(self.client.get(f'/api/predictions/{prediction.id}/ai_insight/').json()['result'], expected)
+        content = async_to_sync(read_stream)(self.client.get(f'/api/async/predictions/{prediction.id}/ai_insight/stream/'))
+        self.assertEqual([data.get('text') for event, data in parse_events(content.decode())], [expected, None])
+        ids = [str(p.id) for p in self.resolved[:3]]
+        job = self.client.post('/api/predictions/ai_insights/', {'ids': ids}, format='json').json()
+        self.assertEqual(job['result'], {pk: f'Insight for {pk}' for pk in ids})
+        self.assertEqual(len(self.model.prompts), 1)
+
+        # Mixed with one that is not stored
+        pending = next(p for p in self.predictions if not p.resolved)
+        job = self.client.post('/api/predictions/ai_insights/', {'ids': [ids[0], str(pending.id)]}, format='json').json()
+        self.assertEqual(job['result'], {ids[0]: f'Insight for {ids[0]}', str(pending.id): f'Insight for {pending.id}'})
+        self.assertEqual(len(self.model.prompts), 2)
+
+    async def test_async_views_use_storage(self):
+        await sync_to_async(self.warm)()
+        self.gemini.cache.clear()
+        prediction = self.resolved[0]
+        response = await self.async_client.get(f'/api/async/predictions/{prediction.id}/ai_insight/')
+        self.assertEqual(json.loads(response.content), {'insight': f'Insight for {prediction.id}'})
+        self.assertEqual(len(self.model.prompts), 1)
+
+    @override_settings(AI_INSIGHT_WARMER=True)
+    def test_resolving_warms_the_insight(self):
+        pending = [p for p in self.predictions if not p.resolved]
+        self.client.post(f'/api/predictions/{pending[0].id}/resolve/', {'outcome': True}, format='json')
+        self.client.post('/api/predictions/bulk_resolve/', {str(pending[1].id): False}, format='json')
+        self.assertEqual(
+            set(PredictionInsight.objects.values_list('prediction_id', flat=True)), {pending[0].id, pending[1].id}
+        )
+
+
+@override_settings(AI_INSIGHT_WARMER=True)
+class InsightWarmerThreadTests(FakeGeminiMixin, TransactionTestCase):
+    def test_warms_most_recent_resolutions_first(self):
+        self.model = BatchFakeModel()
+        gemini_service._gemini_service = GeminiService(model=self.model)
+        predictions = [p for p in make_predictions(10) if not p.resolved]
+        client = APIClient()
+        warmed = []
+        with mock.patch('predictions.insights.warm', side_effect=lambda ps: warmed.append([p.id for p in ps])):
+            with mock.patch.object(warmer, '_thread', True):
+                # Queued while a (pretend) warmer thread is busy
+                for prediction in predictions:
+                    client.post(f'/api/predictions/{prediction.id}/resolve/', {'outcome': True}, format='json')
+            warmer.schedule([])
+            warmer.wait()
+        self.assertEqual(warmed, [[p.id for p in reversed(predictions)]])
+
+        warmer.schedule([predictions[0].id])
+        warmer.wait()
+        self.assertEqual(PredictionInsight.objects.get().text, f'Insight for {predictions[0].id}')
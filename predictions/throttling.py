@@ -0,0 +1,131 @@
+"""
+Token-bucket rate limits for the AI endpoints.
+
+Each client (a user, or an IP address for anonymous requests) has a bucket
+refilled at ``AI_RATE_LIMIT_CLIENT`` and all clients share one refilled at
+``AI_RATE_LIMIT_GLOBAL``. Rates are written like DRF's,
+``'<requests>/<second|minute|hour|day>'``, or None for no limit. A bucket
+holds at most that many requests, so clients can burst up to the limit and
+then keep to the rate. A request takes a token from both buckets or, if
+either is empty, from neither.
+
+Buckets live in the Django cache named by ``AI_RATE_LIMIT_CACHE_ALIAS``,
+which all workers share with a file or database cache. Updates are only
+serialized within a process, so requests racing in several processes can
+occasionally get one past an empty bucket.
+"""
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """``(requests, seconds)`` of a rate like ``'10/min'``, or None."""
+    if not rate:
+        return None
+    requests, period = rate.split('/')
+    return int(requests), PERIODS[period[0]]
+
+
+def take(buckets, now=None):
+    """
+    Take a token from each bucket if all of them have one.
+
+    Args:
+        buckets (dict): cache key -> ``(requests, seconds)``
+        now (float): Current time (default ``time.time()``)
+
+    Returns:
+        float: 0 if the tokens were taken, otherwise seconds until they can be
+    """
+    cache = caches[settings.AI_RATE_LIMIT_CACHE_ALIAS]
+    now = time.time() if now is None else now
+    with _lock:
+        stored = cache.get_many(list(buckets))
+        tokens = {}
+        wait = 0
+        for key, (requests, seconds) in buckets.items():
+            available, updated = stored.get(key, (requests, now))
+            available = min(requests, available + (now - updated) * requests / seconds)
+            if available < 1:
+                wait = max(wait, (1 - available) * seconds / requests)
+            tokens[key] = (available - 1, now)
+        if wait:
+            return wait
+        for key, entry in tokens.items():
+            # A bucket left alone for a period is full again, like a missing one
+            cache.set(key, entry, buckets[key][1])
+    return 0
+
+
+def client_buckets(client):
+    """The buckets a request by ``client`` takes from."""
+    buckets = {}
+    client_rate = parse_rate(settings.AI_RATE_LIMIT_CLIENT)
+    if client_rate:
+        buckets[f'ai-rate:client:{client}'] = client_rate
+    global_rate = parse_rate(settings.AI_RATE_LIMIT_GLOBAL)
+    if global_rate:
+        buckets['ai-rate:global'] = global_rate
+    return buckets
+
+
+def client_id(request, user):
+    if user.is_authenticated:
+        return f'user:{user.pk}'
+    return f'ip:{BaseThrottle().get_ident(request)}'
+
+
+def throttle_wait(request, user):
+    """Take a token for an AI request by ``user``; seconds to wait if there is none."""
+    buckets = client_buckets(client_id(request, user))
+    return take(buckets) if buckets else 0
+
+
+class AIRateThrottle(BaseThrottle):
+    """DRF throttle applying the AI rate limits."""
+
+    def allow_request(self, request, view):
+        self.delay = throttle_wait(request, request.user)
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+def _throttled(wait):
+    response = JsonResponse(
+        {'detail': f'Request was throttled. Expected available in {int(wait) + 1} seconds.'}, status=429
+    )
+    response['Retry-After'] = str(int(wait) + 1)
+    return response
+
+
+def rate_limited(view):
+    """Apply the AI rate limits to a plain (sync or async) Django view."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            wait = await sync_to_async(throttle_wait)(request, await request.auser())
+            if wait:
+                return _throttled(wait)
+            return await view(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        wait = throttle_wait(request, request.user)
+        if wait:
+            return _throttled(wait)
+        return view(request, *args, **kwargs)
+    return wrapper
@@ -1,11 +1,30 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PredictionViewSet, UserProfileViewSet
+from . import async_views
+from .views import AIJobViewSet, AIUsageViewSet, LeaderboardViewSet, PredictionViewSet, UserProfileViewSet
 
 router = DefaultRouter()
 router.register(r'predictions', PredictionViewSet)
 router.register(r'profile', UserProfileViewSet)
+router.register(r'ai_jobs', AIJobViewSet)
+router.register(r'ai_usage', AIUsageViewSet, basename='ai-usage')
+router.register(r'leaderboard', LeaderboardViewSet, basename='leaderboard')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Async AI endpoints, for deployments served over ASGI
+    path('async/predictions/ai_suggest/', async_views.ai_suggest, name='async-ai-suggest'),
+    path('async/predictions/<uuid:pk>/ai_insight/', async_views.ai_insight, name='async-ai-insight'),
+    path('async/predictions/stats/ai_summary/', async_views.ai_summary, name='async-ai-summary'),
+    path('async/predictions/<uuid:pk>/ai_insight/stream/', async_views.ai_insight_stream, name='async-ai-insight-stream'),
+    path('async/predictions/stats/ai_summary/stream/', async_views.ai_summary_stream, name='async-ai-summary-stream'),
 ]
+
+if settings.ASGI:
+    # Server-sent event streams of the AI text as it is generated
+    urlpatterns += [
+        path('predictions/<uuid:pk>/ai_insight/stream/', async_views.ai_insight_stream, name='ai-insight-stream'),
+        path('predictions/stats/ai_summary/stream/', async_views.ai_summary_stream, name='ai-summary-stream'),
+    ]
+
+urlpatterns.append(path('', include(router.urls)))
@@ -0,0 +1,107 @@
+"""
+Gemini token usage and daily budgets.
+
+``GeminiService`` records every model response in ``AIUsage``: one row per
+day and method with the number of calls and the prompt and response tokens
+reported in the response's ``usage_metadata``. Before calling the model it
+checks the day's totals against ``AI_DAILY_CALL_BUDGET`` and
+``AI_DAILY_TOKEN_BUDGET`` (0: no limit). Once either is spent calls raise
+``BudgetExhausted`` and the service answers from its cache or with a
+fallback until the next day.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import AIUsage
+from .resilience import GeminiUnavailable
+
+COUNTERS = ('calls', 'prompt_tokens', 'response_tokens')
+
+
+class BudgetExhausted(GeminiUnavailable):
+    """Today's Gemini budget is spent."""
+
+
+def token_counts(usage_metadata):
+    """``(prompt tokens, response tokens)`` of a response's usage_metadata (zeros if missing)."""
+    return (
+        getattr(usage_metadata, 'prompt_token_count', 0) or 0,
+        getattr(usage_metadata, 'candidates_token_count', 0) or 0,
+    )
+
+
+def record_usage(method, usage_metadata):
+    """Count one model response for ``method`` today."""
+    prompt_tokens, response_tokens = token_counts(usage_metadata)
+    day = timezone.localdate()
+    changes = {
+        'calls': F('calls') + 1,
+        'prompt_tokens': F('prompt_tokens') + prompt_tokens,
+        'response_tokens': F('response_tokens') + response_tokens,
+    }
+    with transaction.atomic():
+        if AIUsage.objects.filter(day=day, method=method).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                AIUsage.objects.create(
+                    day=day, method=method, calls=1, prompt_tokens=prompt_tokens, response_tokens=response_tokens
+                )
+        except IntegrityError:
+            # Created by a concurrent first call of the day
+            AIUsage.objects.filter(day=day, method=method).update(**changes)
+
+
+def daily_totals(day=None):
+    """Calls and tokens of all methods on ``day`` (default today)."""
+    totals = AIUsage.objects.filter(day=day or timezone.localdate()).aggregate(
+        **{counter: Sum(counter) for counter in COUNTERS}
+    )
+    return {counter: totals[counter] or 0 for counter in COUNTERS}
+
+
+def check_budget():
+    """Raise ``BudgetExhausted`` if today's call or token budget is spent."""
+    call_budget = settings.AI_DAILY_CALL_BUDGET
+    token_budget = settings.AI_DAILY_TOKEN_BUDGET
+    if not call_budget and not token_budget:
+        return
+    totals = daily_totals()
+    if call_budget and totals['calls'] >= call_budget:
+        raise BudgetExhausted('The daily Gemini call budget is spent')
+    if token_budget and totals['prompt_tokens'] + totals['response_tokens'] >= token_budget:
+        raise BudgetExhausted('The daily Gemini token budget is spent')
+
+
+def usage_report(days=7):
+    """
+    Today's totals against the budgets, and the usage per day and method.
+
+    Args:
+        days (int): Number of days (including today) to list
+    """
+    today = timezone.localdate()
+    totals = daily_totals(today)
+    tokens = totals['prompt_tokens'] + totals['response_tokens']
+    budgets = {
+        'calls': (settings.AI_DAILY_CALL_BUDGET, totals['calls']),
+        'tokens': (settings.AI_DAILY_TOKEN_BUDGET, tokens),
+    }
+    return {
+        'today': {
+            'day': today,
+            **totals,
+            'budgets': {
+                name: {'limit': limit, 'remaining': max(limit - used, 0)} if limit else None
+                for name, (limit, used) in budgets.items()
+            },
+        },
+        'days': list(
+            AIUsage.objects.filter(day__gt=today - timedelta(days=days))
+            .values('day', 'method', *COUNTERS)
+        ),
+    }
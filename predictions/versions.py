@@ -0,0 +1,59 @@
+"""
+Data versions for cache invalidation.
+
+Each named data set has a counter in ``DataVersion`` that is incremented in
+the same transaction as every write to it. Anything derived from the data
+can be cached under the version it was computed from. Data belonging to a
+user is versioned separately under ``scoped(name, owner)``.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+PREDICTIONS = 'predictions'
+PROFILE = 'profile'
+# Everything derived from all users' predictions at once
+LEADERBOARD = 'leaderboard'
+
+
+def scoped(name, owner):
+    """The name of the part of data set ``name`` belonging to user id ``owner`` (None: unowned)."""
+    return name if owner is None else f'{name}:{owner}'
+
+
+def get_version(name):
+    """Return the current version of ``name`` (0 if it was never written)."""
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def version_info(name):
+    """Return ``(version, updated_at)`` of ``name``; updated_at is None if it was never written."""
+    return DataVersion.objects.filter(name=name).values_list('version', 'updated_at').first() or (0, None)
+
+
+def bump_version(name):
+    """Increment the version of ``name``; call inside the writing transaction."""
+    now = timezone.now()
+    with transaction.atomic():
+        updated = DataVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    DataVersion.objects.create(name=name, version=1, updated_at=now)
+            except IntegrityError:
+                # Created by a concurrent first write
+                DataVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now)
+
+
+def bump_version_on_commit(name):
+    """
+    Increment the version of ``name`` once the current transaction commits.
+
+    For versions shared by many writers: the row is only locked for the
+    moment of the update instead of for the rest of every writing
+    transaction. Readers see the bump after the data, so the worst case is
+    one redundant recomputation.
+    """
+    transaction.on_commit(lambda: bump_version(name))
@@ -1,14 +1,300 @@
-from rest_framework import viewsets, status
+import hashlib
+import re
+import uuid
+from functools import wraps
+
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.utils import timezone
+from django.utils.text import compress_sequence
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .models import Prediction, UserProfile
-from .serializers import PredictionSerializer, UserProfileSerializer
-from .gemini_service import get_gemini_service
+from .calibration import (
+    BINNING_STRATEGIES, BOOTSTRAP_INLINE_MAX_DRAWS, MAX_BINS, MAX_BOOTSTRAP_RESAMPLES, MAX_CHART_RESOLUTIONS,
+    MAX_WINDOW, PERIODS, UNIFORM, cached_calibration_chart, cached_calibration_metrics, cached_calibration_timeseries,
+    calibration_metrics_from_cache, stats_payload,
+)
+from .insights import stored_insight, stored_insights, warm_later
+from .jobs import enqueue, enqueue_once
+from .leaderboard import DEFAULT_MIN_RESOLVED, ORDERINGS, cached_cohort_comparison, cached_leaderboard
+from .models import AIJob, Prediction, UserProfile, owner_id
+from .pagination import PredictionCursorPagination
+from .renderers import CSVRenderer, NDJSONRenderer, encode_lines
+from .response_cache import get_or_compute
+from .serializers import AIJobSerializer, PredictionSerializer, UserProfileSerializer
+from .stats import build_stats, record_changes, summary_buckets
+from .throttling import AIRateThrottle
+from .usage import usage_report
+from .versions import PREDICTIONS, PROFILE, scoped, version_info
+
+
+# Largest number of items accepted by the bulk endpoints
+BULK_LIMIT = 10000
+BULK_BATCH_SIZE = 500
+# Largest number of predictions in one batch insight request
+AI_INSIGHTS_LIMIT = 200
+# Rows fetched from the database at a time by the export
+EXPORT_CHUNK_SIZE = 2000
+# Most leaderboard entries returned at once
+LEADERBOARD_LIMIT = 1000
+# Most days of AI usage returned at once
+AI_USAGE_DAYS_LIMIT = 366
+# Actions that call Gemini, and are rate limited
+AI_ACTIONS = {'ai_suggest', 'ai_insight', 'ai_insights'}
+
+ACCEPTS_GZIP = re.compile(r'\bgzip\b')
+
+BOOLEAN_PARAMS = {'true': True, 'false': False}
+
+
+def _boolean_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if value.lower() not in BOOLEAN_PARAMS:
+        raise ValidationError({name: 'Must be "true" or "false"'})
+    return BOOLEAN_PARAMS[value.lower()]
+
+
+def _datetime_param(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: 'Must be an ISO 8601 datetime'})
+    return parsed
+
+
+def _int_param(request, name, default, maximum):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    if not value.isdigit() or not 1 <= int(value) <= maximum:
+        raise ValidationError({name: f'Must be an integer between 1 and {maximum}'})
+    return int(value)
+
+
+def _calibration_options(request):
+    """
+    Options for the NumPy calibration engine from ``?bins=``, ``?binning=``,
+    ``?metrics=`` and ``?ci=bootstrap&n=``, or None if none of them was given.
+    """
+    params = request.query_params
+    if not (_boolean_param(request, 'metrics') or any(name in params for name in ('bins', 'binning', 'ci'))):
+        return None
+
+    options = {
+        'bins': _int_param(request, 'bins', 10, MAX_BINS),
+        'strategy': params.get('binning', UNIFORM),
+        'bootstrap': None,
+    }
+    if options['strategy'] not in BINNING_STRATEGIES:
+        raise ValidationError({'binning': f"Must be one of: {', '.join(BINNING_STRATEGIES)}"})
+    ci = params.get('ci')
+    if ci is not None:
+        if ci != 'bootstrap':
+            raise ValidationError({'ci': 'Must be "bootstrap"'})
+        options['bootstrap'] = _int_param(request, 'n', 2000, MAX_BOOTSTRAP_RESAMPLES)
+    return options
+
+
+def _request_version(request, name):
+    """
+    ``(scoped name, version, updated_at)`` of the requesting user's part of
+    data set ``name``, read once per request.
+    """
+    versions = request.__dict__.setdefault('_data_versions', {})
+    if name not in versions:
+        data = scoped(name, owner_id(request.user))
+        # Read before the data, so a concurrent write can only make what is
+        # derived from it look stale, never current
+        versions[name] = (data, *version_info(data))
+    return versions[name]
+
+
+def _uncacheable(request, params):
+    return any(name in request.query_params for name in params)
+
+
+def conditional(version_name, uncacheable_params=()):
+    """
+    Give GET responses a strong ETag and Last-Modified from the data version
+    ``version_name``, answering requests whose validators still match with
+    304 Not Modified without running the view.
+
+    Last-Modified has a resolution of one second, so it is left out while
+    the data was last written in the current second: a later write in the
+    same second would not change it, and If-Modified-Since would answer
+    with a stale 304. The ETag covers that second.
+
+    The ETag also covers the full URL and media type, which select the
+    representation. Requests with any of ``uncacheable_params`` (e.g. ones
+    with side effects) are passed straight through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            # The browsable API's pages differ on every request
+            if request.accepted_renderer.format != 'json' or _uncacheable(request, uncacheable_params):
+                return view(self, request, *args, **kwargs)
+
+            data, version, updated_at = _request_version(request, version_name)
+            representation = f'{data} {request.build_absolute_uri()} {request.accepted_media_type}'
+            etag = f'"{version}-{hashlib.md5(representation.encode()).hexdigest()[:16]}"'
+            last_modified = int(updated_at.timestamp()) if updated_at else None
+            if last_modified is not None and last_modified >= int(timezone.now().timestamp()):
+                last_modified = None
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = view(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            return response
+        return wrapper
+    return decorator
+
+
+def cache_response(version_name, uncacheable_params=()):
+    """
+    Serve the data of GET responses from the server-side response cache
+    (see predictions.response_cache), keyed by the full URL and the data
+    version of the user's part of ``version_name``. Only rendering runs on
+    a hit. Only 200 responses are cached, with their headers.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(self, request, *args, **kwargs):
+            if _uncacheable(request, uncacheable_params):
+                return view(self, request, *args, **kwargs)
+
+            scope, version, updated_at = _request_version(request, version_name)
+            # The time tells versions apart should the counter ever restart
+            # (e.g. a recreated database with a persistent cache)
+            stamp = updated_at.timestamp() if updated_at else 0
+            url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+            key = f'responses:{view.__name__}:{scope}:{version}:{stamp}:{url}'
+
+            def compute():
+                response = view(self, request, *args, **kwargs)
+                # Rendering sets the content type again
+                headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+                return response.data, response.status_code, headers
+
+            data, status_code, headers = get_or_compute(
+                key, compute, cacheable=lambda entry: entry[1] == status.HTTP_200_OK
+            )
+            return Response(data, status=status_code, headers=headers)
+        return wrapper
+    return decorator
 
 
 class PredictionViewSet(viewsets.ModelViewSet):
     queryset = Prediction.objects.all()
     serializer_class = PredictionSerializer
+    pagination_class = PredictionCursorPagination
+
+    @conditional(PREDICTIONS)
+    @cache_response(PREDICTIONS)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional(PREDICTIONS)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_queryset(self):
+        # Every user only ever sees (and scans) their own predictions
+        return super().get_queryset().owned_by(self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(owner_id=owner_id(self.request.user))
+
+    def get_throttles(self):
+        if self.action in AI_ACTIONS or (
+            self.action == 'stats' and self.request.query_params.get('ai_summary') == 'true'
+        ):
+            return [AIRateThrottle()]
+        return super().get_throttles()
+
+    def get_requested_fields(self):
+        """Fields selected with ``?fields=``, or None for all of them"""
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = set(fields) - set(PredictionSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve'):
+            kwargs.setdefault('fields', self.get_requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        request = self.request
+
+        resolved = _boolean_param(request, 'resolved')
+        if resolved is not None:
+            queryset = queryset.filter(resolved=resolved)
+        outcome = _boolean_param(request, 'outcome')
+        if outcome is not None:
+            queryset = queryset.filter(outcome=outcome)
+        resolve_by_after = _datetime_param(request, 'resolve_by_after')
+        if resolve_by_after is not None:
+            queryset = queryset.filter(resolve_by__gte=resolve_by_after)
+        resolve_by_before = _datetime_param(request, 'resolve_by_before')
+        if resolve_by_before is not None:
+            queryset = queryset.filter(resolve_by__lt=resolve_by_before)
+
+        fields = self.get_requested_fields()
+        if self.action == 'list' and fields is not None:
+            # Skip loading columns (usually the description) nobody asked for;
+            # the pagination keys are always needed.
+            queryset = queryset.only(*set(fields) | {'id', 'created_at'})
+        return queryset
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request):
+        """
+        Stream the (filtered) predictions as CSV or NDJSON (``?format=``).
+
+        Rows are read as tuples in chunks, so memory use is flat however many
+        there are. ``?compress=true`` gzips the stream for clients that accept it.
+        """
+        columns = self.get_requested_fields() or PredictionSerializer.Meta.fields
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by(*PredictionCursorPagination.ordering)
+            .values_list(*columns)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            encode_lines(renderer.stream(columns, rows), renderer.charset),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = f'attachment; filename="predictions.{renderer.format}"'
+
+        if _boolean_param(request, 'compress'):
+            patch_vary_headers(response, ('Accept-Encoding',))
+            if ACCEPTS_GZIP.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+                response.streaming_content = compress_sequence(response.streaming_content)
+                response['Content-Encoding'] = 'gzip'
+        return response
 
     @action(detail=True, methods=['post'])
     def resolve(self, request, pk=None):
@@ -21,123 +307,326 @@ class PredictionViewSet(viewsets.ModelViewSet):
         prediction.resolved = True
         prediction.outcome = bool(outcome)
         prediction.save()
+        warm_later([prediction.pk])
 
         serializer = self.get_serializer(prediction)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
-    def stats(self, request):
-        all_predictions = Prediction.objects.all()
-        predictions = all_predictions.filter(resolved=True, outcome__isnull=False)
-
-        total_predictions = all_predictions.count()
-        resolved_predictions = predictions.count()
-
-        if not predictions.exists():
-            return Response({
-                'total_predictions': total_predictions,
-                'resolved_predictions': 0,
-                'brier_score': None,
-                'calibration_bins': []
-            })
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many predictions at once; nothing is created if any item is invalid"""
+        if not isinstance(request.data, list):
+            return Response({'error': 'Expected a list of predictions'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate Brier score
-        brier_sum = sum((p.probability - (1.0 if p.outcome else 0.0)) ** 2 for p in predictions)
-        brier_score = brier_sum / predictions.count()
+        serializer = PredictionSerializer(data=request.data, many=True, max_length=BULK_LIMIT)
+        if not serializer.is_valid():
+            if isinstance(serializer.errors, dict):
+                return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+            errors = [
+                {'index': index, 'errors': item_errors}
+                for index, item_errors in enumerate(serializer.errors) if item_errors
+            ]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Calculate calibration bins
-        bins = []
-        bin_size = 0.1
-        min_count = 3
+        owner = owner_id(request.user)
+        with transaction.atomic():
+            predictions = Prediction.objects.bulk_create(
+                [Prediction(owner_id=owner, **item) for item in serializer.validated_data],
+                batch_size=BULK_BATCH_SIZE,
+            )
+            record_changes(added=[(p.probability, p.resolved, p.outcome) for p in predictions], owner=owner)
 
-        for i in range(10):
-            lower = i * bin_size
-            upper = (i + 1) * bin_size
+        return Response(
+            {'created': len(predictions), 'ids': [p.id for p in predictions]},
+            status=status.HTTP_201_CREATED
+        )
 
-            bin_predictions = [p for p in predictions if lower <= p.probability < upper]
+    @action(detail=False, methods=['post'])
+    def bulk_resolve(self, request):
+        """Resolve many predictions from an {id: outcome} map; nothing is saved if any item is invalid"""
+        if not isinstance(request.data, dict) or not request.data:
+            return Response({'error': 'Expected a map of prediction ids to outcomes'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > BULK_LIMIT:
+            return Response({'error': f'At most {BULK_LIMIT} predictions per request'}, status=status.HTTP_400_BAD_REQUEST)
 
-            if len(bin_predictions) >= min_count:
-                avg_predicted = sum(p.probability for p in bin_predictions) / len(bin_predictions)
-                actual_frequency = sum(1 if p.outcome else 0 for p in bin_predictions) / len(bin_predictions)
+        errors = {}
+        outcomes = {}
+        for key, outcome in request.data.items():
+            try:
+                pk = uuid.UUID(str(key))
+            except ValueError:
+                errors[key] = 'Not a valid prediction id'
+                continue
+            if not isinstance(outcome, bool):
+                errors[key] = 'outcome must be true or false'
+                continue
+            outcomes[pk] = outcome
 
-                bins.append({
-                    'range': f"{int(lower * 100)}-{int(upper * 100)}%",
-                    'count': len(bin_predictions),
-                    'avg_predicted': round(avg_predicted * 100, 1),
-                    'actual_frequency': round(actual_frequency * 100, 1)
-                })
+        with transaction.atomic():
+            predictions = (
+                self.get_queryset().select_for_update()
+                .only('id', 'probability', 'resolved', 'outcome')
+                .in_bulk(list(outcomes))
+            )
+            for pk in outcomes.keys() - predictions.keys():
+                errors[str(pk)] = 'Prediction not found'
+            if errors:
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            previous = [(p.probability, p.resolved, p.outcome) for p in predictions.values()]
+            for pk, prediction in predictions.items():
+                prediction.resolved = True
+                prediction.outcome = outcomes[pk]
+            # There are only two distinct new rows, so one UPDATE per outcome
+            # (per batch) is far cheaper than bulk_update()'s per-row CASE.
+            for outcome in (True, False):
+                pks = [pk for pk, value in outcomes.items() if value is outcome]
+                for start in range(0, len(pks), BULK_BATCH_SIZE):
+                    Prediction.objects.filter(pk__in=pks[start:start + BULK_BATCH_SIZE]).update(
+                        resolved=True, outcome=outcome
+                    )
+            record_changes(
+                removed=previous,
+                added=[(p.probability, p.resolved, p.outcome) for p in predictions.values()],
+                owner=owner_id(request.user),
+            )
+            warm_later(predictions)
+
+        return Response({'resolved': len(predictions)})
+
+    @action(detail=False, methods=['get'])
+    @conditional(PREDICTIONS, uncacheable_params=('ai_summary',))
+    @cache_response(PREDICTIONS, uncacheable_params=('ai_summary',))
+    def stats(self, request):
+        owner = owner_id(request.user)
+        stats_data = build_stats(summary_buckets(owner))
+        resolved_predictions = stats_data['resolved_predictions']
 
-        stats_data = {
-            'total_predictions': total_predictions,
-            'resolved_predictions': resolved_predictions,
-            'brier_score': round(brier_score, 4),
-            'calibration_bins': bins
-        }
+        # Custom bins, the extended metrics and confidence intervals need the
+        # raw predictions
+        options = _calibration_options(request)
+        calibration_job = None
+        if options is not None:
+            report = None
+            if (options['bootstrap'] or 0) * resolved_predictions > BOOTSTRAP_INLINE_MAX_DRAWS:
+                report = calibration_metrics_from_cache(owner=owner, **options)
+                if report is None:
+                    # Too many draws to resample within a request; clients
+                    # poll the job for the bins and metrics. Repeated
+                    # requests share the job already under way.
+                    calibration_job = enqueue_once(
+                        AIJob.KIND_CALIBRATION, {'owner': owner, 'options': options}, owner=owner
+                    )
+                    stats_data['calibration_job'] = AIJobSerializer(calibration_job).data
+            if calibration_job is None:
+                payload = stats_payload(report or cached_calibration_metrics(owner=owner, **options))
+                if not any(name in request.query_params for name in ('bins', 'binning', 'ci')):
+                    # Only the metrics were asked for; the engine's bins put
+                    # 100% in the top bin, unlike the default ones
+                    del payload['calibration_bins']
+                stats_data.update(payload)
 
-        # Generate AI summary if requested
+        # Queue an AI summary if requested; clients poll the job for the text
         if request.query_params.get('ai_summary') == 'true' and resolved_predictions > 0:
-            try:
-                gemini = get_gemini_service()
-                ai_summary = gemini.generate_calibration_summary(stats_data)
-                stats_data['ai_summary'] = ai_summary
-            except Exception as e:
-                stats_data['ai_summary'] = f"AI summary unavailable: {str(e)}"
+            stats_data['ai_summary_job'] = AIJobSerializer(enqueue(AIJob.KIND_SUMMARY, stats_data, owner=owner)).data
 
+        if calibration_job is not None:
+            return Response(stats_data, status=status.HTTP_202_ACCEPTED)
         return Response(stats_data)
 
+    @action(detail=False, methods=['get'], url_path='stats/chart')
+    @conditional(PREDICTIONS)
+    def stats_chart(self, request):
+        """
+        The calibration curve as parallel arrays, at each bin count in
+        ``?bins=`` (comma separated, default 10) with ``?binning=``
+        """
+        values = request.query_params.get('bins', '10').split(',')
+        if len(values) > MAX_CHART_RESOLUTIONS or not all(
+            value.isdigit() and 1 <= int(value) <= MAX_BINS for value in values
+        ):
+            raise ValidationError({
+                'bins': f'Must be up to {MAX_CHART_RESOLUTIONS} comma separated integers between 1 and {MAX_BINS}'
+            })
+        strategy = request.query_params.get('binning', UNIFORM)
+        if strategy not in BINNING_STRATEGIES:
+            raise ValidationError({'binning': f"Must be one of: {', '.join(BINNING_STRATEGIES)}"})
+
+        resolutions = tuple(dict.fromkeys(int(value) for value in values))
+        return Response(cached_calibration_chart(
+            owner=owner_id(request.user), resolutions=resolutions, strategy=strategy
+        ))
+
+    @action(detail=False, methods=['get'], url_path='stats/timeseries')
+    def stats_timeseries(self, request):
+        """Brier score and ECE per week or month and over a rolling window of predictions"""
+        period = request.query_params.get('bucket', 'week')
+        if period not in PERIODS:
+            raise ValidationError({'bucket': f"Must be one of: {', '.join(PERIODS)}"})
+        window = _int_param(request, 'window', 100, MAX_WINDOW)
+        bins = _int_param(request, 'bins', 10, MAX_BINS)
+
+        series = cached_calibration_timeseries(
+            owner=owner_id(request.user), period=period, window=window, bins=bins
+        )
+        return Response({
+            'bucket': period,
+            'window': window,
+            'series': [
+                {
+                    'start': point['start'],
+                    'count': point['count'],
+                    'brier_score': round(point['brier_score'], 4),
+                    'ece': round(point['ece'], 4),
+                    'rolling_count': point['rolling_count'],
+                    'rolling_brier_score': round(point['rolling_brier_score'], 4),
+                    'rolling_ece': round(point['rolling_ece'], 4),
+                }
+                for point in series
+            ],
+        })
+
     @action(detail=False, methods=['get'])
     def ai_suggest(self, request):
-        """Get AI-generated prediction suggestions"""
-        try:
-            # Get past predictions to provide context
-            past_predictions = Prediction.objects.all().values_list('description', flat=True)[:10]
-
-            gemini = get_gemini_service()
-            suggestions = gemini.generate_prediction_suggestions(list(past_predictions))
-            return Response({'suggestions': suggestions})
-        except Exception as e:
-            return Response(
-                {'error': f'AI service error: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        """Queue AI-generated prediction suggestions"""
+        # Get past predictions to provide context
+        past_predictions = self.get_queryset().values_list('description', flat=True)[:10]
+
+        job = enqueue(
+            AIJob.KIND_SUGGESTIONS, {'past_predictions': list(past_predictions)}, owner=owner_id(request.user)
+        )
+        return Response(AIJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['get'])
     def ai_insight(self, request, pk=None):
-        """Get AI insight for a specific prediction"""
+        """Queue an AI insight for a specific prediction"""
         prediction = self.get_object()
 
-        prediction_data = {
-            'description': prediction.description,
-            'probability': prediction.probability,
-            'resolved': prediction.resolved,
-            'outcome': prediction.outcome,
-            'created_at': prediction.created_at,
-            'resolve_by': prediction.resolve_by
-        }
-
-        try:
-            gemini = get_gemini_service()
-            insight = gemini.generate_prediction_insight(prediction_data)
-            return Response({'insight': insight})
-        except Exception as e:
-            return Response(
-                {'error': f'AI service error: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        prediction_data = prediction.insight_data()
+
+        job = enqueue(
+            AIJob.KIND_INSIGHT, prediction_data, result=stored_insight(prediction), owner=prediction.owner_id
+        )
+        return Response(AIJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['post'])
+    def ai_insights(self, request):
+        """Queue AI insights for many predictions from {"ids": [...]}"""
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if not isinstance(ids, list) or not ids:
+            return Response({'error': 'Expected {"ids": [...]} with at least one prediction id'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > AI_INSIGHTS_LIMIT:
+            return Response({'error': f'At most {AI_INSIGHTS_LIMIT} predictions per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        errors = {}
+        pks = []
+        for key in ids:
+            try:
+                pks.append(uuid.UUID(str(key)))
+            except ValueError:
+                errors[str(key)] = 'Not a valid prediction id'
+
+        predictions = self.get_queryset().in_bulk(pks)
+        for pk in set(pks) - predictions.keys():
+            errors[str(pk)] = 'Prediction not found'
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        pks = list(dict.fromkeys(pks))
+        stored = {str(pk): text for pk, text in stored_insights([predictions[pk] for pk in pks]).items()}
+        if len(stored) == len(pks):
+            job = enqueue(
+                AIJob.KIND_INSIGHTS, {'predictions': {}, 'stored': stored}, result=stored, owner=owner_id(request.user)
             )
+        else:
+            payload = {
+                'predictions': {str(pk): predictions[pk].insight_data() for pk in pks if str(pk) not in stored},
+                'stored': stored,
+            }
+            job = enqueue(AIJob.KIND_INSIGHTS, payload, owner=owner_id(request.user))
+        return Response(AIJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class AIJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Status and result of the requesting user's queued AI requests"""
+    queryset = AIJob.objects.all()
+    serializer_class = AIJobSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(owner_id=owner_id(self.request.user))
+
+
+class LeaderboardViewSet(viewsets.ViewSet):
+    """Users ranked by calibration, and calibration compared between cohorts (user groups)"""
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        """
+        The top ``?limit=`` users by ``?order=`` (brier_score or ece) among
+        those with at least ``?min_resolved=`` resolved predictions,
+        optionally only in ``?cohort=``
+        """
+        min_resolved = _int_param(request, 'min_resolved', DEFAULT_MIN_RESOLVED, 1_000_000)
+        limit = _int_param(request, 'limit', 100, LEADERBOARD_LIMIT)
+        order = request.query_params.get('order', ORDERINGS[0])
+        if order not in ORDERINGS:
+            raise ValidationError({'order': f"Must be one of: {', '.join(ORDERINGS)}"})
+        cohort = request.query_params.get('cohort')
+
+        entries = cached_leaderboard(min_resolved=min_resolved, order=order, cohort=cohort)
+        username = request.user.get_username()
+        return Response({
+            'order': order,
+            'min_resolved': min_resolved,
+            'cohort': cohort,
+            'count': len(entries),
+            'results': entries[:limit],
+            # Where the requesting user stands, even outside the top
+            'you': next((entry for entry in entries if entry['user'] == username), None),
+        })
+
+    @action(detail=False, methods=['get'])
+    def cohorts(self, request):
+        """Calibration stats of each cohort, or of those in ``?cohort=`` (comma separated)"""
+        names = request.query_params.get('cohort')
+        names = sorted({name.strip() for name in names.split(',') if name.strip()}) if names else None
+        return Response({'cohorts': cached_cohort_comparison(names)})
+
+
+class AIUsageViewSet(viewsets.ViewSet):
+    """Gemini calls and tokens used, against the daily budgets (staff only)"""
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        """Today's usage and budgets, and the usage of the last ``?days=`` days per method"""
+        return Response(usage_report(days=_int_param(request, 'days', 7, AI_USAGE_DAYS_LIMIT)))
 
 
 class UserProfileViewSet(viewsets.ModelViewSet):
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
 
+    def get_queryset(self):
+        return super().get_queryset().filter(user_id=owner_id(self.request.user))
+
+    def get_profile(self):
+        """The requesting user's profile; anonymous users share one."""
+        profile = self.get_queryset().order_by('pk').first()
+        if profile is None:
+            profile = UserProfile.objects.create(user_id=owner_id(self.request.user))
+        return profile
+
+    def create(self, request):
+        """Each user has one profile, which ``get_profile`` creates: save over it."""
+        return self.update(request)
+
+    @conditional(PROFILE)
     def list(self, request):
-        # Get or create single profile
-        profile, created = UserProfile.objects.get_or_create(pk=1)
-        serializer = self.get_serializer(profile)
+        serializer = self.get_serializer(self.get_profile())
         return Response(serializer.data)
 
     def update(self, request, pk=None, partial=False):
-        profile, created = UserProfile.objects.get_or_create(pk=1)
+        profile = self.get_profile()
         serializer = self.get_serializer(profile, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
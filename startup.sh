@@ -7,5 +7,10 @@ python manage.py collectstatic --no-input
 # Apply database migrations
 python manage.py migrate --no-input
 
-# Start Gunicorn
-gunicorn --bind=0.0.0.0:8000 --timeout 600 backend.wsgi
+# Start Gunicorn. With ASGI=True it runs uvicorn workers on backend.asgi,
+# where the /api/async/ AI endpoints keep many Gemini calls in flight per worker.
+if [ "$ASGI" = "True" ]; then
+    gunicorn --bind=0.0.0.0:8000 --timeout 600 -k uvicorn.workers.UvicornWorker backend.asgi
+else
+    gunicorn --bind=0.0.0.0:8000 --timeout 600 backend.wsgi
+fi
@@ -19,8 +19,10 @@ def test_predictions_list():
     """Test that predictions list endpoint works"""
     response = requests.get(f"{API_BASE_URL}/predictions/")
     assert response.status_code == 200
-    assert isinstance(response.json(), list)
-    print(f"✓ Predictions list works ({len(response.json())} predictions)")
+    page = response.json()
+    assert isinstance(page['results'], list)
+    assert 'next' in page
+    print(f"✓ Predictions list works ({len(page['results'])} predictions on first page)")
 
 
 def test_create_prediction():